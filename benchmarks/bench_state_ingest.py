@@ -0,0 +1,74 @@
+
+# Compares the typed, column-wise states/all ingestion with the previous generic DataFrame path.
+# Usage: python benchmarks/bench_state_ingest.py [--rows 1800 10000 50000] [--repeat 5]
+import os, sys; sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import argparse
+import json
+import random
+import time
+
+import pandas as pd
+
+from state_vectors import STATE_COLUMNS, parse_states_payload
+
+
+def synthetic_payload(rows, seed=0):
+    """
+    Build a states/all response body with `rows` random aircraft.
+    """
+    rng = random.Random(seed)
+    countries = ["United States", "Germany", "United Kingdom", "France", "China", "Canada", "Brazil", "India"]
+    states = []
+    for i in range(rows):
+        on_ground = rng.random() < 0.1
+        states.append([
+            f"{i:06x}", f"{rng.choice(['AAL', 'DAL', 'UAL', 'DLH', 'N'])}{rng.randint(1, 9999):<5}", rng.choice(countries),
+            1700000000 - rng.randint(0, 30), 1700000000, rng.uniform(-180, 180), rng.uniform(-90, 90),
+            None if on_ground else rng.uniform(0, 12500), on_ground, rng.uniform(0, 280), rng.uniform(0, 360),
+            rng.uniform(-20, 20), None, rng.uniform(0, 12800), f"{rng.randint(0, 7777):04d}", False, 0
+        ])
+    return json.dumps({"time": 1700000000, "states": states}).encode()
+
+
+def legacy_parse(raw):
+    """
+    The previous fetch_opensky_snapshot parsing path (r.json() into an object DataFrame).
+    """
+    data = json.loads(raw)
+    df = pd.DataFrame(data.get("states", []), columns=STATE_COLUMNS)
+    df["last_contact"] = pd.to_datetime(df["last_contact"], unit="s")
+    return df
+
+
+def best_time(fn, raw, repeat):
+    """
+    Return the fastest of `repeat` runs of fn(raw) in seconds, together with the last result.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(raw)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark typed vs legacy states/all ingestion")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1800, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'legacy ms':>10} {'typed ms':>9} {'speedup':>8} {'legacy MB':>10} {'typed MB':>9} {'saved':>6}")
+    for rows in args.rows:
+        raw = synthetic_payload(rows)
+        legacy_s, legacy_df = best_time(legacy_parse, raw, args.repeat)
+        typed_s, typed_df = best_time(parse_states_payload, raw, args.repeat)
+        legacy_mb = legacy_df.memory_usage(deep=True).sum() / 1e6
+        typed_mb = typed_df.memory_usage(deep=True).sum() / 1e6
+        print(f"{rows:>7} {legacy_s * 1e3:>10.1f} {typed_s * 1e3:>9.1f} {legacy_s / typed_s:>7.1f}x "
+              f"{legacy_mb:>10.2f} {typed_mb:>9.2f} {1 - typed_mb / legacy_mb:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
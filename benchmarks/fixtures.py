@@ -0,0 +1,154 @@
+# Recorded API payloads the benchmarks and the replay server run on.
+# Usage: python benchmarks/fixtures.py            (write the synthetic fixtures)
+#        python benchmarks/fixtures.py --record   (also record live states/all and KRDU departures)
+import os, sys; sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import argparse
+import json
+import random
+import time
+
+from bench_state_ingest import synthetic_payload
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Snapshot sizes: a free-tier snapshot, a busy authenticated one and a stress case
+STATE_SIZES = (1800, 10000, 50000)
+DEPARTURE_FLIGHTS = 500
+AIRLINE_RECORDS = 13000
+
+# Every fixture is generated from a fixed seed, so all machines benchmark the same payloads
+SEED = 0
+
+
+def fixture_path(name):
+    """
+    Return the path of a fixture file, e.g. fixture_path("states_10000.json").
+    """
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def synthetic_departures(flights=DEPARTURE_FLIGHTS, seed=SEED):
+    """
+    Build a flights/departure response body for KRDU with `flights` flights in the 6 hours before 1700000000.
+    """
+    rng = random.Random(seed)
+    destinations = ["KATL", "KJFK", "KORD", "KDFW", "KCLT", "KLGA", "KBOS", None]
+    records = []
+    for i in range(flights):
+        first_seen = 1700000000 - rng.randint(0, 6 * 3600)
+        records.append({
+            "icao24": f"{rng.randint(0, 0xFFFFFF):06x}",
+            "firstSeen": first_seen,
+            "estDepartureAirport": "KRDU",
+            "lastSeen": first_seen + rng.randint(1800, 5 * 3600),
+            "estArrivalAirport": rng.choice(destinations),
+            "callsign": f"{rng.choice(['AAL', 'DAL', 'UAL', 'SWA', 'JBU', 'N'])}{rng.randint(1, 9999):<5}",
+            "estDepartureAirportHorizDistance": rng.randint(0, 3000),
+            "estDepartureAirportVertDistance": rng.randint(0, 300),
+            "estArrivalAirportHorizDistance": rng.randint(0, 3000),
+            "estArrivalAirportVertDistance": rng.randint(0, 300),
+            "departureAirportCandidatesCount": 1,
+            "arrivalAirportCandidatesCount": rng.randint(0, 3),
+        })
+    return json.dumps(records).encode()
+
+
+def synthetic_airlines(records=AIRLINE_RECORDS, seed=SEED):
+    """
+    Build the "data" list of the aviationstack airlines endpoint with `records` airlines.
+    Numbers are strings and missing values are empty strings or null, like in the real responses.
+    """
+    rng = random.Random(seed)
+    countries = [("United States", "US"), ("Germany", "DE"), ("United Kingdom", "GB"), ("France", "FR"),
+                 ("China", "CN"), ("Canada", "CA"), ("Brazil", "BR"), ("India", "IN")]
+    airlines = []
+    for i in range(records):
+        country_name, country_iso2 = rng.choice(countries)
+        airlines.append({
+            "id": str(i + 1),
+            "airline_name": f"Airline {i}",
+            "iata_code": f"{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}",
+            "icao_code": f"{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i // 676 % 26)}",
+            "callsign": f"CALLSIGN{i}",
+            "fleet_size": str(rng.randint(1, 900)) if rng.random() < 0.6 else "",
+            "fleet_average_age": f"{rng.uniform(1, 25):.1f}" if rng.random() < 0.5 else "",
+            "date_founded": str(rng.randint(1919, 2020)) if rng.random() < 0.7 else None,
+            "status": rng.choice(["active", "active", "disabled", "historical"]),
+            "type": rng.choice(["scheduled", "charter", "cargo", "division"]),
+            "country_name": country_name,
+            "country_iso2": country_iso2,
+            "hub_code": rng.choice(["ATL", "DFW", "FRA", "LHR", "CDG", "PEK", ""]),
+        })
+    return airlines
+
+
+def write_fixtures(force=False):
+    """
+    Write the synthetic fixtures that do not exist yet (or all of them with force=True).
+
+    Returns:
+    - list: The paths that were written.
+    """
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    builders = {f"states_{rows}.json": (lambda rows=rows: synthetic_payload(rows, seed=SEED)) for rows in STATE_SIZES}
+    builders["departures.json"] = synthetic_departures
+    builders["airlines.json"] = lambda: json.dumps(synthetic_airlines()).encode()
+
+    written = []
+    for name, build in builders.items():
+        path = fixture_path(name)
+        if force or not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(build())
+            written.append(path)
+    return written
+
+
+def load_fixture(name) -> bytes:
+    """
+    Return the raw bytes of a fixture, writing the synthetic fixtures first if needed.
+    """
+    path = fixture_path(name)
+    if not os.path.exists(path):
+        write_fixtures()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def record_live():
+    """
+    Record a live states/all snapshot and the last 6 hours of KRDU departures from OpenSky.
+    """
+    from http_client import default_client
+    from cli_demo import OPENSKY_FLIGHTS_TIMEOUT, OPENSKY_STATES_TIMEOUT, OPENSKY_URL, OPENSKY_URL_DEPARTURES
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    end = int(time.time())
+    recordings = {
+        "states_live.json": (OPENSKY_URL, None, OPENSKY_STATES_TIMEOUT),
+        "departures_live.json": (OPENSKY_URL_DEPARTURES, {"airport": "KRDU", "begin": end - 6 * 3600, "end": end},
+                                 OPENSKY_FLIGHTS_TIMEOUT),
+    }
+    for name, (url, params, timeout) in recordings.items():
+        response = default_client().get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        with open(fixture_path(name), "wb") as f:
+            f.write(response.content)
+        print(f"Recorded {fixture_path(name)} ({len(response.content) / 1e6:.1f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the benchmark fixtures")
+    parser.add_argument("--force", action="store_true", help="rewrite existing fixtures")
+    parser.add_argument("--record", action="store_true", help="also record live OpenSky payloads")
+    args = parser.parse_args()
+
+    for path in write_fixtures(force=args.force):
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    if args.record:
+        record_live()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+# Multi-session load test of the dashboard: starts streamlit_app.py (and, with --poller, the background poller like
+# the Docker image) against the replay server and drives simulated browser sessions over Streamlit's websocket.
+# Usage: python benchmarks/load_test.py --sessions 20 [--actions 10] [--think 1] [--poller] [--demo-scale 10]
+import os, sys; sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import tempfile
+import time
+import urllib.request
+from collections import Counter, defaultdict
+
+from replay_server import ReplayServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, "src", "streamlit_app.py")
+CLI_PATH = os.path.join(ROOT_DIR, "src", "cli_demo.py")
+
+# What a session does after loading the page and fetching the live flights: action → relative weight.
+# "rerun" is an interaction that changes nothing the script reads (e.g. a widget outside the dashboard's panels)
+ACTIONS = {"rerun": 2, "viewport": 3, "airport": 2, "comparison": 3, "rdu": 1, "heatmap": 1, "live": 1}
+# Widget element types a session can interact with
+WIDGETS = ("button", "selectbox", "radio", "checkbox")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid):
+    """
+    Return the current resident set size of a process in MB, or None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def _percentile(values, q):
+    """
+    Nearest-rank percentile (q in 0-100) of a non-empty list.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def _wait_for(check, timeout, what):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return
+        time.sleep(0.2)
+    raise TimeoutError(f"Timed out waiting for {what}")
+
+
+def _healthy(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def scrape_cache_metrics(port):
+    """
+    Return {cache: (hits, misses)} from the app's Prometheus endpoint (see metrics.cache_collector).
+    """
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        text = response.read().decode()
+    counts = defaultdict(lambda: [0, 0])
+    for line in text.splitlines():
+        for index, name in enumerate(("skyline_cache_hits_total", "skyline_cache_misses_total")):
+            if line.startswith(name + "{"):
+                cache = line.split('cache="', 1)[1].split('"', 1)[0]
+                counts[cache][index] = float(line.rsplit(" ", 1)[1])
+    return {cache: tuple(values) for cache, values in counts.items()}
+
+
+class Session:
+    """
+    One simulated browser tab: a websocket to the app that sends reruns with widget states, the way the
+    frontend does, and waits for each script run to finish. Images are fetched once per URL, like a browser cache.
+    """
+
+    def __init__(self, port, rng, think, timeout):
+        self.port = port
+        self.rng = rng
+        self.think = think
+        self.timeout = timeout
+        self.latencies = defaultdict(list)  # action → seconds until the script run finished
+        self.page_latencies = []  # Seconds until the run finished and its new images were downloaded
+        self.errors = Counter()
+        self.media_bytes = 0
+        self._conn = None
+        self._page_script_hash = ""
+        self._widgets = {}  # label → (element type, element, fragment id)
+        self._states = {}  # widget id → WidgetState, sent with every rerun
+        self._messages = {}  # hash → cacheable ForwardMsg, so reference messages can be resolved
+        self._images = set()
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+        self._conn = await websocket_connect(f"ws://127.0.0.1:{self.port}/_stcore/stream", subprotocols=["streamlit"])
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+    async def rerun(self, action, label=None, value=None):
+        """
+        Rerun the script, optionally after interacting with the widget labelled `label` (clicking a button,
+        or selecting `value` in a selectbox/radio), and record the latency under `action`.
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ClientState_pb2 import ClientState
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        states = dict(self._states)
+        fragment_id = ""
+        if label is not None:
+            kind, element, fragment_id = self._widgets[label]
+            if kind == "button":
+                states[element.id] = WidgetState(id=element.id, trigger_value=True)  # Triggers only last one run
+            elif kind == "selectbox":
+                states[element.id] = self._states[element.id] = WidgetState(id=element.id, string_value=value)
+            elif kind == "radio":
+                index = list(element.options).index(value)
+                states[element.id] = self._states[element.id] = WidgetState(id=element.id, int_value=index)
+            elif kind == "checkbox":
+                states[element.id] = self._states[element.id] = WidgetState(id=element.id, bool_value=value)
+        client_state = ClientState(query_string="", page_script_hash=self._page_script_hash, fragment_id=fragment_id,
+                                   cached_message_hashes=list(self._messages))
+        client_state.widget_states.widgets.extend(states.values())
+        message = BackMsg()
+        message.rerun_script.CopyFrom(client_state)
+        if not fragment_id:
+            self._widgets = {}  # A full run sends every element again
+
+        started = time.perf_counter()
+        await self._conn.write_message(message.SerializeToString(), binary=True)
+        images = []
+        while True:
+            raw = await asyncio.wait_for(self._conn.read_message(), self.timeout)
+            if raw is None:
+                raise ConnectionError("The app closed the websocket")
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            if msg.WhichOneof("type") == "ref_hash":
+                msg = self._messages[msg.ref_hash]
+            elif msg.metadata.cacheable and msg.hash:
+                self._messages[msg.hash] = msg
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self._page_script_hash = msg.new_session.page_script_hash
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element_type = msg.delta.new_element.WhichOneof("type")
+                element = getattr(msg.delta.new_element, element_type) if element_type else None
+                if element_type in WIDGETS:
+                    self._widgets[element.label] = (element_type, element, msg.delta.fragment_id)
+                elif element_type == "imgs":
+                    images.extend(image.url for image in element.imgs if image.url.startswith("/"))
+                elif element_type == "exception":
+                    self.errors[f"{element.type}: {element.message}"[:120]] += 1
+            elif kind == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        finished = time.perf_counter()
+        self.latencies[action].append(finished - started)
+
+        from tornado.httpclient import AsyncHTTPClient
+        new_images = [url for url in images if url not in self._images]
+        responses = await asyncio.gather(*(AsyncHTTPClient().fetch(f"http://127.0.0.1:{self.port}{url}", raise_error=False)
+                                           for url in new_images))
+        for url, response in zip(new_images, responses):
+            if response.code == 200:
+                self._images.add(url)
+                self.media_bytes += len(response.body)
+            else:
+                self.errors[f"media {response.code}"] += 1
+        self.page_latencies.append(time.perf_counter() - started)
+
+    def _choices(self, label):
+        kind, element, _ = self._widgets[label]
+        return [option for option in element.options if option != "Custom"] if kind in ("selectbox", "radio") else []
+
+    async def act(self, action):
+        """
+        Perform one action if its widget is on the page. Returns whether it was performed.
+        """
+        radios = [label for label, (kind, _, _) in self._widgets.items() if kind == "radio"]
+        targets = {"viewport": "Map viewport", "airport": "Airport", "rdu": "Fetch RDU Stats",
+                   "heatmap": "Fetch Heatmap", "live": "Fetch Live Flights",
+                   "comparison": self.rng.choice(radios) if radios else None}
+        if action == "rerun":
+            await self.rerun(action)
+            return True
+        label = targets[action]
+        if label not in self._widgets:
+            return False
+        choices = self._choices(label)
+        await self.rerun(action, label, self.rng.choice(choices) if choices else None)
+        return True
+
+    async def run(self, actions, start_delay=0.0):
+        """
+        Load the page, fetch the live flights and perform `actions` random actions with think time in between.
+        """
+        await asyncio.sleep(start_delay)
+        try:
+            await self.connect()
+            await self.rerun("load")
+            await self.rerun("live", "Fetch Live Flights")
+            names, weights = list(ACTIONS), list(ACTIONS.values())
+            performed = 0
+            while performed < actions:
+                if self.think:
+                    await asyncio.sleep(self.rng.expovariate(1 / self.think))
+                performed += await self.act(self.rng.choices(names, weights)[0])
+        except Exception as e:
+            self.errors[f"{type(e).__name__}: {e}"[:120]] += 1
+
+
+def start_app(port, env, log):
+    """
+    Start `streamlit run streamlit_app.py` headless on a port and wait until it is healthy.
+    """
+    process = subprocess.Popen([sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless=true",
+                                f"--server.port={port}", "--server.address=127.0.0.1",
+                                "--browser.gatherUsageStats=false", "--server.fileWatcherType=none"],
+                               env=env, stdout=log, stderr=subprocess.STDOUT, cwd=ROOT_DIR)
+    try:
+        _wait_for(lambda: process.poll() is not None or _healthy(port), 60, "the app to start")
+    except TimeoutError:
+        process.terminate()
+        raise
+    if process.poll() is not None:
+        raise RuntimeError(f"The app exited with status {process.returncode}; see {log.name}")
+    return process
+
+
+def start_poller(env, data_dir, interval, log):
+    """
+    Start the background poller (as in the Docker entrypoint) and wait for its first snapshot and the airline store.
+    """
+    process = subprocess.Popen([sys.executable, CLI_PATH, "poll", "--interval", str(interval)], env=env,
+                               stdout=log, stderr=subprocess.STDOUT, cwd=ROOT_DIR)
+    published = [os.path.join(data_dir, "live", "snapshot.arrow"), os.path.join(data_dir, "airlines.feather")]
+    _wait_for(lambda: process.poll() is not None or all(map(os.path.exists, published)), 300, "the poller")
+    if process.poll() is not None:
+        raise RuntimeError(f"The poller exited with status {process.returncode}; see {log.name}")
+    return process
+
+
+async def _sample_rss(pids, peaks, stop):
+    while not stop.is_set():
+        for name, pid in pids.items():
+            rss = _rss_mb(pid)
+            if rss is not None:
+                peaks[name] = max(peaks.get(name, 0.0), rss)
+        await asyncio.sleep(0.25)
+
+
+async def drive(port, args, pids, server, metrics_port):
+    """
+    Warm the app up with one session, then run args.sessions concurrent sessions (ramped up over args.ramp
+    seconds) while sampling the RSS of the app (and poller) processes. Returns (warm-up, sessions, RSS, seconds,
+    upstream requests and cache counters right after the warm-up), so the cold fetches can be left out of the report.
+    """
+    warmup = Session(port, random.Random(args.seed), 0, args.timeout)
+    await warmup.run(0)
+    await warmup.act("rdu")
+    rss = {"idle": None, "warm": _rss_mb(pids["app"])}
+    warm_requests = Counter(server.endpoint_requests)
+    warm_caches = scrape_cache_metrics(metrics_port)
+
+    rng = random.Random(args.seed + 1)
+    sessions = [Session(port, random.Random(rng.random()), args.think, args.timeout) for _ in range(args.sessions)]
+    peaks, stop = {}, asyncio.Event()
+    sampler = asyncio.ensure_future(_sample_rss(pids, peaks, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(session.run(args.actions, args.ramp * i / max(1, args.sessions))
+                           for i, session in enumerate(sessions)))
+    elapsed = time.perf_counter() - started
+    rss["end"] = _rss_mb(pids["app"])  # Every session is still connected here
+    stop.set()
+    await sampler
+    rss["peak"] = peaks.get("app")
+    rss["poller_peak"] = peaks.get("poller")
+    for session in sessions + [warmup]:
+        session.close()
+    return warmup, sessions, rss, elapsed, warm_requests, warm_caches
+
+
+def report(args, sessions, rss, elapsed, upstream, caches):
+    """
+    Print the latency percentiles per action, throughput, memory, upstream requests and cache hit rates,
+    and return them as a dict.
+    """
+    by_action = defaultdict(list)
+    for session in sessions:
+        for action, values in session.latencies.items():
+            by_action[action].extend(values)
+    reruns = [value for values in by_action.values() for value in values]
+    pages = [value for session in sessions for value in session.page_latencies]
+    errors = sum((session.errors for session in sessions), Counter())
+
+    def row(values):
+        return {"count": len(values), "p50_ms": _percentile(values, 50) * 1e3, "p99_ms": _percentile(values, 99) * 1e3,
+                "max_ms": max(values) * 1e3} if values else {"count": 0}
+
+    result = {"sessions": args.sessions, "actions": args.actions, "think": args.think, "poller": args.poller,
+              "demo_scale": args.demo_scale, "seconds": elapsed, "reruns_per_second": len(reruns) / elapsed if elapsed else 0,
+              "rerun": row(reruns), "page": row(pages),
+              "by_action": {action: row(values) for action, values in sorted(by_action.items())},
+              "rss_mb": rss, "upstream_requests": dict(upstream), "caches": caches, "errors": dict(errors)}
+
+    print(f"{args.sessions} sessions × {args.actions} actions ({args.think:g}s think time"
+          f"{', background poller' if args.poller else ''}) in {elapsed:.1f}s: {result['reruns_per_second']:.1f} reruns/s")
+    print(f"{'action':<12} {'count':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in [("all reruns", result["rerun"]), ("with images", result["page"])] + list(result["by_action"].items()):
+        if stats["count"]:
+            print(f"{name:<12} {stats['count']:>6} {stats['p50_ms']:>9.0f} {stats['p99_ms']:>9.0f} {stats['max_ms']:>9.0f}")
+    if rss["warm"] is not None:
+        per_session = (rss["end"] - rss["warm"]) / max(1, args.sessions)
+        result["rss_per_session_mb"] = per_session
+        print(f"App RSS: {rss['warm']:.0f} MB after the warm-up session, {rss['end']:.0f} MB with every session "
+              f"connected (peak {rss['peak']:.0f} MB) → {per_session:.1f} MB per session")
+        if rss["poller_peak"]:
+            print(f"Poller RSS peak: {rss['poller_peak']:.0f} MB")
+    print("Upstream requests during the sessions: " +
+          (", ".join(f"{endpoint} {count}" for endpoint, count in sorted(upstream.items())) or "none"))
+    for cache, (hits, misses) in sorted(caches.items()):
+        print(f"{cache} cache: {hits:.0f} hits, {misses:.0f} misses ({hits / max(1, hits + misses):.0%} hit rate)")
+    for error, count in errors.most_common(10):
+        print(f"ERROR ×{count}: {error}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated sessions against the Skyline dashboard")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions (default: 10)")
+    parser.add_argument("--actions", type=int, default=10, help="actions per session after the first page (default: 10)")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a session's actions (default: 1)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which the sessions start (default: 5)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds a rerun may take (default: 120)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--poller", action="store_true", help="run the background poller next to the app, like the Docker image")
+    parser.add_argument("--poll-interval", type=float, default=10, help="seconds between the poller's fetches (default: 10)")
+    parser.add_argument("--states", default="states_1800.json", help="states/all fixture served by the stub (default: states_1800.json)")
+    parser.add_argument("--demo-scale", type=float, default=None,
+                        help="serve synthetic, moving traffic at this scale instead of the fixtures (see demo_mock.py)")
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="seconds the stub adds to every response")
+    parser.add_argument("--snapshot-ttl", type=float, default=None, help="OPENSKY_CACHE_TTL of the app (default: the app's)")
+    parser.add_argument("--figure-cache", type=int, default=None, help="SKYLINE_FIGURE_CACHE_SIZE of the app, 0 disables figure reuse")
+    parser.add_argument("--output", default=None, help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with ReplayServer(states=args.states, latency=args.upstream_latency, demo_scale=args.demo_scale) as server, \
+            tempfile.TemporaryDirectory() as data_dir:
+        app_port, metrics_port = _free_port(), _free_port()
+        env = dict(os.environ, OPENSKY_BASE_URL=server.opensky_base_url, AVIATIONSTACK_BASE_URL=server.aviationstack_base_url,
+                   SKYLINE_DATA_DIR=data_dir, SKYLINE_METRICS="1", SKYLINE_METRICS_PORT=str(metrics_port),
+                   SKYLINE_POLLER="1" if args.poller else "0")
+        env.pop("SKYLINE_DEMO_SCALE", None)  # The stub serves the synthetic traffic, so the app really fetches it
+        if args.snapshot_ttl is not None:
+            env["OPENSKY_CACHE_TTL"] = str(args.snapshot_ttl)
+        if args.figure_cache is not None:
+            env["SKYLINE_FIGURE_CACHE_SIZE"] = str(args.figure_cache)
+
+        processes = []
+        log_path = os.path.join(data_dir, "processes.log")
+        with open(log_path, "w") as log:
+            try:
+                pids = {}
+                if args.poller:
+                    poller_env = dict(env, SKYLINE_METRICS="0")
+                    poller_env.pop("SKYLINE_METRICS_PORT")
+                    processes.append(start_poller(poller_env, data_dir, args.poll_interval, log))
+                    pids["poller"] = processes[-1].pid
+                processes.append(start_app(app_port, env, log))
+                pids["app"] = processes[-1].pid
+                print(f"App on http://127.0.0.1:{app_port} (stub on port {server.port}); warming up…", file=sys.stderr)
+
+                idle_rss = _rss_mb(pids["app"])
+                loop = asyncio.new_event_loop()
+                warmup, sessions, rss, elapsed, warm_requests, warm_caches = loop.run_until_complete(
+                    drive(app_port, args, pids, server, metrics_port))
+                loop.close()
+                rss["idle"] = idle_rss
+                upstream = Counter(server.endpoint_requests)
+                upstream.subtract(warm_requests)
+                caches = {cache: tuple(total - warm for total, warm in zip(counts, warm_caches.get(cache, (0, 0))))
+                          for cache, counts in scrape_cache_metrics(metrics_port).items()}
+            finally:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    process.wait(timeout=30)
+        if sum(warmup.errors.values()):
+            print("Warm-up errors:", dict(warmup.errors), file=sys.stderr)
+            with open(log_path) as f:
+                print(f.read()[-3000:], file=sys.stderr)
+
+    result = report(args, sessions, rss, elapsed, +upstream, caches)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
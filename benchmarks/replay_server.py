@@ -0,0 +1,147 @@
+# Local stand-in for the OpenSky and aviationstack APIs that serves the recorded fixtures.
+# Usage: python benchmarks/replay_server.py [--port 8765] [--states states_10000.json] [--latency 0.05] [--demo-scale 10]
+# then point the app at it:
+#   OPENSKY_BASE_URL=http://127.0.0.1:8765/api AVIATIONSTACK_BASE_URL=http://127.0.0.1:8765/v1 streamlit run src/streamlit_app.py
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from fixtures import load_fixture
+
+
+class ReplayServer:
+    """
+    Threaded HTTP server answering states/all, flights/departure, flights/arrival and the airlines endpoint
+    from fixtures. `states` names the states/all fixture and can be changed while the server runs;
+    `latency` adds a fixed delay to every response to mimic a remote API. With `demo_scale`, every endpoint
+    answers with demo_mock's synthetic traffic instead (moving aircraft, flights of the requested airport and range).
+    Requests are counted in total and per endpoint ("states", "flights", "airlines").
+    """
+
+    def __init__(self, port=0, states="states_10000.json", departures="departures.json", airlines="airlines.json",
+                 latency=0.0, demo_scale=None):
+        self.states = states
+        self.latency = latency
+        self.demo_scale = demo_scale
+        self.requests = 0
+        self.endpoint_requests = Counter()
+        self._departures = load_fixture(departures)
+        self._airlines = json.loads(load_fixture(airlines))
+        self._payloads = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                status, body = server.respond(url.path, parse_qs(url.query))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._httpd.server_port
+
+    @property
+    def opensky_base_url(self):
+        return f"http://127.0.0.1:{self.port}/api"
+
+    @property
+    def aviationstack_base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def _payload(self, name):
+        if name not in self._payloads:
+            self._payloads[name] = load_fixture(name)
+        return self._payloads[name]
+
+    def respond(self, path, query):
+        """
+        Return the (status, body) of a request.
+        """
+        if path.endswith("/states/all"):
+            self.endpoint_requests["states"] += 1
+            if self.demo_scale:
+                from demo_mock import demo_traffic
+                return 200, demo_traffic(self.demo_scale).states_payload()
+            return 200, self._payload(self.states)
+        if path.endswith("/flights/departure") or path.endswith("/flights/arrival"):
+            self.endpoint_requests["flights"] += 1
+            if self.demo_scale:
+                from demo_mock import demo_airport_flights
+                kind = "arrival" if path.endswith("/arrival") else "departure"
+                flights = demo_airport_flights(query["airport"][0], int(query["begin"][0]), int(query["end"][0]), kind,
+                                               scale=self.demo_scale)
+                return 200, flights.drop(columns="airport").to_json(orient="records").encode()
+            return 200, self._departures
+        if path.endswith("/airlines"):
+            self.endpoint_requests["airlines"] += 1
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", ["100"])[0])
+            if self.demo_scale:
+                from demo_mock import demo_airlines_page
+                # The number of airlines does not grow with the traffic
+                return 200, json.dumps(demo_airlines_page(offset, limit, scale=1)).encode()
+            page = self._airlines[offset:offset + limit]
+            pagination = {"offset": offset, "limit": limit, "count": len(page), "total": len(self._airlines)}
+            return 200, json.dumps({"pagination": pagination, "data": page}).encode()
+        return 404, b"{}"
+
+    def start(self):
+        """
+        Serve in a background thread.
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """
+        Serve in the calling thread until interrupted.
+        """
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixtures as a fake OpenSky/aviationstack API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--states", default="states_10000.json", help="states/all fixture to serve")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--demo-scale", type=float, default=None, help="serve synthetic traffic at this scale (see demo_mock.py)")
+    args = parser.parse_args()
+
+    server = ReplayServer(args.port, states=args.states, latency=args.latency, demo_scale=args.demo_scale)
+    print(f"Serving fixtures on {server.opensky_base_url} and {server.aviationstack_base_url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+# Benchmark suite for every data path of the dashboard, run against recorded fixtures and a local replay server.
+# Usage: python benchmarks/run_benchmarks.py [-k render] [--repeat 7] [--baseline COMMIT] [--threshold 0.15] [--fail-on-regression]
+# Results are appended to benchmarks/results/history.jsonl and compared with the last run of a different commit.
+import os, sys; sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import argparse
+import ast
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from fixtures import load_fixture, write_fixtures
+from replay_server import ReplayServer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "streamlit_app.py")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+HISTORY_PATH = os.path.join(RESULTS_DIR, "history.jsonl")
+# A benchmark whose median time grows by more than this share is reported as a regression
+DEFAULT_THRESHOLD = 0.15
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Register a benchmark. The decorated function does the (untimed) setup and returns the zero-argument callable to time.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _snapshot(rows):
+    from state_vectors import parse_states_payload
+    return parse_states_payload(load_fixture(f"states_{rows}.json"))
+
+
+def _moved(df, share=0.05):
+    """
+    Return the next snapshot of df: a share of the aircraft climb into another band, and the timestamp advances.
+    """
+    moved = df.copy()
+    step = max(1, int(1 / share))
+    moved.loc[moved.index[::step], "baro_altitude"] += 3500
+    moved.attrs["timestamp"] = df.attrs["timestamp"] + timedelta(seconds=10)
+    return moved
+
+
+def _flown(df, seconds=10, churn=0.02, seed=0):
+    """
+    Return the snapshot `seconds` after df: every aircraft moves along its track at its velocity and climbs at
+    its vertical rate, its report times advance, and a `churn` share of the aircraft leaves the snapshot.
+    """
+    import numpy as np
+    flown = df.copy()
+    velocity = flown["velocity"].to_numpy(dtype=np.float64, na_value=0.0)
+    track = np.radians(flown["true_track"].to_numpy(dtype=np.float64, na_value=0.0))
+    flown["latitude"] += (velocity * np.cos(track) * seconds / 111_320).astype(np.float32)
+    flown["longitude"] += (velocity * np.sin(track) * seconds / 111_320).astype(np.float32)
+    flown["baro_altitude"] += flown["vertical_rate"].fillna(0) * seconds
+    flown["time_position"] += seconds
+    flown["last_contact"] += timedelta(seconds=seconds)
+    kept = np.random.default_rng(seed).random(len(flown)) >= churn
+    flown = flown[kept].reset_index(drop=True)
+    flown.attrs["timestamp"] = df.attrs["timestamp"] + timedelta(seconds=seconds)
+    return flown
+
+
+def _airline_frame():
+    from airline_store import normalize_airlines
+    return normalize_airlines(json.loads(load_fixture("airlines.json")))
+
+
+# ---------- Ingestion and fetching ----------
+for _rows in (1800, 10000, 50000):
+    @benchmark(f"parse_states_{_rows}")
+    def _(rows=_rows):
+        from state_vectors import parse_states_payload
+        raw = load_fixture(f"states_{rows}.json")
+        return lambda: parse_states_payload(raw)
+
+
+@benchmark("demo_states_180000")
+def _():
+    from demo_mock import SyntheticTraffic
+    traffic = SyntheticTraffic(180000)  # 100× today's snapshot
+    return lambda: traffic.states_frame(1700000000)
+
+
+@benchmark("derived_features_10000")
+def _():
+    from features import add_derived_features
+    df = _snapshot(10000)
+    return lambda: add_derived_features(df)
+
+
+@benchmark("fetch_opensky_snapshot_10000")
+def _():
+    from cli_demo import fetch_opensky_snapshot
+    return fetch_opensky_snapshot
+
+
+@benchmark("fetch_rdu_departures")
+def _():
+    from cli_demo import fetch_rdu_departures
+    return fetch_rdu_departures
+
+
+@benchmark("fetch_all_airlines")
+def _():
+    from cli_demo import fetch_all_airlines
+    return lambda: fetch_all_airlines(max_pages=0)  # Every page, as on a paid plan
+
+
+@benchmark("normalize_airlines")
+def _():
+    from airline_store import normalize_airlines
+    airlines = json.loads(load_fixture("airlines.json"))
+    return lambda: normalize_airlines(airlines)
+
+
+for _feature, _cast in (("fleet_size", "int"), ("fleet_average_age", "float"), ("date_founded", "int")):
+    @benchmark(f"get_airline_feature_dict_{_feature}")
+    def _(feature=_feature, cast=_cast):
+        from airline_store import get_airline_feature_dict
+        airlines = _airline_frame()
+        return lambda: get_airline_feature_dict(feature, cast, airlines=airlines)
+
+
+# ---------- Aggregation panels ----------
+@benchmark("aggregator_full_10000")
+def _():
+    from aggregates import IncrementalAggregator
+    from callsign_resolver import CallsignResolver
+    df = _snapshot(10000)
+    resolver = CallsignResolver()
+    return lambda: IncrementalAggregator(resolver=resolver).update(df)
+
+
+@benchmark("aggregator_incremental_10000")
+def _():
+    from aggregates import IncrementalAggregator
+    snapshots = [_snapshot(10000)]
+    snapshots.append(_moved(snapshots[0]))
+    aggregator = IncrementalAggregator()
+    aggregator.update(snapshots[0])
+    state = {"next": 1}
+
+    def run():
+        aggregator.update(snapshots[state["next"]])
+        state["next"] = 1 - state["next"]
+    return run
+
+
+for _panel in ("origin_country", "alt_band", "airline", "region"):
+    @benchmark(f"aggregator_top_{_panel}")
+    def _(panel=_panel):
+        from aggregates import IncrementalAggregator
+        aggregator = IncrementalAggregator()
+        aggregator.update(_snapshot(10000))
+        return lambda: aggregator.top(panel)
+
+
+@benchmark("cube_build_10000")
+def _():
+    from aggregates import FlightCube
+    df = _snapshot(10000)
+    return lambda: FlightCube.from_snapshot(df)
+
+
+@benchmark("cube_slice_2d_10000")
+def _():
+    from aggregates import IncrementalAggregator
+    aggregator = IncrementalAggregator()
+    aggregator.update(_snapshot(10000))
+    cube = aggregator.cube()
+    return lambda: cube.counts_by(["origin_country", "alt_band"], where={"on_ground": "airborne", "region": "Europe/Africa"})
+
+
+@benchmark("callsign_resolve_10000_cold")
+def _():
+    from callsign_resolver import CallsignResolver
+    callsigns = _snapshot(10000)["callsign"]
+    return lambda: CallsignResolver().resolve(callsigns)
+
+
+@benchmark("spatial_index_build_10000")
+def _():
+    from spatial_index import SpatialIndex
+    df = _snapshot(10000)
+    return lambda: SpatialIndex.from_snapshot(df)
+
+
+@benchmark("spatial_index_radius_10000")
+def _():
+    from spatial_index import AIRPORTS, SpatialIndex
+    index = SpatialIndex.from_snapshot(_snapshot(10000))
+    return lambda: index.radius(*AIRPORTS["KRDU"], 500)
+
+
+@benchmark("track_store_update_10000")
+def _():
+    from track_store import TrackStore
+    snapshots = [_snapshot(10000)]
+    snapshots.append(_moved(snapshots[0]))
+    store = TrackStore()
+    state = {"next": 0}
+
+    def run():
+        store.update(snapshots[state["next"]])
+        state["next"] = 1 - state["next"]
+    return run
+
+
+# ---------- Snapshot codec ----------
+def _codec_frames(rows):
+    """
+    Encode a keyframe and two delta frames (a snapshot, the next one and back), so the deltas can be applied alternately.
+    """
+    from snapshot_codec import SnapshotEncoder
+    snapshots = [_snapshot(rows)]
+    snapshots.append(_flown(snapshots[0]))
+    encoder = SnapshotEncoder(keyframe_interval=10 ** 9)
+    frames = [encoder.encode(snapshots[0]), encoder.encode(snapshots[1]), encoder.encode(snapshots[0])]
+    return encoder, snapshots, frames
+
+
+@benchmark("snapshot_encode_delta_10000")
+def _():
+    encoder, snapshots, frames = _codec_frames(10000)
+    state = {"next": 1}
+
+    def run():
+        encoder.encode(snapshots[state["next"]])
+        state["next"] = 1 - state["next"]
+    raw = snapshots[1].memory_usage(deep=True).sum()
+    run.info = {"keyframe_ratio": raw / len(frames[0]), "delta_ratio": raw / len(frames[1])}
+    return run
+
+
+@benchmark("snapshot_decode_delta_10000")
+def _():
+    from snapshot_codec import SnapshotDecoder
+    _, _, frames = _codec_frames(10000)
+    decoder = SnapshotDecoder()
+    decoder.decode(frames[0])
+    state = {"next": 1}
+
+    def run():
+        decoder.decode(frames[state["next"]])
+        state["next"] = 3 - state["next"]
+    return run
+
+
+@benchmark("snapshot_history_seek_10000")
+def _():
+    from snapshot_codec import KEYFRAME_INTERVAL, SnapshotHistory
+    history = SnapshotHistory()
+    df = _snapshot(10000)
+    for i in range(KEYFRAME_INTERVAL):
+        history.append(df)
+        df = _flown(df, seed=i)
+    timestamps = history.timestamps()
+    run = lambda: history.snapshot(timestamps[-1])  # The worst case: every delta of the group is applied
+    run.info = {"history_ratio": history.stats()["ratio"]}
+    return run
+
+
+# ---------- Figure renders (cache misses, as on a new snapshot) ----------
+def _render_benchmark(kind, draw_name, build_data, figsize):
+    def setup():
+        import charts
+        data = build_data()
+        draw = getattr(charts, draw_name)
+        return lambda: charts.FigureCache().render(kind, data, draw, figsize=figsize)
+    benchmark(f"render_{kind}")(setup)
+
+
+def _aggregated(panel, n=None):
+    from aggregates import IncrementalAggregator
+    aggregator = IncrementalAggregator()
+    aggregator.update(_snapshot(10000))
+    return aggregator.top(panel, n)
+
+
+def _positions(rows):
+    from spatial_index import VIEWPORTS
+    df = _snapshot(rows).dropna(subset=["latitude", "longitude"])
+    return df["longitude"].to_numpy(), df["latitude"].to_numpy(), VIEWPORTS["World"]
+
+
+def _hourly():
+    import pandas as pd
+    return pd.DataFrame({"hour": range(24), "arrivals": [abs(12 - h) * 3 for h in range(24)],
+                         "departures": [(h * 7) % 30 for h in range(24)]})
+
+
+def _feature_bars():
+    airlines = _airline_frame().dropna(subset=["fleet_size"]).nlargest(10, "fleet_size")
+    series = airlines.set_index("airline_name")["fleet_size"].sort_values()
+    return series, "Airline Fleet Sizes", "Fleet Size", 0
+
+
+def _track():
+    import numpy as np
+    import pandas as pd
+    steps = np.arange(64)
+    return pd.DataFrame({"longitude": -78.8 + steps * 0.05, "latitude": 35.9 + np.sin(steps / 10)}), "Track of abc123"
+
+
+_render_benchmark("countries", "draw_country_bars",
+                  lambda: _aggregated("origin_country", 30).rename_axis("origin_country").reset_index(name="flights"), (10, 8))
+_render_benchmark("positions_scatter", "draw_positions", lambda: _positions(1800), (12, 6))
+_render_benchmark("positions_raster", "draw_positions", lambda: _positions(50000), (12, 6))
+_render_benchmark("altitude_bands", "draw_altitude_bands", lambda: _aggregated("alt_band"), (4, 3))
+_render_benchmark("airlines", "draw_airline_bars", lambda: _aggregated("airline", 15), (8, 6))
+_render_benchmark("regions", "draw_region_pie", lambda: _aggregated("region"), (3.5, 3.5))
+_render_benchmark("feature_bars", "draw_feature_bars", _feature_bars, (6.4, 4.8))
+_render_benchmark("hourly_heatmap", "draw_hourly_heatmap", _hourly, (10, 2.6))
+_render_benchmark("track", "draw_track", _track, (6, 4))
+
+
+@benchmark("render_cache_hit")
+def _():
+    from charts import FigureCache, draw_country_bars
+    summary = _aggregated("origin_country", 30).rename_axis("origin_country").reset_index(name="flights")
+    cache = FigureCache()
+    cache.render("countries", summary, draw_country_bars, figsize=(10, 8))
+    return lambda: cache.render("countries", summary, draw_country_bars, figsize=(10, 8))
+
+
+# ---------- Cold start (a fresh interpreter per run, like a new container) ----------
+def _python(code, data_dir=None):
+    """
+    Return a callable that runs code in a new interpreter with src/ on the path.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(APP_PATH))
+    if data_dir is not None:
+        env["SKYLINE_DATA_DIR"] = data_dir
+    return lambda: subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+
+@benchmark("startup_imports")
+def _():
+    # Every module-level import of the app: the time before its first element can be sent to the browser
+    tree = ast.parse(open(APP_PATH).read())
+    imports = [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return _python("\n".join(imports))
+
+
+@benchmark("startup_first_render")
+def _():
+    # A complete first page load (nothing clicked yet) with a small airline store already on disk
+    from airline_store import refresh_airline_store
+    data_dir = os.path.join(os.environ["SKYLINE_DATA_DIR"], "startup")
+    refresh_airline_store(os.path.join(data_dir, "airlines.feather"), max_pages=2)
+    return _python("from streamlit.testing.v1 import AppTest\n"
+                   f"at = AppTest.from_file({APP_PATH!r}, default_timeout=120).run()\n"
+                   "assert not at.exception, at.exception", data_dir)
+
+
+# ---------- Runner ----------
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 if sys.platform != "darwin" else peak / 1024 ** 2
+
+
+def _measure(name, repeat):
+    """
+    Run one benchmark in the current (fresh) process: time `repeat` runs after a warm-up, then trace
+    the allocations of one more run.
+    """
+    import http_client
+    # The replay server is local, so the client's rate limit must not be what gets measured
+    http_client.HOST_RATE_LIMITS["127.0.0.1"] = (1e6, 1e6)
+
+    run = BENCHMARKS[name]()
+    run()  # Warm-up: imports, caches and first-call costs
+    rss_before = _peak_rss_mb()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    peak_rss = _peak_rss_mb()
+
+    tracemalloc.start()
+    run()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+
+    result = {
+        "median_ms": statistics.median(times) * 1e3,
+        "min_ms": min(times) * 1e3,
+        "peak_rss_mb": peak_rss,
+        "rss_growth_mb": peak_rss - rss_before,
+        "alloc_peak_mb": alloc_peak / 1e6,
+        "alloc_blocks": blocks,
+    }
+    # Other measurements a benchmark reports about its workload (e.g. compression ratios)
+    if getattr(run, "info", None):
+        result["info"] = run.info
+    return result
+
+
+def run_isolated(name, repeat):
+    """
+    Run one benchmark in its own process, so peak RSS and warm caches are not shared between benchmarks.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (name, repeat))
+
+
+def _git_commit():
+    """
+    Return (short commit hash, whether the working tree has changes), or ("unknown", False) outside a git checkout.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def load_history(path=HISTORY_PATH):
+    """
+    Return every stored run, oldest first.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the results next to a baseline run and return the names of benchmarks that regressed.
+    """
+    base = baseline["results"] if baseline else {}
+    label = f"vs {baseline['commit']}" if baseline else "(no baseline)"
+    print(f"{'benchmark':<40} {'median ms':>10} {'min ms':>9} {'peak RSS MB':>12} {'alloc MB':>9} {'blocks':>8}  {label}")
+    regressions = []
+    for name, result in results.items():
+        change = ""
+        if name in base and base[name]["median_ms"] > 0:
+            ratio = result["median_ms"] / base[name]["median_ms"] - 1
+            change = f"{ratio:+.0%}"
+            if ratio > threshold:
+                change += "  REGRESSION"
+                regressions.append(name)
+        print(f"{name:<40} {result['median_ms']:>10.2f} {result['min_ms']:>9.2f} {result['peak_rss_mb']:>12.1f} "
+              f"{result['alloc_peak_mb']:>9.2f} {result['alloc_blocks']:>8}  {change}")
+    for name, result in results.items():
+        if result.get("info"):
+            print(f"{name}: " + ", ".join(f"{key} {value:.2f}" for key, value in result["info"].items()))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Skyline benchmark suite")
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="median slowdown reported as a regression")
+    parser.add_argument("--baseline", help="commit to compare with (defaults to the last run of another commit)")
+    parser.add_argument("--no-save", action="store_true", help="do not append the results to the history")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if args.pattern in name]
+    if args.list:
+        print("\n".join(names))
+        return
+
+    write_fixtures()
+    with ReplayServer() as server, tempfile.TemporaryDirectory() as data_dir:
+        # Inherited by the benchmark processes: every API call goes to the replay server and nothing touches data/
+        os.environ["OPENSKY_BASE_URL"] = server.opensky_base_url
+        os.environ["AVIATIONSTACK_BASE_URL"] = server.aviationstack_base_url
+        os.environ["SKYLINE_DATA_DIR"] = data_dir
+        # Repeated airline fetches would use up the free-tier quota the ledger enforces
+        os.environ["AVIATIONSTACK_MONTHLY_QUOTA"] = str(10 ** 9)
+        results = {}
+        for name in names:
+            print(f"Running {name}…", file=sys.stderr)
+            results[name] = run_isolated(name, args.repeat)
+
+    commit, dirty = _git_commit()
+    history = load_history()
+    if args.baseline:
+        baseline = next((run for run in reversed(history) if run["commit"].startswith(args.baseline)), None)
+    else:
+        baseline = next((run for run in reversed(history) if run["commit"] != commit), None)
+    regressions = compare(results, baseline, args.threshold)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        record = {"commit": commit, "dirty": dirty, "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                  "python": platform.python_version(), "machine": platform.machine(), "repeat": args.repeat,
+                  "results": results}
+        with open(HISTORY_PATH, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
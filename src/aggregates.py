@@ -0,0 +1,379 @@
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from callsign_resolver import CallsignResolver
+
+# Altitude bands of the "Flights by Altitude Band" panel (feet)
+ALT_BINS = [-1000, 10000, 20000, 30000, 60000]
+ALT_LABELS = ["<10k", "10–20k", "20–30k", "30k+"]
+
+# Longitude bins of the "Regions" panel
+REGION_BINS = [-180, -30, 60, 180]
+REGION_LABELS = ["Americas", "Europe/Africa", "Asia-Pacific"]
+
+# Dashboard panels maintained by the aggregator
+PANELS = ("origin_country", "alt_band", "airline", "region")
+
+# Axes of the flight cube (see FlightCube)
+DIMENSIONS = ("origin_country", "airline", "alt_band", "region", "on_ground")
+ON_GROUND_LABELS = ["airborne", "on ground"]
+# Columns a cube is built from
+CUBE_COLUMNS = ("origin_country", "callsign", "baro_altitude", "longitude", "on_ground")
+
+
+def bin_codes(values, bins) -> np.ndarray:
+    """
+    Return the index of the right-closed bin (like pd.cut) of every value, or -1 for missing/out-of-range values.
+    """
+    codes = np.searchsorted(bins, np.asarray(values, dtype=np.float64), side="left") - 1
+    codes[(codes < 0) | (codes >= len(bins) - 1)] = -1
+    return codes
+
+
+class _Dictionary:
+    """
+    Growing mapping between the labels of one panel and the integer codes the counts are kept under.
+    """
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self._codes = {label: code for code, label in enumerate(self.labels)}
+
+    def encode(self, values) -> np.ndarray:
+        """
+        Return the code of every value (-1 for missing values), adding unseen labels.
+        """
+        inverse, uniques = pd.factorize(values)
+        unique_codes = np.empty(len(uniques) + 1, dtype=np.int64)
+        for i, label in enumerate(uniques):
+            label = str(label)
+            if label not in self._codes:
+                self._codes[label] = len(self.labels)
+                self.labels.append(label)
+            unique_codes[i] = self._codes[label]
+        unique_codes[-1] = -1  # factorize marks missing values with -1, which indexes this slot
+        return unique_codes[inverse]
+
+
+def flag_codes(values) -> np.ndarray:
+    """
+    Return 1 for true, 0 for false and -1 for missing values of a boolean column.
+    """
+    values = pd.Series(values)
+    codes = np.full(len(values), -1, dtype=np.int64)
+    known = values.notna().to_numpy()
+    codes[known] = values[known].astype(bool).to_numpy()
+    return codes
+
+
+def _new_dictionaries():
+    return {
+        "origin_country": _Dictionary(),
+        "alt_band": _Dictionary(ALT_LABELS),
+        "airline": _Dictionary(),
+        "region": _Dictionary(REGION_LABELS),
+        "on_ground": _Dictionary(ON_GROUND_LABELS),
+    }
+
+
+def _band_codes(df, column, source, bins, scale=1.0):
+    """
+    Return the bin codes of a band column: the codes of the derived categorical column when the snapshot
+    has it (see features.add_derived_features), otherwise computed from the source column.
+    """
+    if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+        return df[column].cat.codes.to_numpy(dtype=np.int64)
+    return bin_codes(df[source].to_numpy(dtype=np.float64, na_value=np.nan) * scale, bins)
+
+
+def _dimension_codes(df, dictionaries, airline):
+    """
+    Return the code of every aircraft on every dimension, given the already encoded airline codes.
+    """
+    return {
+        "origin_country": dictionaries["origin_country"].encode(df["origin_country"].to_numpy()),
+        "alt_band": _band_codes(df, "alt_band", "baro_altitude", ALT_BINS, scale=3.28084),  # Meters to feet
+        "airline": airline,
+        "region": _band_codes(df, "region", "longitude", REGION_BINS),
+        "on_ground": flag_codes(df["on_ground"]),
+    }
+
+
+def _bincount(codes, size):
+    """
+    Count the non-missing codes into an array of the given size.
+    """
+    return np.bincount(codes[codes >= 0], minlength=size)
+
+
+class IncrementalAggregator:
+    """
+    Running per-panel counts (country, altitude band, airline, region) over the aircraft of the latest snapshot.
+
+    The panel codes of every aircraft are remembered by icao24. When a new snapshot arrives it is aligned to
+    the previous one with a single index lookup, and only aircraft that appeared, disappeared or moved to
+    another key are applied to the counts. Callsigns are only passed to the resolver (a CallsignResolver,
+    by default with the built-in designator table) when they are new or changed.
+    """
+
+    def __init__(self, resolver=None):
+        self._lock = threading.Lock()
+        self.resolver = resolver or CallsignResolver()
+        self._dictionaries = _new_dictionaries()
+        self._counts = {panel: np.zeros(0, dtype=np.int64) for panel in PANELS}
+        self._icao24 = None
+        self._callsigns = None
+        self._codes = None
+        self._timestamp = None
+        self._cube = None
+        self.last_delta = {"appeared": 0, "disappeared": 0, "changed": 0}
+
+    def _snapshot_codes(self, df, old_pos):
+        """
+        Compute the panel codes of every aircraft in a snapshot.
+        old_pos holds the row of each aircraft in the previous snapshot (-1 if it is new).
+        """
+        callsigns = df["callsign"].to_numpy(dtype=object, na_value=None)
+        airline = np.full(len(df), -1, dtype=np.int64)
+        if self._codes is None:
+            resolve = np.ones(len(df), dtype=bool)
+        else:
+            # Reuse the airline of aircraft whose callsign did not change
+            matched = old_pos >= 0
+            resolve = ~matched
+            resolve[matched] = self._callsigns[old_pos[matched]] != callsigns[matched]
+            keep = ~resolve
+            airline[keep] = self._codes["airline"][old_pos[keep]]
+        if resolve.any():
+            names = self.resolver.resolve(df["callsign"][resolve])
+            airline[resolve] = self._dictionaries["airline"].encode(names)
+
+        return _dimension_codes(df, self._dictionaries, airline), callsigns
+
+    @metrics.timed_function("aggregate.update")
+    def update(self, df):
+        """
+        Apply a new snapshot to the running counts. Applying the same snapshot twice is a no-op.
+
+        Parameters:
+        - df (pd.DataFrame): A snapshot from fetch_opensky_snapshot().
+
+        Returns:
+        - dict: Number of aircraft that appeared, disappeared and changed key since the previous snapshot.
+        """
+        with self._lock:
+            timestamp = df.attrs.get("timestamp")
+            if timestamp is not None and timestamp == self._timestamp:
+                return self.last_delta
+
+            df = df.drop_duplicates(subset="icao24", keep="last")
+            icao24 = pd.Index(df["icao24"].to_numpy(dtype=object, na_value=""))
+            if self._icao24 is None:
+                old_pos = np.full(len(df), -1, dtype=np.int64)
+            else:
+                old_pos = self._icao24.get_indexer(icao24)
+            codes, callsigns = self._snapshot_codes(df, old_pos)
+
+            matched = old_pos >= 0
+            appeared = ~matched
+            disappeared = np.ones(0 if self._icao24 is None else len(self._icao24), dtype=bool)
+            disappeared[old_pos[matched]] = False
+            changed_any = np.zeros(len(df), dtype=bool)
+
+            for panel in PANELS:
+                size = len(self._dictionaries[panel].labels)
+                counts = np.zeros(size, dtype=np.int64)
+                counts[:len(self._counts[panel])] = self._counts[panel]
+                new = codes[panel]
+                if self._codes is None:
+                    counts += _bincount(new, size)
+                else:
+                    old = self._codes[panel]
+                    changed = np.zeros(len(df), dtype=bool)
+                    changed[matched] = old[old_pos[matched]] != new[matched]
+                    changed_any |= changed
+                    counts -= _bincount(np.concatenate([old[disappeared], old[old_pos[changed]]]), size)
+                    counts += _bincount(np.concatenate([new[appeared], new[changed]]), size)
+                self._counts[panel] = counts
+
+            self._icao24 = icao24
+            self._callsigns = callsigns
+            self._codes = codes
+            self._timestamp = timestamp
+            self._cube = None
+            self.last_delta = {
+                "appeared": int(appeared.sum()),
+                "disappeared": int(disappeared.sum()),
+                "changed": int(changed_any.sum()),
+            }
+            return self.last_delta
+
+    def top(self, panel, n=None) -> pd.Series:
+        """
+        Return the counts of one panel, largest first.
+
+        Parameters:
+        - panel (str): One of PANELS.
+        - n (int, optional): Only return the n largest counts. Defaults to all.
+
+        Returns:
+        - pd.Series: Aircraft count per key.
+        """
+        with self._lock:
+            counts = self._counts[panel].copy()
+            labels = self._dictionaries[panel].labels[:len(counts)]
+        series = pd.Series(counts, index=labels, dtype="int64")
+        series = series[series > 0].sort_values(ascending=False, kind="stable")
+        return series if n is None else series.head(n)
+
+    def cube(self):
+        """
+        Return the FlightCube of the latest snapshot, built from the codes the aggregator already keeps
+        (so callsigns are not resolved again) on first use after each update.
+        """
+        with self._lock:
+            if self._cube is None and self._codes is not None:
+                self._cube = FlightCube.from_codes(self._dictionaries, self._codes)
+            return self._cube
+
+
+class FlightCube:
+    """
+    Aircraft counts over origin_country × airline × alt_band × region × on_ground.
+
+    Only non-empty cells are stored: one row of int32 axis codes per cell (-1 for a missing value) and its count,
+    with the labels of every axis kept once in `axes`. A snapshot of 10,000 aircraft fits in a few thousand cells,
+    and any filter plus group-by is answered by masking and summing these arrays instead of rescanning the rows.
+    """
+
+    def __init__(self, axes, coords, counts):
+        self.axes = axes
+        self.coords = coords
+        self.counts = counts
+        self._positions = {dim: {label: code for code, label in enumerate(labels)} for dim, labels in axes.items()}
+
+    @staticmethod
+    def _compact(axes, coords, counts):
+        """
+        Merge rows of coords that refer to the same cell, summing their counts.
+        """
+        shape = tuple(len(axes[dim]) + 1 for dim in DIMENSIONS)
+        flat = np.ravel_multi_index(tuple(coords[:, axis] + 1 for axis in range(len(DIMENSIONS))), shape)
+        cells, inverse = np.unique(flat, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=counts, minlength=len(cells)).astype(np.int64)
+        coords = np.stack(np.unravel_index(cells, shape), axis=1).astype(np.int32) - 1
+        return coords, summed
+
+    @classmethod
+    def from_codes(cls, dictionaries, codes):
+        """
+        Build a cube from per-aircraft codes (see _dimension_codes) and the dictionaries they were encoded with.
+        """
+        axes = {dim: list(dictionaries[dim].labels) for dim in DIMENSIONS}
+        coords = np.stack([codes[dim] for dim in DIMENSIONS], axis=1)
+        coords, counts = cls._compact(axes, coords, np.ones(len(coords), dtype=np.int64))
+        return cls(axes, coords, counts)
+
+    @classmethod
+    def from_frames(cls, frames, resolver=None):
+        """
+        Build one cube over several frames with the CUBE_COLUMNS, e.g. the batches of an archive scan.
+        Every frame is reduced to its cells before the next one is read.
+
+        Parameters:
+        - frames (iterable): DataFrames with the CUBE_COLUMNS.
+        - resolver (CallsignResolver, optional): Callsign → airline resolver. Defaults to the built-in designator table.
+
+        Returns:
+        - FlightCube: Counts of aircraft observations over all frames.
+        """
+        resolver = resolver or CallsignResolver()
+        dictionaries = _new_dictionaries()
+        coords, counts = [], []
+        for df in frames:
+            if len(df) == 0:
+                continue
+            airline = dictionaries["airline"].encode(resolver.resolve(df["callsign"]))
+            cube = cls.from_codes(dictionaries, _dimension_codes(df, dictionaries, airline))
+            coords.append(cube.coords)
+            counts.append(cube.counts)
+        axes = {dim: list(dictionaries[dim].labels) for dim in DIMENSIONS}
+        if not coords:
+            return cls(axes, np.zeros((0, len(DIMENSIONS)), dtype=np.int32), np.zeros(0, dtype=np.int64))
+        # Codes never change once assigned, so the cells of earlier frames stay valid as the axes grow
+        return cls(axes, *cls._compact(axes, np.concatenate(coords), np.concatenate(counts)))
+
+    @classmethod
+    def from_snapshot(cls, df, resolver=None):
+        """
+        Build the cube of a single snapshot.
+        """
+        return cls.from_frames([df], resolver)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def nbytes(self):
+        return self.coords.nbytes + self.counts.nbytes
+
+    def labels(self, dim):
+        """
+        Return the labels of one axis.
+        """
+        return list(self.axes[dim])
+
+    def _mask(self, where):
+        """
+        Return the cells matching every filter of `where` ({dimension: label or list of labels, None for missing}).
+        """
+        mask = np.ones(len(self.counts), dtype=bool)
+        for dim, values in (where or {}).items():
+            if isinstance(values, str) or not pd.api.types.is_list_like(values):
+                values = [values]
+            positions = self._positions[dim]
+            codes = [-1 if value is None else positions.get(value, -2) for value in values]
+            mask &= np.isin(self.coords[:, DIMENSIONS.index(dim)], codes)
+        return mask
+
+    def total(self, where=None) -> int:
+        """
+        Return the number of aircraft matching the filters (see counts_by()).
+        """
+        return int(self.counts[self._mask(where)].sum())
+
+    def counts_by(self, by, where=None, dropna=True) -> pd.Series:
+        """
+        Count aircraft grouped by one or more dimensions, optionally filtered on any of them.
+
+        Parameters:
+        - by (str | list): Dimension(s) to group by, e.g. "airline" or ["origin_country", "alt_band"].
+        - where (dict, optional): {dimension: label or list of labels} filters, e.g. {"alt_band": "30k+", "on_ground": "airborne"}.
+        - dropna (bool, optional): Leave out aircraft with a missing value on a grouping dimension. Defaults to True.
+
+        Returns:
+        - pd.Series: Aircraft count per group (a MultiIndex for several dimensions), largest first.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        axes = [DIMENSIONS.index(dim) for dim in by]
+        mask = self._mask(where)
+        if dropna:
+            mask &= (self.coords[:, axes] >= 0).all(axis=1)
+        coords, counts = self.coords[mask], self.counts[mask]
+
+        shape = tuple(len(self.axes[dim]) + 1 for dim in by)
+        flat = np.ravel_multi_index(tuple(coords[:, axis] + 1 for axis in axes), shape)
+        cells, inverse = np.unique(flat, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=counts, minlength=len(cells)).astype(np.int64)
+        keys = np.unravel_index(cells, shape)
+        levels = [np.array([None] + self.axes[dim], dtype=object)[key] for dim, key in zip(by, keys)]
+        if len(by) == 1:
+            index = pd.Index(levels[0], name=by[0])
+        else:
+            index = pd.MultiIndex.from_arrays(levels, names=by)
+        series = pd.Series(summed, index=index, name="flights")
+        return series.sort_values(ascending=False, kind="stable")
@@ -0,0 +1,154 @@
+
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from cli_demo import DATA_DIR, fetch_all_airlines
+
+AIRLINE_STORE_PATH = os.path.join(DATA_DIR, "airlines.feather")
+# Airline reference data changes rarely, so refresh it once a month by default
+AIRLINE_STORE_MAX_AGE = float(os.environ.get("AIRLINE_STORE_MAX_AGE_DAYS", 30)) * 24 * 3600
+
+# Typed columns of the normalized airline frame; everything else is kept as nullable strings
+INT_COLUMNS = ["fleet_size", "date_founded"]
+FLOAT_COLUMNS = ["fleet_average_age"]
+CATEGORY_COLUMNS = ["country_name", "country_iso2", "status", "type"]
+
+
+def normalize_airlines(airlines) -> pd.DataFrame:
+    """
+    Build the typed airline frame from raw aviationstack records (or an already loaded frame).
+    Numeric fields become nullable Int64/Float64 columns where empty strings are missing values,
+    and low-cardinality fields such as country_name become categories.
+
+    Parameters:
+    - airlines (list | pd.DataFrame): Airline records as returned in the "data" field of the airlines endpoint.
+
+    Returns:
+    - pd.DataFrame: One row per airline with proper nullable dtypes.
+    """
+    df = airlines if isinstance(airlines, pd.DataFrame) else pd.json_normalize(airlines)
+    df = df.copy()
+    for col in df.columns:
+        if col in INT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int64")
+        elif col in FLOAT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Float64")
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("string").replace("", pd.NA).astype("category")
+        else:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def refresh_airline_store(path=AIRLINE_STORE_PATH, max_pages=None):
+    """
+    Fetch the aviationstack airlines (see fetch_all_airlines) and persist them as an uncompressed Feather file.
+    The file is written next to the target and renamed into place, so readers never see a partial file.
+
+    Parameters:
+    - path (str, optional): Location of the Feather file. Defaults to AIRLINE_STORE_PATH.
+    - max_pages (int, optional): Page cap passed to fetch_all_airlines (None uses its default).
+
+    Returns:
+    - int: The number of airlines stored.
+    """
+    kwargs = {} if max_pages is None else {"max_pages": max_pages}
+    airlines = fetch_all_airlines(**kwargs)
+    if not airlines:
+        raise RuntimeError("aviationstack returned no airlines, keeping the existing store")
+
+    df = normalize_airlines(airlines)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    # Uncompressed Feather (Arrow IPC) can be memory-mapped without a copy
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    return len(df)
+
+
+def invalidate_airline_store(path=AIRLINE_STORE_PATH):
+    """
+    Delete the stored airline data so the next load fetches it again.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def airline_store_age(path=AIRLINE_STORE_PATH):
+    """
+    Return the age of the stored airline data in seconds, or None if nothing is stored.
+    """
+    try:
+        return time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+
+
+def load_airline_table(path=AIRLINE_STORE_PATH, max_age=AIRLINE_STORE_MAX_AGE, refresh=True):
+    """
+    Load the stored airline data as a memory-mapped Arrow table.
+    The store is (re)fetched only when it is missing or older than max_age. If that refresh
+    fails and an older copy exists, the older copy is served instead.
+
+    Parameters:
+    - path (str, optional): Location of the Feather file. Defaults to AIRLINE_STORE_PATH.
+    - max_age (float, optional): Maximum age in seconds before refreshing (None never refreshes an existing store). Defaults to AIRLINE_STORE_MAX_AGE.
+    - refresh (bool, optional): Fetch from aviationstack when needed. With False (e.g. when the background
+      poller owns the store) the store is only read, and a missing store raises FileNotFoundError. Defaults to True.
+
+    Returns:
+    - pa.Table: The stored airlines, one row per airline.
+    """
+    age = airline_store_age(path)
+    if refresh and (age is None or (max_age is not None and age > max_age)):
+        try:
+            refresh_airline_store(path)
+        except Exception:
+            if age is None:
+                raise
+    return feather.read_table(path, memory_map=True)
+
+
+def load_airline_frame(path=AIRLINE_STORE_PATH, max_age=AIRLINE_STORE_MAX_AGE, refresh=True) -> pd.DataFrame:
+    """
+    Load the stored airline data as the typed frame produced by normalize_airlines() (see load_airline_table).
+
+    Returns:
+    - pd.DataFrame: One row per airline.
+    """
+    # Normalizing again is cheap for an already typed store and upgrades stores written as plain strings
+    return normalize_airlines(load_airline_table(path, max_age, refresh).to_pandas())
+
+
+def get_airline_feature_dict(feature_type, cast_type, airlines=None):
+    """
+    Return a dictionary of airline names along with their values for the specified feature type.
+    Airlines without a value for the feature are left out.
+    
+    Parameters:
+    - feature_type (str): The specified feature type to extract (e.g., "fleet_size", "fleet_average_age", "date_founded").
+    - cast_type (str): The type to cast the feature value to ("int", "float", or "str")
+    - airlines (pd.DataFrame, optional): The typed airline frame. Defaults to load_airline_frame().
+    
+    Returns:
+    - dict: A dictionary whose keys are airline names and values are the corresponding feature values.
+    """
+    if airlines is None:
+        airlines = load_airline_frame()
+    values = airlines.dropna(subset=[feature_type]).set_index("airline_name")[feature_type]
+    dtype = {"int": "Int64", "float": "Float64"}.get(cast_type, "string")
+    return values.astype(dtype).to_dict()
+
+
+if __name__ == "__main__":
+    print("Refreshing airline store from aviationstack…")
+    count = refresh_airline_store()
+    print(f"Stored {count} airlines in {AIRLINE_STORE_PATH}")
@@ -0,0 +1,342 @@
+
+import glob
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cli_demo import DATA_DIR, fetch_opensky_snapshot
+
+ARCHIVE_DIR = os.path.join(DATA_DIR, "snapshots")
+# Rows per Parquet row group; every row group carries min/max statistics used to skip data
+ROW_GROUP_SIZE = 16384
+
+# On-disk schema of archived snapshots. Categories are stored as plain strings (Parquet
+# dictionary-encodes them anyway) so files written with different categories stay compatible.
+ARCHIVE_SCHEMA = pa.schema([
+    ("snapshot_time", pa.timestamp("s")),
+    ("icao24", pa.string()),
+    ("callsign", pa.string()),
+    ("origin_country", pa.string()),
+    ("time_position", pa.int64()),
+    ("last_contact", pa.timestamp("s")),
+    ("longitude", pa.float32()),
+    ("latitude", pa.float32()),
+    ("baro_altitude", pa.float32()),
+    ("on_ground", pa.bool_()),
+    ("velocity", pa.float32()),
+    ("true_track", pa.float32()),
+    ("vertical_rate", pa.float32()),
+    ("geo_altitude", pa.float32()),
+    ("squawk", pa.string()),
+    ("spi", pa.bool_()),
+    ("position_source", pa.int8()),
+])
+PARTITION_SCHEMA = pa.schema([("date", pa.string()), ("hour", pa.int32())])
+
+
+def _partition_dir(root, timestamp):
+    """
+    Return the date/hour partition directory for a snapshot time, e.g. root/date=2025-09-01/hour=13.
+    """
+    return os.path.join(root, f"date={timestamp:%Y-%m-%d}", f"hour={timestamp.hour:02d}")
+
+
+def _write_parquet(tables, path):
+    """
+    Write one or more tables with ARCHIVE_SCHEMA to a single Parquet file, atomically.
+    """
+    # Files starting with "." are ignored by dataset discovery, so readers never see partial files
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with pq.ParquetWriter(tmp_path, ARCHIVE_SCHEMA, compression="zstd", write_statistics=True) as writer:
+        for table in tables:
+            writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+
+
+def append_snapshot(df, root=ARCHIVE_DIR):
+    """
+    Append one snapshot from fetch_opensky_snapshot() to the archive as a new Parquet file.
+    Rows are sorted by origin_country so the row-group statistics can skip countries that are not queried.
+
+    Parameters:
+    - df (pd.DataFrame): The snapshot, with its time in df.attrs["timestamp"].
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+
+    Returns:
+    - str: The path of the written file.
+    """
+    timestamp = df.attrs.get("timestamp") or datetime.utcnow()
+    snapshot = df.assign(snapshot_time=pd.Timestamp(timestamp).floor("s")).sort_values("origin_country")
+    snapshot.attrs = {}  # The timestamp is stored as a column, not as Arrow metadata
+    table = pa.Table.from_pandas(snapshot[ARCHIVE_SCHEMA.names], preserve_index=False).cast(ARCHIVE_SCHEMA)
+
+    partition = _partition_dir(root, timestamp)
+    os.makedirs(partition, exist_ok=True)
+    path = os.path.join(partition, f"part-{timestamp:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet")
+    _write_parquet([table], path)
+    return path
+
+
+def compact_partition(partition, min_files=2):
+    """
+    Merge the small per-snapshot files of one partition into a single file.
+    Each source file becomes its own row group(s), so statistics on snapshot_time still prune by time.
+
+    Parameters:
+    - partition (str): The date/hour partition directory.
+    - min_files (int, optional): Only compact when at least this many files exist. Defaults to 2.
+
+    Returns:
+    - int: The number of files that were merged (0 if nothing was done).
+    """
+    files = sorted(glob.glob(os.path.join(partition, "*.parquet")))
+    if len(files) < min_files:
+        return 0
+
+    first = os.path.basename(files[0]).split("-")[1]
+    path = os.path.join(partition, f"compacted-{first}-{uuid.uuid4().hex[:8]}.parquet")
+    _write_parquet((pq.read_table(f).cast(ARCHIVE_SCHEMA) for f in files), path)
+    for f in files:
+        os.remove(f)
+    return len(files)
+
+
+def compact_archive(root=ARCHIVE_DIR, before=None):
+    """
+    Compact every partition whose hour ended before `before`, so partitions still being written are left alone.
+
+    Parameters:
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+    - before (datetime, optional): UTC cut-off. Defaults to the start of the current hour.
+
+    Returns:
+    - int: The number of files that were merged.
+    """
+    if before is None:
+        before = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    merged = 0
+    for partition, hour in archive_partitions(root, end=before):
+        if hour + timedelta(hours=1) <= before:
+            merged += compact_partition(partition)
+    return merged
+
+
+def compact_finished_hours(root=ARCHIVE_DIR, current_hour=None):
+    """
+    Compact the partitions of finished hours once a new UTC hour has started since `current_hour`.
+    Meant to be called after every append by a process that writes the archive.
+
+    Parameters:
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+    - current_hour (datetime, optional): What the previous call returned (None on the first call).
+
+    Returns:
+    - tuple: (the start of the current UTC hour, to pass to the next call; the number of files that were merged).
+    """
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    merged = 0
+    if current_hour is not None and hour != current_hour:
+        merged = compact_archive(root, before=hour)
+    return hour, merged
+
+
+def archive_filter(start=None, end=None, filters=None):
+    """
+    Build a dataset filter for a snapshot time range.
+    Partition columns are filtered too, so whole date/hour directories outside the range are never opened.
+
+    Parameters:
+    - start (datetime, optional): Inclusive UTC start of the range.
+    - end (datetime, optional): Exclusive UTC end of the range.
+    - filters (pyarrow.dataset.Expression, optional): An extra filter, e.g. ds.field("origin_country") == "France".
+
+    Returns:
+    - pyarrow.dataset.Expression | None: The combined filter.
+    """
+    expressions = [] if filters is None else [filters]
+    if start is not None:
+        expressions.append(ds.field("date") >= f"{start:%Y-%m-%d}")
+        expressions.append(ds.field("snapshot_time") >= pa.scalar(start, pa.timestamp("s")))
+    if end is not None:
+        expressions.append(ds.field("date") <= f"{end:%Y-%m-%d}")
+        expressions.append(ds.field("snapshot_time") < pa.scalar(end, pa.timestamp("s")))
+    if not expressions:
+        return None
+    combined = expressions[0]
+    for expression in expressions[1:]:
+        combined = combined & expression
+    return combined
+
+
+def open_archive(root=ARCHIVE_DIR):
+    """
+    Open the archive as a hive-partitioned Parquet dataset (nothing is read until it is scanned).
+    """
+    schema = pa.unify_schemas([ARCHIVE_SCHEMA, PARTITION_SCHEMA])
+    partitioning = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+    return ds.dataset(root, format="parquet", schema=schema, partitioning=partitioning)
+
+
+def read_archive(columns=None, start=None, end=None, filters=None, root=ARCHIVE_DIR) -> pd.DataFrame:
+    """
+    Read archived snapshots into a DataFrame, loading only the requested columns and the row groups matching the filters.
+
+    Parameters:
+    - columns (list, optional): Columns to load. Defaults to all columns.
+    - start, end, filters: See archive_filter().
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+
+    Returns:
+    - pd.DataFrame: One row per aircraft per snapshot.
+    """
+    table = open_archive(root).to_table(columns=columns, filter=archive_filter(start, end, filters))
+    df = table.to_pandas()
+    if "origin_country" in df.columns:
+        df["origin_country"] = df["origin_country"].astype("category")
+    return df
+
+
+def archive_partitions(root=ARCHIVE_DIR, start=None, end=None):
+    """
+    Return the date/hour partition directories that overlap [start, end), oldest first.
+
+    Parameters:
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+    - start (datetime, optional): Inclusive UTC start of the range.
+    - end (datetime, optional): Exclusive UTC end of the range.
+
+    Returns:
+    - list: (partition directory, UTC start of its hour) tuples.
+    """
+    partitions = []
+    for partition in glob.glob(os.path.join(root, "date=*", "hour=*")):
+        date = os.path.basename(os.path.dirname(partition)).split("=")[1]
+        hour = datetime.strptime(date, "%Y-%m-%d") + timedelta(hours=int(os.path.basename(partition).split("=")[1]))
+        if (start is None or hour + timedelta(hours=1) > start) and (end is None or hour < end):
+            partitions.append((partition, hour))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def iter_snapshots(start=None, end=None, root=ARCHIVE_DIR):
+    """
+    Yield the archived snapshots in [start, end) one at a time, in time order, reading one row group at a time.
+    Each snapshot has the dtypes of state_vectors.STATE_DTYPES and its time in df.attrs["timestamp"], like
+    the frames returned by parse_states_payload() (the derived feature columns are not archived).
+
+    Parameters:
+    - start (datetime, optional): Inclusive UTC start of the range.
+    - end (datetime, optional): Exclusive UTC end of the range.
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+    """
+    from state_vectors import STATE_DTYPES
+
+    def finish(df):
+        snapshot_time = df["snapshot_time"].iloc[0]
+        df = df.drop(columns="snapshot_time").reset_index(drop=True)
+        df = df.astype({column: dtype for column, dtype in STATE_DTYPES.items() if column in df.columns})
+        df.attrs["timestamp"] = snapshot_time.to_pydatetime()
+        return df
+
+    pending = None  # A snapshot may continue in the next row group
+    for partition, _ in archive_partitions(root, start, end):
+        # Both part-<time>-… and compacted-<time>-… files carry the time of their first snapshot
+        files = sorted(glob.glob(os.path.join(partition, "*.parquet")), key=lambda f: os.path.basename(f).split("-")[1])
+        for path in files:
+            parquet = pq.ParquetFile(path)
+            for row_group in range(parquet.num_row_groups):
+                df = parquet.read_row_group(row_group).to_pandas()
+                if start is not None:
+                    df = df[df["snapshot_time"] >= start]
+                if end is not None:
+                    df = df[df["snapshot_time"] < end]
+                for snapshot_time, rows in df.groupby("snapshot_time", sort=True):
+                    if pending is not None and pending["snapshot_time"].iloc[0] == snapshot_time:
+                        pending = pd.concat([pending, rows])
+                        continue
+                    if pending is not None:
+                        yield finish(pending)
+                    pending = rows
+    if pending is not None:
+        yield finish(pending)
+
+
+def archive_counts(by, start=None, end=None, filters=None, root=ARCHIVE_DIR) -> pd.DataFrame:
+    """
+    Count archived aircraft observations grouped by the given columns.
+    The archive is scanned batch by batch and only the grouping columns are read, so memory stays
+    proportional to the number of groups rather than the number of archived rows.
+
+    Parameters:
+    - by (list): Columns to group by, e.g. ["origin_country"] or ["snapshot_time", "origin_country"].
+    - start, end, filters: See archive_filter().
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+
+    Returns:
+    - pd.DataFrame: The grouping columns plus a "count" column, sorted by count (largest first).
+    """
+    scanner = open_archive(root).scanner(columns=list(by), filter=archive_filter(start, end, filters))
+    partials = []
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            counts = pa.Table.from_batches([batch]).group_by(list(by)).aggregate([([], "count_all")])
+            partials.append(counts.to_pandas())
+    if not partials:
+        return pd.DataFrame(columns=list(by) + ["count"])
+    counts = pd.concat(partials).groupby(list(by), dropna=False)["count_all"].sum()
+    return counts.rename("count").sort_values(ascending=False).reset_index()
+
+
+def archive_cube(start=None, end=None, filters=None, root=ARCHIVE_DIR, resolver=None):
+    """
+    Build a FlightCube of archived aircraft observations, for slicing the history by country, airline,
+    altitude band, region and on_ground without reading it again. Only the CUBE_COLUMNS are read, batch by batch.
+
+    Parameters:
+    - start, end, filters: See archive_filter().
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+    - resolver (CallsignResolver, optional): Callsign → airline resolver. Defaults to the built-in designator table.
+
+    Returns:
+    - FlightCube: Observation counts (an aircraft seen in 10 snapshots counts 10 times).
+    """
+    from aggregates import CUBE_COLUMNS, FlightCube
+
+    scanner = open_archive(root).scanner(columns=list(CUBE_COLUMNS), filter=archive_filter(start, end, filters))
+    return FlightCube.from_frames((batch.to_pandas() for batch in scanner.to_batches()), resolver)
+
+
+def record_snapshots(interval=10, count=None, root=ARCHIVE_DIR, fetch_fn=fetch_opensky_snapshot):
+    """
+    Poll OpenSky forever (or `count` times) and append every snapshot to the archive.
+    Partitions are compacted whenever a new hour starts.
+
+    Parameters:
+    - interval (float, optional): Seconds between polls; OpenSky allows about one request every 10 seconds. Defaults to 10.
+    - count (int, optional): Stop after this many polls. Defaults to None (run until interrupted).
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+    - fetch_fn (callable, optional): Returns one snapshot. Defaults to fetch_opensky_snapshot.
+    """
+    polls = 0
+    current_hour = None
+    while count is None or polls < count:
+        started = time.monotonic()
+        try:
+            df = fetch_fn()
+            path = append_snapshot(df, root)
+            print(f"Recorded {len(df)} flights at {df.attrs.get('timestamp')} -> {path}")
+        except Exception as e:
+            print("Error:", e)
+        polls += 1
+
+        current_hour, merged = compact_finished_hours(root, current_hour)
+        if merged:
+            print(f"Compacted {merged} files")
+
+        if count is None or polls < count:
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
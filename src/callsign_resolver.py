@@ -0,0 +1,125 @@
+
+import threading
+
+import pandas as pd
+
+# Built-in ICAO airline designators, used when the airline store is unavailable and to
+# fill codes the store does not know about
+FALLBACK_DESIGNATORS = {
+    "AAL": "American Airlines",
+    "DAL": "Delta Air Lines",
+    "UAL": "United Airlines",
+    "SWA": "Southwest Airlines",
+    "JBU": "Jet Blue Airways",
+    "FFT": "Frontier Airlines",
+    "NKS": "Spirit Airlines",
+    "ASA": "Alaska Airlines",
+    "UPS": "UPS Airlines",
+    "FDX": "Fed Ex Express",
+    "BAW": "British Airways",
+    "DLH": "Lufthansa",
+    "AFR": "Air France",
+    "KLM": "KLM Royal Dutch Airlines",
+    "UAE": "Emirates",
+}
+
+PRIVATE_GA = "Private/GA"
+NO_NAME = "No Name"
+
+# Memoized callsigns are dropped once this many distinct callsigns have been seen
+MAX_MEMO_SIZE = 200_000
+
+
+def designators_from_airlines(airlines) -> dict:
+    """
+    Build the ICAO designator → airline name table from the typed airline frame (see airline_store).
+    When several airlines share a designator, an active airline wins over a defunct one.
+
+    Parameters:
+    - airlines (pd.DataFrame): The airline frame with "icao_code", "airline_name" and optionally "status" columns.
+
+    Returns:
+    - dict: Upper-case 3-letter ICAO code → airline name.
+    """
+    table = airlines.dropna(subset=["icao_code", "airline_name"])
+    codes = table["icao_code"].astype(str).str.strip().str.upper()
+    table = table.assign(icao_code=codes)[codes.str.fullmatch(r"[A-Z]{3}")]
+    if "status" in table.columns:
+        # Sort active airlines last so they overwrite other airlines with the same code
+        table = table.assign(_active=table["status"].astype(str).eq("active")).sort_values("_active", kind="stable")
+    return dict(zip(table["icao_code"], table["airline_name"].astype(str)))
+
+
+class CallsignResolver:
+    """
+    Maps callsigns to airline names through the ICAO designator in their first three letters.
+
+    A whole callsign column is resolved at once: the column is factorized, only distinct callsigns
+    that were never seen before go through the (vectorized) prefix extraction, and the result is a
+    categorical built from the codes. Resolved callsigns are memoized across calls.
+    """
+
+    def __init__(self, designators=None):
+        self.designators = dict(FALLBACK_DESIGNATORS)
+        self.designators.update(designators or {})
+        self._memo = {}
+        self._lock = threading.Lock()  # The resolver is shared by every session of the app
+
+    @classmethod
+    def from_airlines(cls, airlines):
+        """
+        Create a resolver from the typed airline frame (see designators_from_airlines).
+        """
+        return cls(designators_from_airlines(airlines))
+
+    def _resolve_new(self, callsigns):
+        """
+        Resolve distinct, not yet memoized callsigns (a list of strings) to airline names.
+        """
+        # Clean callsigns
+        cs = pd.Series(callsigns, dtype=object).str.upper().str.strip()
+
+        # Extract exactly 3 leading letters (ICAO airline code)
+        prefix = cs.str.extract(r'^([A-Z]{3})', expand=False)
+        names = prefix.map(self.designators).fillna(prefix)
+
+        # Tag N-registered private aircraft
+        n_reg_mask = prefix.isna() & cs.str.match(r'^N[0-9A-Z]+', na=False)
+        names = names.where(~n_reg_mask, PRIVATE_GA)
+
+        # Fill remaining blanks
+        return names.fillna(NO_NAME).tolist()
+
+    def resolve(self, callsigns) -> pd.Series:
+        """
+        Return the airline name of every callsign.
+        Unknown designators are returned as the 3-letter code itself, N-registered private aircraft as
+        "Private/GA" and missing or unparseable callsigns as "No Name".
+
+        Parameters:
+        - callsigns (pd.Series): Callsigns, e.g. the "callsign" column of a snapshot or departures frame.
+
+        Returns:
+        - pd.Series: Categorical airline names with the same index as callsigns.
+        """
+        codes, uniques = pd.factorize(callsigns)
+        uniques = [str(value) for value in uniques]
+
+        # Names are collected in a local dict, so another thread clearing the memo only means more to resolve here
+        with self._lock:
+            resolved = {value: self._memo.get(value) for value in uniques}
+        new = [value for value, name in resolved.items() if name is None]
+        if new:
+            names = dict(zip(new, self._resolve_new(new)))
+            resolved.update(names)
+            with self._lock:
+                if len(self._memo) > MAX_MEMO_SIZE:
+                    self._memo.clear()
+                self._memo.update(names)
+
+        # Map each distinct callsign to a category, with one extra slot for missing callsigns
+        names = [resolved[value] for value in uniques] + [NO_NAME]
+        name_codes, categories = pd.factorize(pd.Series(names, dtype=object))
+        # Drop the extra slot when nothing is missing, so "No Name" does not show up with 0 in value_counts()
+        airline = pd.Categorical.from_codes(name_codes[codes], categories=categories).remove_unused_categories()
+        return pd.Series(airline, index=getattr(callsigns, "index", None), name="airline")
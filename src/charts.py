@@ -0,0 +1,238 @@
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# Rendered images kept in memory (a PNG of one dashboard chart is typically 20-80 KB); 0 renders every chart on every rerun
+MAX_CACHED_FIGURES = int(os.environ.get("SKYLINE_FIGURE_CACHE_SIZE", 64))
+# Above this many points the position scatter is drawn as a density raster instead of markers
+RASTER_SCATTER_THRESHOLD = 5000
+# Cells of the density raster (0.5 degree)
+RASTER_BINS = (720, 360)
+
+
+@lru_cache(maxsize=None)
+def _figure_class():
+    """
+    Import matplotlib with the Agg backend on the first render only; the import takes about half a second,
+    which pages and processes that never draw a chart (or only serve cached images) should not pay.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    return Figure
+
+
+def fingerprint(data) -> str:
+    """
+    Return a short hash of the data a chart is drawn from.
+    Supports pandas objects, NumPy arrays, scalars and (nested) tuples/lists of them.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    def feed(value):
+        if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+            digest.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+            digest.update(repr(getattr(value, "columns", getattr(value, "name", None))).encode())
+        elif isinstance(value, np.ndarray):
+            digest.update(str(value.dtype).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (tuple, list)):
+            for item in value:
+                feed(item)
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b"|")
+
+    feed(data)
+    return digest.hexdigest()
+
+
+def render_figure(kind, data, draw, figsize=(6.4, 4.8), fmt="png", dpi=150) -> bytes:
+    """
+    Draw a chart and return the encoded image, without caching it. For charts whose data changes on every
+    rerun, which would only push the reusable charts out of a FigureCache (see FigureCache.render for the parameters).
+    """
+    fig = _figure_class()(figsize=figsize)
+    try:
+        with metrics.timed(f"render.{kind}"):
+            draw(fig.subplots(), data)
+            buffer = BytesIO()
+            fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+    finally:
+        fig.clear()  # Release the artists (and any large arrays they hold) right away
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """
+    Bounded LRU cache of rendered chart images keyed on (chart kind, data fingerprint, size, format).
+
+    Figures are created with matplotlib.figure.Figure instead of pyplot, so they are never registered in
+    pyplot's global figure manager; each one is cleared right after rendering and only the bytes are kept.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_FIGURES, dpi=150):
+        self.max_entries = max_entries
+        self.dpi = dpi
+        self._lock = threading.Lock()
+        self._images = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, kind, data, draw, figsize=(6.4, 4.8), fmt="png") -> bytes:
+        """
+        Return the rendered chart, drawing it only if the same chart was not rendered before.
+
+        Parameters:
+        - kind (str): Name of the chart, part of the cache key.
+        - data: The data the chart is drawn from (see fingerprint()).
+        - draw (callable): draw(ax, data) draws the chart on a fresh Axes.
+        - figsize (tuple, optional): Figure size in inches. Defaults to (6.4, 4.8).
+        - fmt (str, optional): "png" or "svg". Defaults to "png".
+
+        Returns:
+        - bytes: The encoded image.
+        """
+        key = (kind, fingerprint(data), tuple(figsize), fmt)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+            self.misses += 1
+
+        image = render_figure(kind, data, draw, figsize, fmt, self.dpi)
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    def stats(self):
+        """
+        Return the hit/miss counters and the number and total size of cached images.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._images),
+                    "bytes": sum(len(image) for image in self._images.values())}
+
+
+def draw_country_bars(ax, summary):
+    """
+    Horizontal bars of flights per country (summary has "origin_country" and "flights" columns).
+    """
+    ax.barh(summary["origin_country"].astype(str), summary["flights"])
+    ax.set_xlabel("Flights (current snapshot)")
+    ax.set_ylabel("Country")
+    ax.set_title("Top 30 Countries by Active Flights")
+    ax.invert_yaxis()  # Largest at top
+
+
+def draw_positions(ax, positions):
+    """
+    Aircraft positions; positions is (longitude array, latitude array, viewport) where viewport is
+    (min latitude, max latitude, min longitude, max longitude), e.g. spatial_index.VIEWPORTS["World"].
+    Large snapshots are binned into a fixed-size density raster, so drawing time does not grow with the number of aircraft.
+    """
+    longitude, latitude, (lat_min, lat_max, lon_min, lon_max) = positions
+    if len(longitude) > RASTER_SCATTER_THRESHOLD:
+        density, _, _ = np.histogram2d(longitude, latitude, bins=RASTER_BINS, range=[[lon_min, lon_max], [lat_min, lat_max]])
+        # Log scale so sparse areas stay visible next to busy hubs; empty cells are left blank
+        density = np.ma.masked_equal(np.log1p(density.T), 0)
+        ax.imshow(density, origin="lower", extent=(lon_min, lon_max, lat_min, lat_max), aspect="auto",
+                  cmap="viridis", interpolation="nearest")
+    else:
+        # Rasterized markers keep vector (SVG) output small
+        ax.scatter(longitude, latitude, s=2, alpha=0.5, rasterized=True)
+    ax.set_xlim(lon_min, lon_max)
+    ax.set_ylim(lat_min, lat_max)
+    ax.set_title("Flight Positions")
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+
+
+def draw_altitude_bands(ax, alt_counts):
+    """
+    Bars of aircraft per altitude band.
+    """
+    ax.bar(alt_counts.index.astype(str), alt_counts.to_numpy(), color="mediumseagreen", alpha=0.8)
+    ax.set_title("Flights by Altitude Band (feet)")
+    ax.set_xlabel("Altitude band")
+    ax.set_ylabel("Aircraft")
+
+
+def draw_airline_bars(ax, airline_counts):
+    """
+    Horizontal bars of aircraft per airline.
+    """
+    ax.barh(airline_counts.index.astype(str), airline_counts.to_numpy(), color="slateblue", alpha=0.85)
+    ax.set_title("Top 15 Airlines by Callsign")
+    ax.set_xlabel("Aircraft")
+    ax.invert_yaxis()
+
+
+def draw_region_pie(ax, region_counts):
+    """
+    Pie of aircraft per broad region.
+    """
+    ax.pie(region_counts.to_numpy(), labels=region_counts.index.astype(str), autopct="%1.0f%%")
+    ax.set_title("Regions")
+
+
+def draw_feature_bars(ax, data):
+    """
+    Bars of an airline profile feature; data is (feature_series, title, ylabel, bottom_ylim).
+    """
+    feature_series, title, ylabel, bottom_ylim = data
+    bars = ax.bar(feature_series.index.astype(str), feature_series.to_numpy())
+    ax.set_title(title)
+    ax.set_xlabel("Airline")
+    ax.set_ylabel(ylabel)
+    ax.bar_label(bars, padding=3)
+    ax.tick_params(axis="x", rotation=90)
+    ax.set_ylim(bottom=bottom_ylim)
+
+
+def draw_hourly_heatmap(ax, hourly):
+    """
+    Two-row heatmap (departures, arrivals) over the 24 local hours of an hourly_counts_for_day() frame.
+    """
+    matrix = [hourly["departures"].tolist(), hourly["arrivals"].tolist()]
+    im = ax.imshow(matrix, aspect="auto")
+    ax.set_yticks([0, 1], labels=["Departures", "Arrivals"])
+    ax.set_xticks(range(24))
+    ax.set_xlabel("Hour (local)")
+    ax.figure.colorbar(im, ax=ax, shrink=0.8)
+
+
+def draw_hourly_bars(ax, data):
+    """
+    Bars of flights per local hour; data is (hourly frame, column, title).
+    """
+    hourly, column, title = data
+    ax.bar(hourly["hour"], hourly[column])
+    ax.set_title(title)
+    ax.set_xlabel("Hour (local)")
+    ax.set_ylabel("Flights")
+
+
+def draw_track(ax, data):
+    """
+    Path of one aircraft from its stored fixes; data is (track frame from TrackStore.track(), title).
+    """
+    track, title = data
+    ax.plot(track["longitude"], track["latitude"], marker=".", markersize=4, linewidth=1)
+    ax.plot(track["longitude"].iloc[-1:], track["latitude"].iloc[-1:], marker="o", color="crimson")  # Latest fix
+    ax.set_title(title)
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.set_aspect("equal", adjustable="datalim")
@@ -1,58 +1,229 @@
 
-import requests
+import argparse
 import pandas as pd
-from datetime import datetime
 from dotenv import load_dotenv
 import os
 import time
+from datetime import datetime, timezone
 
-OPENSKY_URL = "https://opensky-network.org/api/states/all"
-OPENSKY_URL_DEPARTURES = "https://opensky-network.org/api/flights/departure"
+from functools import partial
+
+import metrics
+from http_client import default_client
+from state_vectors import parse_states_payload
+from features import add_derived_features
+# With SKYLINE_DEMO_SCALE set, the fetch functions below serve synthetic traffic instead of calling the APIs
+from demo_mock import DEMO_SCALE, demo_airlines_page, demo_airport_flights, demo_states_frame
+
+# Base URLs can be overridden, e.g. to point the app at a local stub server
+OPENSKY_BASE_URL = os.environ.get("OPENSKY_BASE_URL", "https://opensky-network.org/api")
+AVIATIONSTACK_BASE_URL = os.environ.get("AVIATIONSTACK_BASE_URL", "https://api.aviationstack.com/v1")
+
+OPENSKY_URL = f"{OPENSKY_BASE_URL}/states/all"
+OPENSKY_URL_DEPARTURES = f"{OPENSKY_BASE_URL}/flights/departure"
+OPENSKY_URL_ARRIVALS = f"{OPENSKY_BASE_URL}/flights/arrival"
+AVIATIONSTACK_AIRLINES_URL = f"{AVIATIONSTACK_BASE_URL}/airlines"
+
+# (connect, read) timeouts per endpoint in seconds
+OPENSKY_STATES_TIMEOUT = (5, 20)
+OPENSKY_FLIGHTS_TIMEOUT = (5, 30)
+AVIATIONSTACK_TIMEOUT = (5, 30)
+AVIATIONSTACK_PAGE_LIMIT = int(os.environ.get("AVIATIONSTACK_PAGE_LIMIT", 100))
+# Pages per airline refresh (0 fetches every page, ~130 requests); synthetic pages are free, so demo mode fetches them all
+AVIATIONSTACK_MAX_PAGES = int(os.environ.get("AVIATIONSTACK_MAX_PAGES", 0 if DEMO_SCALE else 10))
+AVIATIONSTACK_MONTHLY_QUOTA = int(os.environ.get("AVIATIONSTACK_MONTHLY_QUOTA", 100)) # Free tier
+
+# Local storage for reference data (airlines, ...) so it is not re-fetched on every rerun
+# (with SKYLINE_DEMO_SCALE set, synthetic data goes to data/demo/ so it never mixes with recorded data)
+DATA_DIR = os.environ.get("SKYLINE_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                                                           *(["demo"] if DEMO_SCALE else [])))
+
+# Fields of a flight in the OpenSky arrivals/departures responses
+FLIGHT_COLUMNS = [
+    "icao24", "firstSeen", "estDepartureAirport", "lastSeen", "estArrivalAirport", "callsign",
+    "estDepartureAirportHorizDistance", "estDepartureAirportVertDistance", "estArrivalAirportHorizDistance",
+    "estArrivalAirportVertDistance", "departureAirportCandidatesCount", "arrivalAirportCandidatesCount"
+]
+# Arrivals/departures are fetched in UTC-day chunks; OpenSky rejects windows longer than 7 days
+FLIGHTS_CHUNK = 24 * 3600
+# OpenSky processes flights in a nightly batch, so a day is final (and cached forever) a day after it ends
+FLIGHTS_FINAL_AFTER = 24 * 3600
+FLIGHTS_CACHE_DIR = os.path.join(DATA_DIR, "flights")
+
+# Requests spent on the aviationstack monthly budget, kept on disk across restarts
+aviationstack_quota = metrics.QuotaLedger(os.path.join(DATA_DIR, "api_usage.json"), "aviationstack",
+                                          AVIATIONSTACK_MONTHLY_QUOTA, period="month")
 
 def fetch_opensky_snapshot() -> pd.DataFrame:
     """
     Fetches a snapshot of current flights from the OpenSky API.
-    Returns a pandas DataFrame of flight state vectors.
+    Returns a pandas DataFrame of flight state vectors with the derived columns of features.add_derived_features().
     """
-    r = requests.get(OPENSKY_URL, timeout=20)
-    if r.status_code != 200:
-        raise RuntimeError(f"Failed to fetch OpenSky data: {r.status_code} {r.reason} -> {r.text[:200]}")   
-
+    if DEMO_SCALE:
+        with metrics.timed("opensky.demo"):
+            df = demo_states_frame()
+        with metrics.timed("opensky.features"):
+            return add_derived_features(df)
 
-    data = r.json()
-    states = data.get("states", [])
-    timestamp = data.get("time", datetime.utcnow().timestamp())
+    with metrics.timed("opensky.fetch"):
+        r = default_client().get(OPENSKY_URL, timeout=OPENSKY_STATES_TIMEOUT)
+    if r.status_code != 200:
+        raise RuntimeError(f"Failed to fetch OpenSky data: {r.status_code} {r.reason} -> {r.text[:200]}")
 
-    cols = [
-        "icao24", "callsign", "origin_country", "time_position", "last_contact",
-        "longitude", "latitude", "baro_altitude", "on_ground", "velocity",
-        "true_track", "vertical_rate", "sensors", "geo_altitude", "squawk",
-        "spi", "position_source"
-    ]
-    df = pd.DataFrame(states, columns=cols)
-    df["last_contact"] = pd.to_datetime(df["last_contact"], unit="s")
-    df.attrs["timestamp"] = datetime.utcfromtimestamp(timestamp)
-    print(df.head(10))
-    return df
+    # Decode the raw body and build the typed frame column-wise (see state_vectors.STATE_DTYPES)
+    with metrics.timed("opensky.decode"):
+        df = parse_states_payload(r.content)
+    # Unit conversions, flight phase, distance and band columns, computed once for every panel
+    with metrics.timed("opensky.features"):
+        return add_derived_features(df)
 
-def fetch_aviation_API_airlines_endpoint():
+def fetch_aviation_API_airlines_endpoint(offset=0, limit=AVIATIONSTACK_PAGE_LIMIT):
     """
-    Fetches airline data from the AviationStack API airlines endpoint.
+    Fetches one page of airline data from the AviationStack API airlines endpoint.
     
     Parameters:
-    - None
+    - offset (int, optional): Index of the first airline to return. Defaults to 0.
+    - limit (int, optional): Number of airlines per page. Defaults to AVIATIONSTACK_PAGE_LIMIT.
     
     Returns:
     - dict: The JSON response from the AviationStack API containing the airline data.
     """
+    if DEMO_SCALE:
+        return demo_airlines_page(offset, limit)  # Free: nothing is spent from the quota
     #api_key = os.environ.get("AVIATION_KEY") # Retrieve the API key (when running on HuggingFace)
     # Comment the line above and uncomment the two lines below if you are running the app locally (not on HuggingFace) and have a .env file with the AviationStack API key
     load_dotenv()
     api_key = os.getenv("AVIATION_KEY") # Retrieve the API key
-    url = f"https://api.aviationstack.com/v1/airlines?access_key={api_key}"
-    response = requests.get(url)
+    params = {"access_key": api_key, "offset": offset, "limit": limit}
+    response = default_client().get(AVIATIONSTACK_AIRLINES_URL, params=params, timeout=AVIATIONSTACK_TIMEOUT)
+    aviationstack_quota.spend()
     return response.json()
 
+def fetch_all_airlines(max_pages=AVIATIONSTACK_MAX_PAGES, limit=AVIATIONSTACK_PAGE_LIMIT) -> list:
+    """
+    Fetches the pages of the AviationStack airlines endpoint.
+    Each page costs one request of the monthly quota, so the pages are capped by max_pages and by what is left
+    of the quota. A page that fails is skipped: the airlines of the pages that succeeded are still returned.
+
+    Parameters:
+    - max_pages (int, optional): Maximum number of pages to fetch (0 or None fetches all pages). Defaults to AVIATIONSTACK_MAX_PAGES.
+    - limit (int, optional): Number of airlines per page. Defaults to AVIATIONSTACK_PAGE_LIMIT.
+
+    Returns:
+    - list: The airline records from all fetched pages.
+    """
+    budget = None if DEMO_SCALE else aviationstack_quota.remaining()
+    if budget == 0:
+        raise RuntimeError(f"aviationstack quota of {AVIATIONSTACK_MONTHLY_QUOTA} requests is used up for this month")
+    first = fetch_aviation_API_airlines_endpoint(offset=0, limit=limit)
+    if "error" in first:
+        raise RuntimeError(f"Failed to fetch aviationstack airlines: {first['error']}")
+    airlines = list(first.get("data", []))
+
+    # The first page tells how many airlines there are; fetch the remaining pages concurrently
+    total = first.get("pagination", {}).get("total", len(airlines))
+    offsets = list(range(len(airlines), total, limit)) if airlines else []
+    if max_pages:
+        offsets = offsets[:max_pages - 1]
+    if budget is not None:
+        offsets = offsets[:budget - 1]
+    futures = [default_client().submit(fetch_aviation_API_airlines_endpoint, offset=offset, limit=limit) for offset in offsets]
+    for future in futures:
+        try:
+            payload = future.result()
+        except Exception:
+            payload = {"error": "request failed"}
+        if "error" in payload:
+            metrics.inc("skyline_aviationstack_failed_pages_total")
+            continue
+        airlines.extend(payload.get("data", []))
+    return airlines
+
+def _flights_cache_path(kind, icao, day_start):
+    """
+    Return the cache file of one finished UTC day of arrivals/departures for an airport.
+    """
+    day = datetime.fromtimestamp(day_start, tz=timezone.utc)
+    return os.path.join(FLIGHTS_CACHE_DIR, kind, icao, f"{day:%Y-%m-%d}.parquet")
+
+def _fetch_flights_window(icao, begin, end, kind):
+    """
+    Fetch the arrivals/departures of one airport in one API-legal window [begin, end) as a DataFrame.
+    """
+    url = OPENSKY_URL_ARRIVALS if kind == "arrival" else OPENSKY_URL_DEPARTURES
+    params = {"airport": icao, "begin": begin, "end": end}
+    response = default_client().get(url, params=params, timeout=OPENSKY_FLIGHTS_TIMEOUT)
+    if response.status_code == 404:
+        # OpenSky answers 404 when no flights were found in the window
+        return pd.DataFrame(columns=FLIGHT_COLUMNS)
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to fetch {kind}s for {icao}: {response.status_code} {response.reason}")
+    return pd.DataFrame(response.json(), columns=FLIGHT_COLUMNS)
+
+def _fetch_flights_chunk(icao, begin, end, kind, now):
+    """
+    Fetch one chunk. A chunk covering a whole UTC day that OpenSky has finished processing is fetched
+    for the full day and cached on disk forever, since it never changes; other chunks are always fetched.
+    """
+    day_start = begin - begin % FLIGHTS_CHUNK
+    if day_start + FLIGHTS_CHUNK + FLIGHTS_FINAL_AFTER > now:
+        return _fetch_flights_window(icao, begin, end, kind)
+
+    path = _flights_cache_path(kind, icao, day_start)
+    if os.path.exists(path):
+        flights = pd.read_parquet(path)
+    else:
+        flights = _fetch_flights_window(icao, day_start, day_start + FLIGHTS_CHUNK, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        flights.astype({"icao24": "string", "callsign": "string", "estDepartureAirport": "string",
+                        "estArrivalAirport": "string"}).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    time_column = "lastSeen" if kind == "arrival" else "firstSeen"
+    seen = pd.to_numeric(flights[time_column])
+    return flights[(seen >= begin) & (seen < end)]
+
+@metrics.timed_function("opensky.flights")
+def fetch_airport_flights(icaos, begin, end, kind="departure") -> pd.DataFrame:
+    """
+    Fetch the departures or arrivals of one or more airports between two times.
+    The range is split into UTC-day chunks (OpenSky rejects windows longer than 7 days), all airports and
+    chunks are fetched in parallel under the OpenSky rate limit, and finished days are cached on disk.
+
+    Parameters:
+    - icaos (str | list): Airport ICAO code(s), e.g. "KRDU" or ["KATL", "KJFK"].
+    - begin (int): Start of the range as a UNIX timestamp (inclusive).
+    - end (int): End of the range as a UNIX timestamp (exclusive).
+    - kind (str, optional): "departure" or "arrival". Defaults to "departure".
+
+    Returns:
+    - pd.DataFrame: One row per flight with the OpenSky flight fields plus the queried "airport".
+    """
+    if kind not in ("departure", "arrival"):
+        raise ValueError(f"kind must be 'departure' or 'arrival', not {kind!r}")
+    if DEMO_SCALE:
+        # Synthetic flights are generated on the fly and never written to the flight cache
+        return demo_airport_flights(icaos, begin, end, kind)
+    icaos = [icaos] if isinstance(icaos, str) else list(icaos)
+    begin, end, now = int(begin), int(end), int(time.time())
+
+    # Chunk boundaries are aligned to UTC days so finished chunks map onto the day cache
+    chunks = []
+    chunk_begin = begin
+    while chunk_begin < end:
+        chunk_end = min(end, chunk_begin - chunk_begin % FLIGHTS_CHUNK + FLIGHTS_CHUNK)
+        chunks.append((chunk_begin, chunk_end))
+        chunk_begin = chunk_end
+
+    futures = [(icao.upper(), default_client().submit(_fetch_flights_chunk, icao.upper(), chunk_begin, chunk_end, kind, now))
+               for icao in icaos for chunk_begin, chunk_end in chunks]
+    frames = [future.result().assign(airport=icao) for icao, future in futures]
+    if not frames:
+        return pd.DataFrame(columns=FLIGHT_COLUMNS + ["airport"])
+    flights = pd.concat(frames, ignore_index=True)
+    # A flight can show up in two chunks when it straddles a boundary
+    return flights.drop_duplicates(subset=["airport", "icao24", "firstSeen"]).reset_index(drop=True)
+
 def fetch_rdu_departures(hours=6) -> pd.DataFrame:
     """
     Fetch recent departures from RDU (KRDU) within the last n hours (default is 6).
@@ -60,70 +231,149 @@ def fetch_rdu_departures(hours=6) -> pd.DataFrame:
     """
     end = int(time.time())
     begin = end - hours * 3600
-    params = {
-        "airport": "KRDU",
-        "begin": begin,
-        "end": end
-    }
-
-    response = requests.get(OPENSKY_URL_DEPARTURES, params=params, timeout=20)
-    if response.status_code != 200:
-        raise RuntimeError(f"Failed to fetch data, {response.headers}")
-    
-    data = response.json()
-    columns = [
-        "icao24", "firstSeen", "estDepartureAirport", "lastSeen", "estArrivalAirport", "callsign",
-        "estDepartureAirportHorizDistance", "estDepartureAirportVertDistance", "estArrivalAirportHorizDistance",
-        "estArrivalAirportVertDistance", "departureAirportCandidatesCount", "arrivalAirportCandidatesCount"
+    flights = fetch_airport_flights("KRDU", begin, end, kind="departure")
+    return flights.rename(columns={"estDepartureAirport": "departure", "estArrivalAirport": "arrival"})[
+        ["icao24", "callsign", "departure", "arrival"]
     ]
-    data_df = pd.DataFrame(data, columns=columns)
 
-    flights = []
-    for _, flight in data_df.iterrows():
-        flights.append({
-            "icao24": flight["icao24"],
-            "callsign": flight["callsign"],
-            "departure": flight["estDepartureAirport"],
-            "arrival": flight["estArrivalAirport"]
-        })
-    return pd.DataFrame(flights)
 
-def fetch_aviation_API_airlines_endpoint():
+def fetch_dashboard_data(hours=6):
     """
-    Fetches airline data from the AviationStack API airlines endpoint.
-    
+    Fetch the OpenSky snapshot, the recent RDU departures and the first page of aviationstack airlines concurrently,
+    so the total latency is that of the slowest call instead of the sum of all three.
+
     Parameters:
-    - None
-    
+    - hours (int, optional): Departure window passed to fetch_rdu_departures. Defaults to 6.
+
     Returns:
-    - dict: The JSON response from the AviationStack API containing the airline data.
+    - dict: "snapshot", "rdu_departures" and "airlines" → the fetch result, or the exception it raised.
     """
-    #api_key = os.environ.get("AVIATION_KEY") # Retrieve the API key (when running on HuggingFace)
-    # Comment the line above and uncomment the two lines below if you are running the app locally (not on HuggingFace) and have a .env file with the AviationStack API key
-    load_dotenv()
-    api_key = os.getenv("AVIATION_KEY") # Retrieve the API key
-    url = f"https://api.aviationstack.com/v1/airlines?access_key={api_key}"
-    response = requests.get(url)
-    return response.json()
+    return default_client().fetch_concurrently({
+        "snapshot": fetch_opensky_snapshot,
+        "rdu_departures": partial(fetch_rdu_departures, hours=hours),
+        "airlines": fetch_aviation_API_airlines_endpoint,
+    })
 
-
-if __name__ == "__main__":
-    print("Fetching live flight data from OpenSky…")
+def run_demo():
+    """
+    Fetch one snapshot, the recent RDU departures and the airline data, and print them.
+    """
+    print("Fetching live flight data from OpenSky and airline data from AviationStack…")
+    results = fetch_dashboard_data()
     try:
-        df = fetch_opensky_snapshot()
+        df = results["snapshot"]
+        if isinstance(df, Exception):
+            raise df
         print(f"Fetched {len(df)} flights at {df.attrs['timestamp']}")
         print(df.head())
 
-        df_2 = fetch_rdu_departures(hours=6)
-        print(f"Fetched {len(df)} flights at {df.attrs['timestamp']}")
-        print(df.head())
+        df_2 = results["rdu_departures"]
+        if isinstance(df_2, Exception):
+            raise df_2
+        print(f"Fetched {len(df_2)} RDU departures")
+        print(df_2.head())
     except Exception as e:
         print("Error:", e)
 
-    print("Fetching airline data from AviationStack…")
     try:
-        airline_data = fetch_aviation_API_airlines_endpoint()
+        airline_data = results["airlines"]
+        if isinstance(airline_data, Exception):
+            raise airline_data
         print(f"Fetched {len(airline_data.get('data', []))} airlines")
         print(airline_data)
     except Exception as e:
-        print("Error:", e)
\ No newline at end of file
+        print("Error:", e)
+
+
+def _utc_time(value):
+    """
+    Parse a command line date/time as a naive UTC datetime.
+    """
+    return pd.Timestamp(value).tz_localize(None).to_pydatetime()
+
+def run_report(args):
+    """
+    Compute and print one report of the `report` command.
+    """
+    import reports
+    from archive import ARCHIVE_DIR
+
+    started = time.perf_counter()
+    workers = args.workers or reports.REPORT_WORKERS
+    if args.report == "countries":
+        report = reports.busiest_countries(args.start, args.end, root=args.archive_dir or ARCHIVE_DIR,
+                                           top=args.top or 20, workers=workers)
+    elif args.report == "airlines":
+        designators = None
+        try:
+            from airline_store import load_airline_frame
+            from callsign_resolver import designators_from_airlines
+            designators = designators_from_airlines(load_airline_frame(refresh=False))
+        except (FileNotFoundError, OSError):
+            pass  # The resolver's built-in designators are used without an airline store
+        report = reports.airlines_per_hour(args.start, args.end, root=args.archive_dir or ARCHIVE_DIR,
+                                           top=args.top or 10, designators=designators, workers=workers)
+    else:
+        end = pd.Timestamp(args.end) if args.end else pd.Timestamp.now(args.tz).tz_localize(None).normalize()
+        start = pd.Timestamp(args.start) if args.start else end - pd.Timedelta(days=7)
+        report = reports.airport_heatmap(args.airport.strip().upper(), args.tz, start, (end - start).days, kind=args.kind)
+
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(report)
+    print(f"Computed in {time.perf_counter() - started:.1f}s")
+    if args.output:
+        report.to_csv(args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Skyline command line tools. Without a command, runs a one-off fetch demo.")
+    subparsers = parser.add_subparsers(dest="command")
+    record_parser = subparsers.add_parser("record", help="Poll OpenSky and append every snapshot to the local Parquet archive")
+    record_parser.add_argument("--interval", type=float, default=10, help="Seconds between polls (default: 10)")
+    record_parser.add_argument("--count", type=int, default=None, help="Stop after this many polls (default: run until interrupted)")
+    record_parser.add_argument("--archive-dir", default=None, help="Archive directory (default: data/snapshots)")
+    poll_parser = subparsers.add_parser("poll", help="Background worker: publish OpenSky snapshots for the dashboard and keep reference data fresh")
+    poll_parser.add_argument("--interval", type=float, default=10, help="Seconds between polls (default: 10)")
+    poll_parser.add_argument("--count", type=int, default=None, help="Stop after this many polls (default: run until interrupted)")
+    poll_parser.add_argument("--live-dir", default=None, help="Directory of the published snapshot (default: data/live)")
+    poll_parser.add_argument("--archive", action="store_true", help="Also append every snapshot to the Parquet archive")
+    replay_parser = subparsers.add_parser("replay", help="Publish archived snapshots for the dashboard (run it with SKYLINE_POLLER=1) instead of live ones")
+    replay_parser.add_argument("--start", type=_utc_time, default=None, help="UTC start, e.g. 2025-09-01 or 2025-09-01T13:00 (default: start of the archive)")
+    replay_parser.add_argument("--end", type=_utc_time, default=None, help="UTC end, exclusive (default: end of the archive)")
+    replay_parser.add_argument("--speed", type=float, default=10, help="Replay speed relative to the recording, 0 for as fast as possible (default: 10)")
+    replay_parser.add_argument("--live-dir", default=None, help="Directory of the published snapshot (default: data/live)")
+    replay_parser.add_argument("--archive-dir", default=None, help="Archive directory (default: data/snapshots)")
+    report_parser = subparsers.add_parser("report", help="Aggregate the archived snapshots or cached airport flights over days")
+    report_parser.add_argument("report", choices=["countries", "airlines", "heatmap"],
+                               help="countries: busiest origin countries; airlines: distinct aircraft per airline per hour; "
+                                    "heatmap: an airport's flights per local day and hour")
+    report_parser.add_argument("--start", type=_utc_time, default=None, help="UTC start (heatmap: first local date, default: 7 days ago)")
+    report_parser.add_argument("--end", type=_utc_time, default=None, help="UTC end, exclusive (heatmap: day after the last local date, default: today)")
+    report_parser.add_argument("--archive-dir", default=None, help="Archive directory (default: data/snapshots)")
+    report_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    report_parser.add_argument("--top", type=int, default=None, help="Number of countries (default: 20) or airlines (default: 10)")
+    report_parser.add_argument("--airport", default="KRDU", help="Heatmap airport ICAO code (default: KRDU)")
+    report_parser.add_argument("--tz", default="America/New_York", help="Heatmap time zone (default: America/New_York)")
+    report_parser.add_argument("--kind", choices=["both", "arrivals", "departures"], default="both", help="Heatmap flights (default: both)")
+    report_parser.add_argument("--output", default=None, help="Also write the report to this CSV file")
+    args = parser.parse_args()
+
+    if args.command == "poll":
+        from poller import LIVE_DIR, run_poller
+        archive_root = None
+        if args.archive:
+            from archive import ARCHIVE_DIR
+            archive_root = ARCHIVE_DIR
+        run_poller(interval=args.interval, count=args.count, live_dir=args.live_dir or LIVE_DIR, archive_root=archive_root)
+    elif args.command == "record":
+        from archive import ARCHIVE_DIR, record_snapshots
+        record_snapshots(interval=args.interval, count=args.count, root=args.archive_dir or ARCHIVE_DIR)
+    elif args.command == "replay":
+        from poller import LIVE_DIR, replay_archive
+        replayed = replay_archive(args.start, args.end, speed=args.speed, live_dir=args.live_dir or LIVE_DIR,
+                                  archive_root=args.archive_dir)
+        print(f"Replayed {replayed} snapshots")
+    elif args.command == "report":
+        run_report(args)
+    else:
+        run_demo()
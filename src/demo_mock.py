@@ -0,0 +1,458 @@
+
+import os
+import time
+import zlib
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from state_vectors import STATE_COLUMNS, STATE_DTYPES
+
+# Synthetic traffic instead of the live APIs: cli_demo's fetch functions serve this module's data when set.
+# The value is the traffic multiplier: 1 is about today's ~1,800 aircraft in a snapshot, 0 uses the live APIs
+DEMO_SCALE = float(os.environ.get("SKYLINE_DEMO_SCALE", 0))
+# The same seed always produces the same traffic
+DEMO_SEED = int(os.environ.get("SKYLINE_DEMO_SEED", 0))
+
+# Aircraft in a snapshot, airlines in the airlines endpoint and KRDU-sized daily departures at scale 1
+BASE_AIRCRAFT = 1800
+BASE_AIRLINES = 13000
+
+# Airports the synthetic aircraft fly between: ICAO code → (latitude, longitude, country, daily departures)
+DEMO_AIRPORTS = {
+    "KATL": (33.6367, -84.4281, "United States", 1100),
+    "KORD": (41.9786, -87.9048, "United States", 1000),
+    "KDFW": (32.8968, -97.0380, "United States", 900),
+    "KDEN": (39.8617, -104.6731, "United States", 800),
+    "KLAX": (33.9425, -118.4081, "United States", 800),
+    "KJFK": (40.6398, -73.7789, "United States", 600),
+    "KCLT": (35.2140, -80.9431, "United States", 700),
+    "KSEA": (47.4490, -122.3093, "United States", 500),
+    "KMIA": (25.7932, -80.2906, "United States", 450),
+    "KBOS": (42.3656, -71.0096, "United States", 450),
+    "KRDU": (35.8776, -78.7875, "United States", 200),
+    "CYYZ": (43.6772, -79.6306, "Canada", 550),
+    "CYVR": (49.1939, -123.1844, "Canada", 350),
+    "MMMX": (19.4363, -99.0721, "Mexico", 450),
+    "SBGR": (-23.4356, -46.4731, "Brazil", 350),
+    "SCEL": (-33.3930, -70.7858, "Chile", 200),
+    "EGLL": (51.4706, -0.4619, "United Kingdom", 650),
+    "EGKK": (51.1481, -0.1903, "United Kingdom", 350),
+    "LFPG": (49.0097, 2.5479, "France", 600),
+    "EDDF": (50.0333, 8.5706, "Germany", 600),
+    "EDDM": (48.3538, 11.7861, "Germany", 400),
+    "EHAM": (52.3086, 4.7639, "Netherlands", 650),
+    "LEMD": (40.4719, -3.5626, "Spain", 500),
+    "LIRF": (41.8003, 12.2389, "Italy", 400),
+    "LTFM": (41.2753, 28.7519, "Turkey", 600),
+    "OMDB": (25.2528, 55.3644, "United Arab Emirates", 550),
+    "HECA": (30.1219, 31.4056, "Egypt", 200),
+    "FAOR": (-26.1392, 28.2460, "South Africa", 200),
+    "VIDP": (28.5665, 77.1031, "India", 600),
+    "VABB": (19.0887, 72.8679, "India", 450),
+    "ZBAA": (40.0801, 116.5846, "China", 700),
+    "ZSPD": (31.1434, 121.8052, "China", 600),
+    "ZGGG": (23.3924, 113.2988, "China", 650),
+    "VHHH": (22.3080, 113.9185, "China", 450),
+    "RJTT": (35.5523, 139.7797, "Japan", 600),
+    "RKSI": (37.4691, 126.4510, "Republic of Korea", 450),
+    "WSSS": (1.3592, 103.9894, "Singapore", 450),
+    "VTBS": (13.6900, 100.7501, "Thailand", 400),
+    "YSSY": (-33.9461, 151.1772, "Australia", 400),
+    "NZAA": (-37.0082, 174.7850, "New Zealand", 200),
+}
+
+# Airlines of the synthetic aircraft: ICAO designator → (name, country). The designators are the ones
+# callsign_resolver knows, so the airline panels resolve them without an airline store
+DEMO_AIRLINES = {
+    "AAL": ("American Airlines", "United States"),
+    "DAL": ("Delta Air Lines", "United States"),
+    "UAL": ("United Airlines", "United States"),
+    "SWA": ("Southwest Airlines", "United States"),
+    "JBU": ("Jet Blue Airways", "United States"),
+    "FFT": ("Frontier Airlines", "United States"),
+    "NKS": ("Spirit Airlines", "United States"),
+    "ASA": ("Alaska Airlines", "United States"),
+    "UPS": ("UPS Airlines", "United States"),
+    "FDX": ("Fed Ex Express", "United States"),
+    "BAW": ("British Airways", "United Kingdom"),
+    "DLH": ("Lufthansa", "Germany"),
+    "AFR": ("Air France", "France"),
+    "KLM": ("KLM Royal Dutch Airlines", "Netherlands"),
+    "UAE": ("Emirates", "United Arab Emirates"),
+}
+
+# Share of aircraft that are general aviation (registration callsigns, short hops near their home airport)
+GA_SHARE = 0.15
+# Share of aircraft that report no position, as in real snapshots
+NO_POSITION_SHARE = 0.01
+
+# Flight model: cruise speeds (m/s), cruise altitudes (m), climb/descent rate (m/s) and minutes on the ground between legs
+AIRLINER_SPEED = (210.0, 255.0)
+AIRLINER_ALTITUDE = (9500.0, 12000.0)
+GA_SPEED = (50.0, 85.0)
+GA_ALTITUDE = (900.0, 3500.0)
+CLIMB_RATE = 10.0
+TURNAROUND_MINUTES = (20, 60)
+
+# Share of an airport's daily flights in every local hour (early-morning lull, morning and evening banks)
+HOURLY_PROFILE = np.array([0.4, 0.2, 0.1, 0.1, 0.2, 0.8, 2.6, 3.2, 3.1, 2.8, 2.6, 2.7,
+                           2.8, 2.7, 2.7, 2.9, 3.1, 3.2, 3.0, 2.6, 2.2, 1.7, 1.2, 0.8])
+HOURLY_PROFILE = HOURLY_PROFILE / HOURLY_PROFILE.sum()
+
+EARTH_RADIUS_M = 6371000.0
+
+# Fields of a flight in the OpenSky arrivals/departures responses (same as cli_demo.FLIGHT_COLUMNS)
+FLIGHT_COLUMNS = [
+    "icao24", "firstSeen", "estDepartureAirport", "lastSeen", "estArrivalAirport", "callsign",
+    "estDepartureAirportHorizDistance", "estDepartureAirportVertDistance", "estArrivalAirportHorizDistance",
+    "estArrivalAirportVertDistance", "departureAirportCandidatesCount", "arrivalAirportCandidatesCount"
+]
+
+
+def _unit_vectors(latitude, longitude):
+    """
+    Return the unit vectors (n × 3) of positions in degrees.
+    """
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _hex_ids(values):
+    """
+    Format integers as 6-digit lower-case hex ICAO24 addresses.
+    """
+    return np.char.mod("%06x", values & 0xFFFFFF)
+
+
+class SyntheticTraffic:
+    """
+    A fixed fleet of aircraft flying back and forth between two airports along the great circle, forever.
+
+    Every aircraft gets its airports, airline, speed, cruise altitude and schedule offset once (from the seed),
+    so a snapshot at any time is a pure, vectorized function of that time: aircraft turn around on the ground,
+    climb, cruise and descend, and consecutive snapshots move every aircraft along its route.
+    """
+
+    def __init__(self, aircraft, seed=DEMO_SEED):
+        rng = np.random.default_rng(seed)
+        self.aircraft = aircraft
+        codes = list(DEMO_AIRPORTS)
+        airports = pd.DataFrame(DEMO_AIRPORTS.values(), index=codes, columns=["latitude", "longitude", "country", "daily"])
+        weights = airports["daily"].to_numpy() / airports["daily"].sum()
+
+        ga = rng.random(aircraft) < GA_SHARE
+        origin = rng.choice(len(codes), aircraft, p=weights)
+        destination = rng.choice(len(codes), aircraft, p=weights)
+        clash = destination == origin
+        destination[clash] = (origin[clash] + rng.integers(1, len(codes), clash.sum())) % len(codes)
+
+        start = _unit_vectors(airports["latitude"].to_numpy()[origin], airports["longitude"].to_numpy()[origin])
+        end = _unit_vectors(airports["latitude"].to_numpy()[destination], airports["longitude"].to_numpy()[destination])
+        # General aviation flies 50-250 km from its home airport instead of to another airport
+        hop = rng.uniform(50e3, 250e3, aircraft) / EARTH_RADIUS_M
+        bearing = rng.uniform(0, 2 * np.pi, aircraft)
+        north = np.column_stack([-start[:, 2] * start[:, 0], -start[:, 2] * start[:, 1], 1 - start[:, 2] ** 2])
+        north /= np.linalg.norm(north, axis=1, keepdims=True)
+        east = np.cross(north, start)
+        ga_end = (start * np.cos(hop)[:, None] +
+                  (north * np.cos(bearing)[:, None] + east * np.sin(bearing)[:, None]) * np.sin(hop)[:, None])
+        end[ga] = ga_end[ga]
+        self._start, self._end = start, end
+        self._angle = np.arccos(np.clip((start * end).sum(axis=1), -1, 1))
+
+        self._speed = np.where(ga, rng.uniform(*GA_SPEED, aircraft), rng.uniform(*AIRLINER_SPEED, aircraft))
+        self._cruise = np.where(ga, rng.uniform(*GA_ALTITUDE, aircraft), rng.uniform(*AIRLINER_ALTITUDE, aircraft))
+        self._duration = self._angle * EARTH_RADIUS_M / self._speed
+        self._turnaround = rng.uniform(*TURNAROUND_MINUTES, aircraft) * 60
+        self._period = 2 * (self._duration + self._turnaround)
+        self._offset = rng.uniform(0, 1, aircraft) * self._period
+        self._geo_offset = rng.normal(0, 60, aircraft)
+        self._report_lag = rng.integers(0, 10, aircraft)
+        self._no_position = rng.random(aircraft) < NO_POSITION_SHARE
+
+        # Static columns, built once
+        designators = np.array(list(DEMO_AIRLINES))
+        airline = rng.integers(0, len(designators), aircraft)
+        airline_country = np.array([country for _, country in DEMO_AIRLINES.values()])[airline]
+        flight_number = rng.integers(1, 9999, aircraft).astype(str)
+        registration = np.char.add("N", rng.integers(100, 99999, aircraft).astype(str))
+        callsign = np.where(ga, registration, np.char.add(designators[airline], flight_number))
+        country = np.where(ga, airports["country"].to_numpy()[origin], airline_country)
+        # Multiplying by an odd number is a bijection modulo 2**24, so the addresses are unique
+        addresses = (np.arange(aircraft, dtype=np.int64) * 0x9E3779 + rng.integers(0, 0xFFFFFF)) & 0xFFFFFF
+        self._icao24 = pd.array(_hex_ids(addresses).astype(object), dtype=STATE_DTYPES["icao24"])
+        self._callsign = pd.array(callsign.astype(object), dtype=STATE_DTYPES["callsign"])
+        self._country = pd.Categorical(country)
+        # Transponder codes are 4 octal digits (0000-7777); each of the 4096 codes is formatted once
+        octal = np.array([f"{code:04o}" for code in range(0o10000)], dtype=object)
+        self._squawk = pd.array(octal[rng.integers(0, 0o10000, aircraft)], dtype=STATE_DTYPES["squawk"])
+
+    def states_frame(self, timestamp=None) -> pd.DataFrame:
+        """
+        Build the snapshot at a time, with the same columns and dtypes as state_vectors.parse_states_payload().
+
+        Parameters:
+        - timestamp (int, optional): UNIX time of the snapshot. Defaults to now.
+
+        Returns:
+        - pd.DataFrame: One row per aircraft (state_vectors.STATE_DTYPES), with the time in df.attrs["timestamp"].
+        """
+        now = int(time.time() if timestamp is None else timestamp)
+        cycle = (now + self._offset) % self._period
+        inbound = cycle >= self._period / 2  # The second half of the cycle is the flight back
+        cycle = np.where(inbound, cycle - self._period / 2, cycle)
+        elapsed = cycle - self._turnaround
+        on_ground = elapsed < 0
+        fraction = np.clip(elapsed / self._duration, 0, 1)
+        fraction = np.where(inbound, 1 - fraction, fraction)
+
+        # Spherical interpolation between the airports, and the bearing of the direction of travel
+        angle = self._angle[:, None]
+        position = (np.sin((1 - fraction)[:, None] * angle) * self._start +
+                    np.sin(fraction[:, None] * angle) * self._end) / np.sin(angle)
+        latitude = np.degrees(np.arcsin(np.clip(position[:, 2], -1, 1)))
+        longitude = np.degrees(np.arctan2(position[:, 1], position[:, 0]))
+        target = np.where(inbound[:, None], self._start, self._end)
+        north = np.column_stack([-position[:, 2] * position[:, 0], -position[:, 2] * position[:, 1], 1 - position[:, 2] ** 2])
+        east = np.cross(north, position)
+        track = np.degrees(np.arctan2((target * east).sum(axis=1), (target * north).sum(axis=1))) % 360
+
+        # Climb from the departure and descend to the arrival at CLIMB_RATE, cruising in between
+        remaining = np.where(on_ground, 0, self._duration - elapsed)
+        climb_time = self._cruise / CLIMB_RATE
+        altitude = np.minimum.reduce([self._cruise, np.maximum(elapsed, 0) * CLIMB_RATE, remaining * CLIMB_RATE])
+        vertical_rate = np.where(elapsed < climb_time, CLIMB_RATE, np.where(remaining < climb_time, -CLIMB_RATE, 0.0))
+        vertical_rate[on_ground] = 0.0
+
+        missing = self._no_position
+        latitude = np.where(missing, np.nan, latitude).astype(np.float32)
+        longitude = np.where(missing, np.nan, longitude).astype(np.float32)
+        baro_altitude = np.where(on_ground, np.nan, altitude).astype(np.float32)
+        geo_altitude = np.where(on_ground, np.nan, altitude + self._geo_offset).astype(np.float32)
+        velocity = np.where(on_ground, 0.0, self._speed).astype(np.float32)
+        last_contact = now - self._report_lag
+
+        df = pd.DataFrame({
+            "icao24": self._icao24,
+            "callsign": self._callsign,
+            "origin_country": self._country,
+            "time_position": pd.arrays.IntegerArray(last_contact - 1, missing),
+            "last_contact": last_contact.astype("datetime64[s]"),
+            "longitude": longitude,
+            "latitude": latitude,
+            "baro_altitude": baro_altitude,
+            "on_ground": on_ground,
+            "velocity": velocity,
+            "true_track": track.astype(np.float32),
+            "vertical_rate": vertical_rate.astype(np.float32),
+            "geo_altitude": geo_altitude,
+            "squawk": self._squawk,
+            "spi": np.zeros(self.aircraft, dtype=bool),
+            "position_source": np.zeros(self.aircraft, dtype=np.int8),
+        }, columns=list(STATE_DTYPES))
+        df.attrs["timestamp"] = datetime.utcfromtimestamp(now)
+        return df
+
+    def states_payload(self, timestamp=None) -> bytes:
+        """
+        Return the snapshot at a time as a states/all response body (e.g. for a stub OpenSky server).
+        """
+        import json
+
+        import pyarrow as pa
+
+        now = int(time.time() if timestamp is None else timestamp)
+        df = self.states_frame(now)
+        columns = []
+        for column in STATE_COLUMNS:
+            if column == "sensors":
+                columns.append([None] * len(df))
+                continue
+            values = df[column]
+            if column == "last_contact":
+                values = values.astype("int64")
+            elif column == "callsign":
+                values = values.str.pad(8, side="right")  # Callsigns are space padded like in the real responses
+            columns.append(pa.array(values, from_pandas=True).to_pylist())
+        return json.dumps({"time": now, "states": [list(row) for row in zip(*columns)]}).encode()
+
+
+@lru_cache(maxsize=4)
+def demo_traffic(scale=None, seed=DEMO_SEED) -> SyntheticTraffic:
+    """
+    Return the (cached) synthetic fleet of BASE_AIRCRAFT × scale aircraft. Defaults to DEMO_SCALE (at least 1).
+    """
+    return SyntheticTraffic(int(BASE_AIRCRAFT * (scale or DEMO_SCALE or 1)), seed)
+
+
+def demo_states_frame(timestamp=None, scale=None) -> pd.DataFrame:
+    """
+    Return the synthetic snapshot at a time (default now), like state_vectors.parse_states_payload() of a live one.
+    """
+    return demo_traffic(scale).states_frame(timestamp)
+
+
+def _airport_rng(seed, *keys):
+    """
+    Return a generator for one (airport, kind, day): the same keys always give the same flights,
+    whatever range was queried.
+    """
+    return np.random.default_rng([seed] + [zlib.crc32(str(key).encode()) for key in keys])
+
+
+def _day_flights(icao, kind, day_start, scale, seed):
+    """
+    Generate the departures or arrivals of one airport on one UTC day.
+    """
+    rng = _airport_rng(seed, icao, kind, day_start)
+    if icao in DEMO_AIRPORTS:
+        latitude, longitude, _, daily = DEMO_AIRPORTS[icao]
+    else:
+        # Unknown airports get a stable size and no coordinates (their local day is taken as the UTC day)
+        latitude, longitude, daily = None, 0.0, 20 + zlib.crc32(icao.encode()) % 120
+    # Local hours of the profile are shifted by the airport's solar time offset
+    profile = np.roll(HOURLY_PROFILE, -int(round(longitude / 15)))
+    per_hour = rng.poisson(daily * scale * profile)
+    hours = np.repeat(np.arange(24), per_hour)
+    seen = day_start + hours * 3600 + rng.integers(0, 3600, len(hours))
+
+    others = [code for code in DEMO_AIRPORTS if code != icao]
+    weights = np.array([DEMO_AIRPORTS[code][3] for code in others], dtype=np.float64)
+    other = np.array(others)[rng.choice(len(others), len(hours), p=weights / weights.sum())]
+    if latitude is None:
+        block = rng.uniform(1800, 5 * 3600, len(hours))
+    else:
+        from spatial_index import haversine_nm
+        other_lat = np.array([DEMO_AIRPORTS[code][0] for code in other])
+        other_lon = np.array([DEMO_AIRPORTS[code][1] for code in other])
+        block = haversine_nm(latitude, longitude, other_lat, other_lon) / 450 * 3600 + 1200  # 450 kt plus taxi
+    block = block.astype(np.int64)
+
+    designators = np.array(list(DEMO_AIRLINES))
+    callsign = np.char.add(designators[rng.integers(0, len(designators), len(hours))],
+                           rng.integers(1, 9999, len(hours)).astype(str))
+    departure, arrival = (icao, other) if kind == "departure" else (other, icao)
+    first_seen, last_seen = (seen, seen + block) if kind == "departure" else (seen - block, seen)
+    return pd.DataFrame({
+        "icao24": _hex_ids(rng.integers(0, 0xFFFFFF, len(hours))),
+        "firstSeen": first_seen,
+        "estDepartureAirport": departure,
+        "lastSeen": last_seen,
+        "estArrivalAirport": arrival,
+        "callsign": np.char.ljust(callsign, 8),
+        "estDepartureAirportHorizDistance": rng.integers(0, 3000, len(hours)),
+        "estDepartureAirportVertDistance": rng.integers(0, 300, len(hours)),
+        "estArrivalAirportHorizDistance": rng.integers(0, 3000, len(hours)),
+        "estArrivalAirportVertDistance": rng.integers(0, 300, len(hours)),
+        "departureAirportCandidatesCount": 1,
+        "arrivalAirportCandidatesCount": rng.integers(0, 3, len(hours)),
+    }, columns=FLIGHT_COLUMNS)
+
+
+def demo_airport_flights(icaos, begin, end, kind="departure", scale=None, seed=DEMO_SEED) -> pd.DataFrame:
+    """
+    Generate the departures or arrivals of any airports between two times, like cli_demo.fetch_airport_flights().
+    Flights follow HOURLY_PROFILE in the airport's local hours, and busier airports (DEMO_AIRPORTS) get more.
+
+    Parameters:
+    - icaos (str | list): Airport ICAO code(s); codes outside DEMO_AIRPORTS get a stable, moderate volume.
+    - begin (int): Start of the range as a UNIX timestamp (inclusive).
+    - end (int): End of the range as a UNIX timestamp (exclusive).
+    - kind (str, optional): "departure" or "arrival". Defaults to "departure".
+    - scale (float, optional): Traffic multiplier. Defaults to DEMO_SCALE (at least 1).
+    - seed (int, optional): Defaults to DEMO_SEED.
+
+    Returns:
+    - pd.DataFrame: One row per flight with the OpenSky flight fields plus the queried "airport".
+    """
+    if kind not in ("departure", "arrival"):
+        raise ValueError(f"kind must be 'departure' or 'arrival', not {kind!r}")
+    icaos = [icaos] if isinstance(icaos, str) else list(icaos)
+    scale = scale or DEMO_SCALE or 1
+    time_column = "lastSeen" if kind == "arrival" else "firstSeen"
+    frames = []
+    for icao in icaos:
+        icao = icao.upper()
+        for day_start in range(int(begin) - int(begin) % 86400, int(end), 86400):
+            flights = _day_flights(icao, kind, day_start, scale, seed)
+            seen = flights[time_column]
+            frames.append(flights[(seen >= begin) & (seen < end)].assign(airport=icao))
+    if not frames:
+        return pd.DataFrame(columns=FLIGHT_COLUMNS + ["airport"])
+    return pd.concat(frames, ignore_index=True)
+
+
+@lru_cache(maxsize=2)
+def _airline_table(total, seed):
+    """
+    Build the synthetic airlines behind demo_airlines_page(): the DEMO_AIRLINES first, then generated ones.
+    """
+    rng = np.random.default_rng(seed)
+    index = np.arange(total)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    icao = np.char.add(np.char.add(letters[index % 26], letters[index // 26 % 26]), letters[index // 676 % 26])
+    names = np.char.add("Airline ", index.astype(str)).astype(object)
+    countries = np.array(sorted({country for _, _, country, _ in DEMO_AIRPORTS.values()}))
+    country = countries[rng.integers(0, len(countries), total)].astype(object)
+    known = min(total, len(DEMO_AIRLINES))
+    icao = icao.astype(object)
+    icao[:known] = list(DEMO_AIRLINES)[:known]
+    names[:known] = [name for name, _ in DEMO_AIRLINES.values()][:known]
+    country[:known] = [country for _, country in DEMO_AIRLINES.values()][:known]
+
+    def maybe(values, share):
+        return np.where(rng.random(total) < share, values, "").astype(object)
+    table = pd.DataFrame({
+        "id": (index + 1).astype(str),
+        "airline_name": names,
+        "iata_code": np.char.add(letters[index % 26], letters[index // 26 % 26]),
+        "icao_code": icao,
+        "callsign": np.char.add("CALLSIGN", index.astype(str)),
+        "fleet_size": maybe(rng.integers(1, 900, total).astype(str), 0.6),
+        "fleet_average_age": maybe(np.char.mod("%.1f", rng.uniform(1, 25, total)), 0.5),
+        "date_founded": maybe(rng.integers(1919, 2020, total).astype(str), 0.7),
+        "status": np.array(["active", "active", "disabled", "historical"])[rng.integers(0, 4, total)],
+        "type": np.array(["scheduled", "charter", "cargo", "division"])[rng.integers(0, 4, total)],
+        "country_name": country,
+        "hub_code": np.array(["ATL", "DFW", "FRA", "LHR", "CDG", "PEK", ""])[rng.integers(0, 7, total)],
+    })
+    table.loc[:known - 1, ["status", "type"]] = ["active", "scheduled"]
+    return table
+
+
+def demo_airlines_page(offset=0, limit=100, scale=None, seed=DEMO_SEED) -> dict:
+    """
+    Return one page of BASE_AIRLINES × scale synthetic airlines, shaped like the aviationstack airlines response
+    (numbers as strings, empty strings for missing values).
+    """
+    total = int(BASE_AIRLINES * (scale or DEMO_SCALE or 1))
+    page = _airline_table(total, seed).iloc[offset:offset + limit]
+    return {"pagination": {"offset": offset, "limit": limit, "count": len(page), "total": total},
+            "data": page.to_dict("records")}
+
+
+def gen_demo_hourly_multi_days(icao, tz, start, days, scale=None, seed=DEMO_SEED) -> pd.DataFrame:
+    """
+    Generate an airport's arrivals and departures per local hour over several days, without any API call.
+
+    Parameters:
+    - icao (str): Airport ICAO code, e.g. "KRDU".
+    - tz (str): IANA time zone of the local days.
+    - start (pd.Timestamp | datetime.date): The first local date.
+    - days (int): Number of days.
+    - scale (float, optional): Traffic multiplier. Defaults to DEMO_SCALE (at least 1).
+    - seed (int, optional): Defaults to DEMO_SEED.
+
+    Returns:
+    - pd.DataFrame: 24 rows per day with "date", "hour", "arrivals" and "departures" columns (see rdu_hourly).
+    """
+    from rdu_hourly import count_flights_per_hour
+
+    range_start = pd.Timestamp(start).normalize().tz_localize(tz)
+    begin, end = int(range_start.timestamp()), int((range_start + pd.DateOffset(days=days)).timestamp())
+    arrivals = demo_airport_flights(icao, begin, end, "arrival", scale, seed)
+    departures = demo_airport_flights(icao, begin, end, "departure", scale, seed)
+    return count_flights_per_hour(arrivals, departures, tz, start, days)
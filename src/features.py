@@ -0,0 +1,113 @@
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregates import ALT_BINS, ALT_LABELS, REGION_BINS, REGION_LABELS, bin_codes
+from spatial_index import AIRPORTS, haversine_nm
+
+# Distances in the ref_distance_nm column are measured from this airport: an ICAO code of spatial_index.AIRPORTS,
+# or any point as "latitude,longitude" (e.g. "47.4502,-122.3088")
+REFERENCE_AIRPORT = os.environ.get("SKYLINE_REFERENCE_AIRPORT", "KRDU")
+
+# Unit conversions (float32, like the state vector columns)
+FT_PER_M = np.float32(3.28084)
+KT_PER_MS = np.float32(1.943844)
+FPM_PER_MS = np.float32(196.8504)
+
+# Flight phases: a vertical rate beyond ±CLIMB_RATE_FPM is a climb/descent, level flight at or above
+# CRUISE_MIN_FT is cruise, and level flight below it (pattern work, approaches, low-level GA) is "level"
+CLIMB_RATE_FPM = 500
+CRUISE_MIN_FT = 10000
+PHASE_LABELS = ["ground", "climb", "cruise", "descent", "level"]
+
+# Columns added by add_derived_features()
+DERIVED_COLUMNS = ("alt_ft", "geo_alt_ft", "speed_kt", "vertical_rate_fpm", "phase", "ref_distance_nm",
+                   "alt_band", "region")
+
+
+def _categorical(codes, labels):
+    """
+    Wrap integer codes (-1 for missing) into a categorical with fixed categories, without building any strings.
+    """
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+def reference_point(reference) -> tuple:
+    """
+    Return the (latitude, longitude) of a reference airport.
+
+    Parameters:
+    - reference (str | tuple): ICAO code of spatial_index.AIRPORTS, "latitude,longitude", or a (latitude, longitude) pair.
+
+    Returns:
+    - tuple: (latitude, longitude) in degrees. Raises ValueError for an unknown code or out-of-range coordinates.
+    """
+    if isinstance(reference, str):
+        if reference.strip().upper() in AIRPORTS:
+            return AIRPORTS[reference.strip().upper()]
+        try:
+            point = tuple(float(value) for value in reference.split(","))
+        except ValueError:
+            point = ()
+        if len(point) != 2:
+            raise ValueError(f"Unknown reference airport {reference!r}: use one of {', '.join(AIRPORTS)} "
+                             "or \"latitude,longitude\"")
+        reference = point
+    latitude, longitude = reference
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(f"Reference point {reference!r} is out of range")
+    return float(latitude), float(longitude)
+
+
+# Resolved on import, so a bad SKYLINE_REFERENCE_AIRPORT fails at startup instead of on every snapshot
+REFERENCE_POINT = reference_point(REFERENCE_AIRPORT)
+
+
+def flight_phase_codes(on_ground, alt_ft, vertical_rate_fpm) -> np.ndarray:
+    """
+    Return the PHASE_LABELS code of every aircraft, or -1 when it is airborne with an unknown vertical rate.
+    """
+    codes = np.full(len(on_ground), -1, dtype=np.int8)
+    level = np.abs(vertical_rate_fpm) < CLIMB_RATE_FPM  # False for NaN, so unknown rates stay -1
+    codes[level] = np.where(alt_ft[level] >= CRUISE_MIN_FT, 2, 4)
+    codes[vertical_rate_fpm >= CLIMB_RATE_FPM] = 1
+    codes[vertical_rate_fpm <= -CLIMB_RATE_FPM] = 3
+    codes[on_ground] = 0
+    return codes
+
+
+def add_derived_features(df, reference=REFERENCE_POINT) -> pd.DataFrame:
+    """
+    Add the derived kinematics columns to a snapshot, in place and once, so panels never recompute them.
+
+    Parameters:
+    - df (pd.DataFrame): A snapshot with the state vector columns (see state_vectors.STATE_DTYPES).
+    - reference (str | tuple, optional): The airport ref_distance_nm is measured from (see reference_point()). Defaults to REFERENCE_POINT.
+
+    Returns:
+    - pd.DataFrame: df, with float32 alt_ft, geo_alt_ft, speed_kt, vertical_rate_fpm and ref_distance_nm columns
+      and categorical phase, alt_band and region columns (missing where an input is missing).
+    """
+    baro_altitude = df["baro_altitude"].to_numpy(dtype=np.float32, na_value=np.nan)
+    vertical_rate = df["vertical_rate"].to_numpy(dtype=np.float32, na_value=np.nan)
+    on_ground = df["on_ground"].to_numpy(dtype=bool)
+
+    alt_ft = baro_altitude * FT_PER_M
+    vertical_rate_fpm = vertical_rate * FPM_PER_MS
+    df["alt_ft"] = alt_ft
+    df["geo_alt_ft"] = df["geo_altitude"].to_numpy(dtype=np.float32, na_value=np.nan) * FT_PER_M
+    df["speed_kt"] = df["velocity"].to_numpy(dtype=np.float32, na_value=np.nan) * KT_PER_MS
+    df["vertical_rate_fpm"] = vertical_rate_fpm
+    df["phase"] = _categorical(flight_phase_codes(on_ground, alt_ft, vertical_rate_fpm), PHASE_LABELS)
+
+    latitude, longitude = reference_point(reference)
+    df["ref_distance_nm"] = haversine_nm(df["latitude"].to_numpy(dtype=np.float32, na_value=np.nan),
+                                         df["longitude"].to_numpy(dtype=np.float32, na_value=np.nan),
+                                         latitude, longitude).astype(np.float32)
+
+    df["alt_band"] = _categorical(bin_codes(alt_ft, ALT_BINS), ALT_LABELS)
+    df["region"] = _categorical(bin_codes(df["longitude"].to_numpy(dtype=np.float64, na_value=np.nan), REGION_BINS),
+                                REGION_LABELS)
+    return df
@@ -0,0 +1,185 @@
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import metrics
+
+# Requests per second and burst size, keyed by host or host + path prefix (the longest match wins).
+# The anonymous OpenSky API allows about one states/all request every 10 seconds, so states get no burst;
+# flight lists have their own host-wide bucket and are only limited by OpenSky's daily credits.
+HOST_RATE_LIMITS = {
+    "opensky-network.org/api/states": (0.1, 1),
+    "opensky-network.org": (2, 8),
+    "api.aviationstack.com": (5, 5),
+}
+DEFAULT_RATE_LIMIT = (10, 10)
+
+# Status codes that are worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Blocking token-bucket rate limiter: `rate` tokens are added per second, up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, waiting until one is available.
+
+        Returns:
+        - float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+class HttpClient:
+    """
+    Shared HTTP client: one pooled keep-alive requests.Session, per-host token buckets, retries with
+    jittered exponential backoff on connection errors and 429/5xx responses, and a thread pool to issue
+    independent requests concurrently.
+    """
+
+    def __init__(self, pool_size=16, max_retries=3, backoff=0.5, max_backoff=8.0, rate_limits=None):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limits = dict(HOST_RATE_LIMITS if rate_limits is None else rate_limits)
+        # Imported here so pages that never make a request (e.g. with the background poller) do not pay for it
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="http")
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        """
+        Return the token bucket that applies to a URL, creating it on first use.
+        """
+        parsed = urlparse(url)
+        target = f"{parsed.hostname}{parsed.path}"
+        matches = [key for key in self.rate_limits if target == key or target.startswith(key.rstrip("/") + "/")]
+        key = max(matches, key=len) if matches else parsed.hostname
+        with self._lock:
+            if key not in self._buckets:
+                rate, capacity = self.rate_limits.get(key, DEFAULT_RATE_LIMIT)
+                self._buckets[key] = TokenBucket(rate, capacity)
+            return self._buckets[key]
+
+    def _retry_delay(self, attempt, response=None):
+        """
+        Return how long to wait before the next attempt: the server's Retry-After (or OpenSky's
+        X-Rate-Limit-Retry-After-Seconds) if present, otherwise full-jitter exponential backoff.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After") or response.headers.get("X-Rate-Limit-Retry-After-Seconds")
+            if retry_after is not None and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, url, params=None, timeout=20):
+        """
+        GET a URL through the shared session, honouring the host's rate limit and retrying transient failures.
+
+        Parameters:
+        - url (str): The URL.
+        - params (dict, optional): Query parameters.
+        - timeout (float | tuple, optional): requests timeout (seconds, or (connect, read)). Defaults to 20.
+
+        Returns:
+        - requests.Response: The last response (which may still be a 429/5xx after all retries).
+        """
+        import requests
+
+        bucket = self._bucket(url)
+        host = urlparse(url).hostname
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                metrics.inc("skyline_http_retries_total", host=host)
+            bucket.acquire()
+            try:
+                with metrics.timed(f"http.{host}"):
+                    response = self.session.get(url, params=params, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+            if metrics.ENABLED:
+                metrics.inc("skyline_http_requests_total", host=host, status=str(response.status_code))
+                metrics.inc("skyline_http_bytes_total", len(response.content), host=host)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            time.sleep(self._retry_delay(attempt, response))
+        return response
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the client's thread pool and return its Future.
+        fn must not wait on other work submitted to the pool (see fetch_concurrently).
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def fetch_concurrently(self, calls):
+        """
+        Run independent fetches at the same time.
+        The calls get threads of their own rather than the client's pool: a fetch may submit its requests
+        to the pool and wait for them, and pool workers blocked on such waits would starve the pool.
+
+        Parameters:
+        - calls (dict): Name → zero-argument callable (e.g. a fetch function or a functools.partial of one).
+
+        Returns:
+        - dict: Name → result, or the exception the call raised.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(calls)), thread_name_prefix="fetch") as executor:
+            futures = {name: executor.submit(fn) for name, fn in calls.items()}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = e
+        return results
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client():
+    """
+    Return the process-wide HttpClient, creating it on first use.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
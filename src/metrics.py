@@ -0,0 +1,308 @@
+
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: only the in-process lock applies
+    fcntl = None
+
+# Metrics are off unless SKYLINE_METRICS=1; when off, timers and counters return before touching any state
+ENABLED = os.environ.get("SKYLINE_METRICS", "0") == "1"
+# Port of the Prometheus text endpoint (0 disables it)
+METRICS_PORT = int(os.environ.get("SKYLINE_METRICS_PORT", 0))
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "skyline_stage_seconds": ("histogram", "Time spent in a fetch, decode, aggregation or render stage."),
+    "skyline_http_requests_total": ("counter", "HTTP responses received, by host and status code."),
+    "skyline_http_bytes_total": ("counter", "Response body bytes downloaded, by host."),
+    "skyline_http_retries_total": ("counter", "Retried HTTP requests, by host."),
+    "skyline_cache_hits_total": ("counter", "Cache hits, by cache."),
+    "skyline_cache_misses_total": ("counter", "Cache misses, by cache."),
+    "skyline_api_quota_used": ("gauge", "API requests spent in the current quota period."),
+    "skyline_api_quota_limit": ("gauge", "API requests allowed per quota period."),
+}
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count], sum
+_collectors = []
+
+
+def set_enabled(enabled):
+    """
+    Turn recording on or off at runtime.
+    """
+    global ENABLED
+    ENABLED = bool(enabled)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """
+    Add value to a counter.
+    """
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """
+    Record one observation in a histogram with LATENCY_BUCKETS.
+    """
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        buckets, total = _histograms.get(key, ([0] * (len(LATENCY_BUCKETS) + 1), 0.0))
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+        _histograms[key] = (buckets, total + value)
+
+
+class _Timer:
+    """
+    Context manager that records its duration under skyline_stage_seconds{stage=...}.
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("skyline_stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+
+
+_NULL_TIMER = nullcontext()
+
+
+def timed(stage):
+    """
+    Time a block: `with metrics.timed("opensky.decode"): ...`. A shared no-op context when metrics are off.
+    """
+    return _Timer(stage) if ENABLED else _NULL_TIMER
+
+
+def timed_function(stage):
+    """
+    Decorator version of timed().
+    """
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_collector(collect):
+    """
+    Register a callable that returns [(metric name, labels dict, value), ...] when metrics are exported.
+    Use it for values that are already counted elsewhere (cache stats, quotas), so the hot path pays nothing.
+    """
+    with _lock:
+        if collect not in _collectors:
+            _collectors.append(collect)
+
+
+def cache_collector(cache_name, stats):
+    """
+    Return a collector exporting the "hits"/"misses" of a stats() callable (SnapshotCache, FigureCache, ...).
+    """
+    def collect():
+        values = stats()
+        return [("skyline_cache_hits_total", {"cache": cache_name}, values["hits"]),
+                ("skyline_cache_misses_total", {"cache": cache_name}, values["misses"])]
+    return collect
+
+
+class QuotaLedger:
+    """
+    Persistent count of requests made to a metered API in the current quota period ("month" or "day").
+    It is always on (even with metrics disabled), since an exhausted aviationstack budget cannot be undone.
+    """
+
+    def __init__(self, path, api, limit, period="month"):
+        self.path = path
+        self.api = api
+        self.limit = limit
+        self.period = period
+        self._lock = threading.Lock()
+        register_collector(self.collect)
+
+    def _period_key(self):
+        now = datetime.now(timezone.utc)
+        return f"{now:%Y-%m}" if self.period == "month" else f"{now:%Y-%m-%d}"
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def spend(self, requests=1):
+        """
+        Record requests made to the API and return the total used in the current period.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # The poller and the app both spend from the same file, so the read-modify-write is also locked across processes
+        with self._lock, open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file is closed
+            usage = self._load()
+            periods = usage.setdefault(self.api, {})
+            key = self._period_key()
+            periods[key] = periods.get(key, 0) + requests
+            tmp_path = f"{self.path}.tmp-{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                json.dump(usage, f)
+            os.replace(tmp_path, self.path)
+            return periods[key]
+
+    def used(self):
+        """
+        Return the number of requests made in the current period.
+        """
+        return self._load().get(self.api, {}).get(self._period_key(), 0)
+
+    def remaining(self):
+        return max(0, self.limit - self.used())
+
+    def collect(self):
+        labels = {"api": self.api, "period": self._period_key()}
+        return [("skyline_api_quota_used", labels, self.used()),
+                ("skyline_api_quota_limit", {"api": self.api}, self.limit)]
+
+
+def samples():
+    """
+    Return every current sample as (metric name, labels dict, value), histograms expanded into
+    _bucket/_sum/_count samples like in the Prometheus text format.
+    """
+    with _lock:
+        counters = list(_counters.items())
+        histograms = [(key, list(buckets), total) for key, (buckets, total) in _histograms.items()]
+        collectors = list(_collectors)
+
+    result = [(name, dict(labels), value) for (name, labels), value in counters]
+    for (name, labels), buckets, total in histograms:
+        cumulative = 0
+        for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], buckets):
+            cumulative += count
+            result.append((f"{name}_bucket", {**dict(labels), "le": str(bound)}, cumulative))
+        result.append((f"{name}_sum", dict(labels), total))
+        result.append((f"{name}_count", dict(labels), cumulative))
+    for collect in collectors:
+        try:
+            result.extend(collect())
+        except Exception:
+            pass  # A broken collector must not take the endpoint down
+    return result
+
+
+def render_prometheus() -> str:
+    """
+    Return every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    described = set()
+    for name, labels, value in sorted(samples(), key=lambda sample: sample[0]):
+        base = name
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix) and name[:-len(suffix)] in HELP:
+                base = name[:-len(suffix)]
+        if base not in described and base in HELP:
+            kind, text = HELP[base]
+            lines += [f"# HELP {base} {text}", f"# TYPE {base} {kind}"]
+            described.add(base)
+        label_text = ",".join(f'{key}="{str(val)}"' for key, val in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def stage_summary():
+    """
+    Return the count, mean and approximate p95 (bucket upper bound) of every stage, for the diagnostics panel.
+    """
+    with _lock:
+        histograms = [(dict(labels), list(buckets), total) for (name, labels), (buckets, total) in _histograms.items()
+                      if name == "skyline_stage_seconds"]
+    rows = []
+    for labels, buckets, total in histograms:
+        count = sum(buckets)
+        cumulative, p95 = 0, float("inf")
+        for bound, bucket in zip(list(LATENCY_BUCKETS) + [float("inf")], buckets):
+            cumulative += bucket
+            if cumulative >= 0.95 * count:
+                p95 = bound
+                break
+        rows.append({"stage": labels.get("stage"), "count": count, "mean_ms": 1e3 * total / count, "p95_ms_le": 1e3 * p95})
+    return sorted(rows, key=lambda row: row["stage"])
+
+
+def reset():
+    """
+    Clear recorded counters and histograms (collectors stay registered).
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """
+    Serve render_prometheus() on http://0.0.0.0:<port>/metrics from a daemon thread.
+
+    Returns:
+    - ThreadingHTTPServer | None: The server, or None when port is 0.
+    """
+    if not port:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
@@ -0,0 +1,259 @@
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+
+from cli_demo import DATA_DIR, fetch_opensky_snapshot
+
+# Where the poller publishes the latest snapshot and its status for the UI process
+LIVE_DIR = os.path.join(DATA_DIR, "live")
+LIVE_SNAPSHOT_PATH = os.path.join(LIVE_DIR, "snapshot.arrow")
+LIVE_STATUS_PATH = os.path.join(LIVE_DIR, "status.json")
+# Set by the Docker entrypoint: a poller runs next to the app, so the UI only reads published data
+POLLER_ENABLED = os.environ.get("SKYLINE_POLLER", "0") == "1"
+# A published snapshot older than this (seconds) is reported as stale
+PUBLISHED_MAX_AGE = float(os.environ.get("SKYLINE_PUBLISHED_MAX_AGE", 60))
+# After a failed airline refresh, wait this long before spending quota on another attempt
+AIRLINE_RETRY_INTERVAL = 3600
+
+
+def _write_atomic(path, write):
+    """
+    Call write(tmp_path) and rename the result over path, so readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def publish_snapshot(df, path=LIVE_SNAPSHOT_PATH):
+    """
+    Publish a snapshot as an uncompressed Arrow IPC file that readers can memory-map.
+    The file is replaced atomically; readers that still map the previous file keep a consistent copy.
+
+    Parameters:
+    - df (pd.DataFrame): A snapshot from fetch_opensky_snapshot().
+    - path (str, optional): The published file. Defaults to LIVE_SNAPSHOT_PATH.
+    """
+    timestamp = df.attrs.get("timestamp")
+    snapshot = df.copy(deep=False)
+    snapshot.attrs = {}  # The timestamp goes into the schema metadata instead
+    table = pa.Table.from_pandas(snapshot, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    if timestamp is not None:
+        metadata[b"skyline.timestamp"] = pd.Timestamp(timestamp).isoformat().encode()
+    table = table.replace_schema_metadata(metadata)
+
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    _write_atomic(path, write)
+
+
+def read_published_snapshot(path=LIVE_SNAPSHOT_PATH) -> pd.DataFrame:
+    """
+    Read a published snapshot through a memory map, with the same dtypes and attrs["timestamp"] as the original.
+    """
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    # Strings stay Arrow-backed like in state_vectors.STATE_DTYPES (pandas would otherwise rebuild Python strings)
+    df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}.get)
+    timestamp = (table.schema.metadata or {}).get(b"skyline.timestamp")
+    if timestamp is not None:
+        df.attrs["timestamp"] = pd.Timestamp(timestamp.decode()).to_pydatetime()
+    return df
+
+
+def read_status(path=LIVE_STATUS_PATH):
+    """
+    Return the poller's last status (see run_poller), or None if it never ran.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class PublishedSnapshot:
+    """
+    Read side of the poller, with the same get()/age()/stats() interface as SnapshotCache.
+
+    get() only stats the published file; it is re-read (memory-mapped) when the poller has replaced it,
+    so a rerun never waits on OpenSky. The returned DataFrame is shared between callers and must not be mutated.
+    """
+
+    def __init__(self, path=LIVE_SNAPSHOT_PATH, max_age=PUBLISHED_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._published_at = None
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "coalesced": 0, "errors": 0}
+
+    def get(self, force=False):
+        """
+        Return the latest published snapshot.
+
+        Parameters:
+        - force (bool, optional): Accepted for compatibility with SnapshotCache; the poller decides when to fetch.
+
+        Returns:
+        - pd.DataFrame: The most recent snapshot of flight state vectors.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise RuntimeError("No snapshot has been published yet. Is the poller running? (python src/cli_demo.py poll)")
+
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if version != self._version:
+                self._snapshot = read_published_snapshot(self.path)
+                self._version = version
+                self._published_at = stat.st_mtime
+                self._counters["misses"] += 1
+            else:
+                self._counters["hits"] += 1
+            if time.time() - self._published_at > self.max_age:
+                self._counters["stale"] += 1
+            return self._snapshot
+
+    def age(self):
+        """
+        Return the age of the published snapshot in seconds, or None if nothing has been read yet.
+        """
+        with self._lock:
+            return None if self._published_at is None else time.time() - self._published_at
+
+    def stats(self):
+        """
+        Return the hit/miss/staleness counters, the snapshot age and the poller's last error.
+        """
+        status = read_status(os.path.join(os.path.dirname(self.path), "status.json")) or {}
+        with self._lock:
+            stats = dict(self._counters)
+        stats["in_flight"] = False
+        stats["last_error"] = status.get("last_error")
+        stats["age_seconds"] = self.age()
+        return stats
+
+
+def run_poller(interval=10, count=None, live_dir=LIVE_DIR, fetch_fn=fetch_opensky_snapshot, archive_root=None,
+               refresh_airlines=True):
+    """
+    Poll OpenSky forever (or `count` times), publishing every snapshot for the UI process, and keep the
+    airline store fresh. Failures are recorded in status.json and the previous snapshot stays published.
+
+    Parameters:
+    - interval (float, optional): Seconds between polls; OpenSky allows about one request every 10 seconds. Defaults to 10.
+    - count (int, optional): Stop after this many polls. Defaults to None (run until interrupted).
+    - live_dir (str, optional): Directory of the published snapshot and status. Defaults to LIVE_DIR.
+    - fetch_fn (callable, optional): Returns one snapshot. Defaults to fetch_opensky_snapshot.
+    - archive_root (str, optional): Also append every snapshot to this Parquet archive (see archive.py), compacting
+      each hour's files once it is over. Defaults to None.
+    - refresh_airlines (bool, optional): Refresh the airline store when it is missing or stale. Defaults to True.
+    """
+    from airline_store import AIRLINE_STORE_MAX_AGE, airline_store_age, refresh_airline_store
+
+    snapshot_path = os.path.join(live_dir, "snapshot.arrow")
+    status_path = os.path.join(live_dir, "status.json")
+    status = read_status(status_path) or {}
+    last_airline_attempt = None
+    current_hour = None  # Of the archive, compacted whenever a new hour starts (as record_snapshots does)
+    polls = 0
+    while count is None or polls < count:
+        started = time.monotonic()
+        status["last_poll"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        try:
+            df = fetch_fn()
+            publish_snapshot(df, snapshot_path)
+            if archive_root is not None:
+                from archive import append_snapshot
+                append_snapshot(df, archive_root)
+            status.update(last_success=status["last_poll"], rows=len(df), last_error=None)
+            print(f"Published {len(df)} flights at {df.attrs.get('timestamp')}")
+        except Exception as e:
+            status["last_error"] = f"{type(e).__name__}: {e}"
+            print("Error:", status["last_error"])
+        if archive_root is not None:
+            from archive import compact_finished_hours
+            try:
+                current_hour, merged = compact_finished_hours(archive_root, current_hour)
+                if merged:
+                    print(f"Compacted {merged} files")
+            except Exception as e:
+                print("Compaction failed:", e)
+
+        # Reference data is refreshed here rather than on a page load; failed attempts are spaced out to save quota
+        age = airline_store_age()
+        if refresh_airlines and (age is None or age > AIRLINE_STORE_MAX_AGE) and \
+                (last_airline_attempt is None or time.monotonic() - last_airline_attempt > AIRLINE_RETRY_INTERVAL):
+            last_airline_attempt = time.monotonic()
+            try:
+                stored = refresh_airline_store()
+                status["airlines_refreshed"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+                print(f"Stored {stored} airlines")
+            except Exception as e:
+                status["airline_error"] = f"{type(e).__name__}: {e}"
+                print("Airline refresh failed:", status["airline_error"])
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(status, f)
+        _write_atomic(status_path, write)
+
+        polls += 1
+        if count is None or polls < count:
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def replay_archive(start=None, end=None, speed=10.0, live_dir=LIVE_DIR, archive_root=None):
+    """
+    Publish archived snapshots in time order as if the poller were fetching them, so the dashboard
+    (started with SKYLINE_POLLER=1) can be demoed or profiled on recorded history without calling OpenSky.
+
+    Parameters:
+    - start (datetime, optional): Inclusive UTC start of the replayed range.
+    - end (datetime, optional): Exclusive UTC end of the replayed range.
+    - speed (float, optional): Replay speed relative to the recording; 0 publishes as fast as possible. Defaults to 10.
+    - live_dir (str, optional): Directory of the published snapshot and status. Defaults to LIVE_DIR.
+    - archive_root (str, optional): The archive directory. Defaults to archive.ARCHIVE_DIR.
+
+    Returns:
+    - int: The number of snapshots published.
+    """
+    from archive import ARCHIVE_DIR, iter_snapshots
+    from features import add_derived_features
+
+    snapshot_path = os.path.join(live_dir, "snapshot.arrow")
+    status_path = os.path.join(live_dir, "status.json")
+    published = 0
+    previous = None
+    for df in iter_snapshots(start, end, archive_root or ARCHIVE_DIR):
+        timestamp = df.attrs["timestamp"]
+        if previous is not None and speed > 0:
+            time.sleep(max(0.0, (timestamp - previous).total_seconds() / speed))
+        previous = timestamp
+        publish_snapshot(add_derived_features(df), snapshot_path)
+        published += 1
+        status = {"last_poll": datetime.now(timezone.utc).isoformat(timespec="seconds"), "rows": len(df),
+                  "replaying": timestamp.isoformat(), "last_error": None}
+        status["last_success"] = status["last_poll"]
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(status, f)
+        _write_atomic(status_path, write)
+        print(f"Replayed {len(df)} flights recorded at {timestamp}")
+    return published
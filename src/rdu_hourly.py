@@ -0,0 +1,71 @@
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from cli_demo import fetch_airport_flights
+
+
+def hourly_counts_for_days(icao, tz, start, days) -> pd.DataFrame:
+    """
+    Count the arrivals and departures of an airport per local hour over several consecutive local days.
+    Departures are bucketed on firstSeen and arrivals on lastSeen. Both lists are fetched in parallel,
+    and days that OpenSky has finished processing are served from the on-disk flight cache.
+
+    Parameters:
+    - icao (str): Airport ICAO code, e.g. "KRDU".
+    - tz (str): IANA time zone that defines the local days, e.g. "America/New_York".
+    - start (pd.Timestamp | datetime.date): The first local date.
+    - days (int): Number of days.
+
+    Returns:
+    - pd.DataFrame: 24 rows per day with "date", "hour" (0-23), "arrivals" and "departures" columns.
+    """
+    range_start = pd.Timestamp(start).normalize().tz_localize(tz)
+    range_end = range_start + pd.DateOffset(days=days)  # Calendar days: a DST change makes a local day 23 or 25 hours
+    begin, end = int(range_start.timestamp()), int(range_end.timestamp())
+
+    # Not on the HTTP client's pool: each fetch submits its day chunks to that pool and waits for them
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="heatmap") as executor:
+        arrivals = executor.submit(fetch_airport_flights, icao, begin, end, kind="arrival")
+        departures = executor.submit(fetch_airport_flights, icao, begin, end, kind="departure")
+        return count_flights_per_hour(arrivals.result(), departures.result(), tz, start, days)
+
+
+def count_flights_per_hour(arrivals, departures, tz, start, days) -> pd.DataFrame:
+    """
+    Count arrivals (on lastSeen) and departures (on firstSeen) per local hour of consecutive local days.
+
+    Parameters:
+    - arrivals (pd.DataFrame): Arrival flights with a "lastSeen" UNIX time column.
+    - departures (pd.DataFrame): Departure flights with a "firstSeen" UNIX time column.
+    - tz (str): IANA time zone that defines the local days.
+    - start (pd.Timestamp | datetime.date): The first local date.
+    - days (int): Number of days.
+
+    Returns:
+    - pd.DataFrame: 24 rows per day with "date", "hour" (0-23), "arrivals" and "departures" columns.
+    """
+    range_start = pd.Timestamp(start).normalize()
+    dates = pd.date_range(range_start, periods=days, freq="D").date
+    counts = pd.MultiIndex.from_product([dates, range(24)], names=["date", "hour"]).to_frame(index=False)
+    for column, flights, time_column in (("arrivals", arrivals, "lastSeen"), ("departures", departures, "firstSeen")):
+        seen = pd.to_datetime(pd.to_numeric(flights[time_column]), unit="s", utc=True).dt.tz_convert(tz)
+        per_hour = pd.Series(1, index=pd.MultiIndex.from_arrays([seen.dt.date, seen.dt.hour])).groupby(level=[0, 1]).size()
+        counts[column] = per_hour.reindex(pd.MultiIndex.from_frame(counts[["date", "hour"]]), fill_value=0).to_numpy()
+    return counts
+
+
+def hourly_counts_for_day(icao, tz, date) -> pd.DataFrame:
+    """
+    Count the arrivals and departures of an airport per local hour of one local day (see hourly_counts_for_days).
+
+    Parameters:
+    - icao (str): Airport ICAO code, e.g. "KRDU".
+    - tz (str): IANA time zone that defines the local day, e.g. "America/New_York".
+    - date (pd.Timestamp | datetime.date): The local date.
+
+    Returns:
+    - pd.DataFrame: 24 rows with "hour" (0-23), "arrivals" and "departures" columns.
+    """
+    return hourly_counts_for_days(icao, tz, date, 1).drop(columns="date")
@@ -0,0 +1,151 @@
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from archive import ARCHIVE_DIR, archive_partitions
+from callsign_resolver import CallsignResolver
+
+# Worker processes of the archive reports (every hour partition is one task)
+REPORT_WORKERS = int(os.environ.get("SKYLINE_REPORT_WORKERS", 0)) or os.cpu_count() or 1
+
+# Set in every worker process by _init_worker
+_resolver = None
+
+
+def _init_worker(designators):
+    global _resolver
+    _resolver = CallsignResolver(designators)
+
+
+def _read_partition(partition, columns, start, end, dictionary_columns=()):
+    """
+    Read some columns of one hour partition, restricted to [start, end).
+    String columns listed in dictionary_columns stay dictionary-encoded (as stored in Parquet), so
+    repeated values such as country names are never materialized row by row.
+    """
+    fmt = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=list(dictionary_columns)))
+    expressions = []
+    if start is not None:
+        expressions.append(ds.field("snapshot_time") >= pa.scalar(start, pa.timestamp("s")))
+    if end is not None:
+        expressions.append(ds.field("snapshot_time") < pa.scalar(end, pa.timestamp("s")))
+    combined = None
+    for expression in expressions:
+        combined = expression if combined is None else combined & expression
+    return ds.dataset(partition, format=fmt).to_table(columns=columns, filter=combined)
+
+
+def _country_task(task):
+    """
+    Count the snapshots and the aircraft observations per country of one partition.
+    """
+    partition, start, end = task
+    table = _read_partition(partition, ["snapshot_time", "origin_country"], start, end, ["origin_country"])
+    snapshots = pc.count_distinct(table["snapshot_time"]).as_py()
+    counts = pc.value_counts(table["origin_country"])  # Counts the dictionary indices
+    return snapshots, pd.Series(counts.field("counts").to_numpy(), index=counts.field("values").to_pylist(), dtype="int64")
+
+
+def _airline_task(task):
+    """
+    Count the distinct aircraft per airline in one partition (one UTC hour).
+    """
+    partition, start, end = task
+    table = _read_partition(partition, ["icao24", "callsign"], start, end)
+    # Distinct (callsign, aircraft) pairs are resolved instead of every observation
+    pairs = table.group_by(["callsign", "icao24"]).aggregate([]).to_pandas()
+    pairs["airline"] = _resolver.resolve(pairs["callsign"])
+    return pairs.drop_duplicates(subset=["airline", "icao24"]).groupby("airline", observed=True).size()
+
+
+def _run_partitions(task_fn, tasks, workers, designators=None):
+    """
+    Run task_fn over the partition tasks in a process pool (in this process for a single worker or task),
+    returning the results in task order.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        _init_worker(designators)
+        return [task_fn(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                             initargs=(designators,)) as pool:
+        return list(pool.map(task_fn, tasks))
+
+
+def busiest_countries(start=None, end=None, root=ARCHIVE_DIR, top=20, workers=REPORT_WORKERS) -> pd.DataFrame:
+    """
+    Rank origin countries by the average number of their aircraft in an archived snapshot.
+    Every hour partition is counted in its own process and the partial counts are summed.
+
+    Parameters:
+    - start (datetime, optional): Inclusive UTC start of the range.
+    - end (datetime, optional): Exclusive UTC end of the range.
+    - root (str, optional): The archive directory. Defaults to ARCHIVE_DIR.
+    - top (int, optional): Number of countries to return. Defaults to 20.
+    - workers (int, optional): Worker processes. Defaults to REPORT_WORKERS.
+
+    Returns:
+    - pd.DataFrame: "origin_country", "observations" and "avg_flights" columns, busiest first.
+    """
+    tasks = [(partition, start, end) for partition, _ in archive_partitions(root, start, end)]
+    results = _run_partitions(_country_task, tasks, workers)
+    snapshots = sum(result[0] for result in results)
+    if not snapshots:
+        return pd.DataFrame(columns=["origin_country", "observations", "avg_flights"])
+    observations = pd.concat([result[1] for result in results]).groupby(level=0).sum()
+    report = observations.rename("observations").rename_axis("origin_country").reset_index()
+    report["avg_flights"] = (report["observations"] / snapshots).round(1)
+    return report.sort_values("observations", ascending=False, kind="stable").head(top).reset_index(drop=True)
+
+
+def airlines_per_hour(start=None, end=None, root=ARCHIVE_DIR, top=10, designators=None,
+                      workers=REPORT_WORKERS) -> pd.DataFrame:
+    """
+    Count the distinct aircraft of every airline per UTC hour of the archive.
+    The archive is partitioned by hour, so every partition is one independent task of the process pool.
+
+    Parameters:
+    - start, end, root, workers: See busiest_countries().
+    - top (int, optional): Only keep the airlines with the most aircraft over the whole range. Defaults to 10.
+    - designators (dict, optional): ICAO designator → airline name, e.g. from designators_from_airlines().
+      Defaults to the resolver's built-in table.
+
+    Returns:
+    - pd.DataFrame: One row per hour and one column per airline.
+    """
+    partitions = archive_partitions(root, start, end)
+    tasks = [(partition, start, end) for partition, _ in partitions]
+    results = _run_partitions(_airline_task, tasks, workers, designators)
+    if not results:
+        return pd.DataFrame()
+    table = pd.DataFrame(results, index=pd.DatetimeIndex([hour for _, hour in partitions], name="hour")).fillna(0)
+    table = table.astype("int64")
+    busiest = table.sum().sort_values(ascending=False, kind="stable").index[:top]
+    return table[busiest]
+
+
+def airport_heatmap(icao, tz, start, days, kind="both") -> pd.DataFrame:
+    """
+    Return a day × local hour table of an airport's traffic from the cached OpenSky flight lists
+    (missing finished days are fetched once and cached, see cli_demo.fetch_airport_flights).
+
+    Parameters:
+    - icao (str): Airport ICAO code, e.g. "KRDU".
+    - tz (str): IANA time zone of the local days.
+    - start (pd.Timestamp | datetime.date): The first local date.
+    - days (int): Number of days.
+    - kind (str, optional): "arrivals", "departures" or "both". Defaults to "both".
+
+    Returns:
+    - pd.DataFrame: One row per date and one column per hour (0-23).
+    """
+    from rdu_hourly import hourly_counts_for_days
+
+    counts = hourly_counts_for_days(icao, tz, start, days)
+    counts["both"] = counts["arrivals"] + counts["departures"]
+    return counts.pivot(index="date", columns="hour", values=kind)
+
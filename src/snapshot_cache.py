@@ -0,0 +1,126 @@
+
+import os
+import threading
+import time
+
+from cli_demo import fetch_opensky_snapshot
+
+# Seconds a snapshot is served before a refresh is attempted
+DEFAULT_TTL = float(os.environ.get("OPENSKY_CACHE_TTL", 15))
+# The anonymous OpenSky API allows about one request every 10 seconds
+OPENSKY_MIN_INTERVAL = float(os.environ.get("OPENSKY_MIN_INTERVAL", 10))
+
+
+class SnapshotCache:
+    """
+    Process-wide, TTL-aware cache in front of fetch_opensky_snapshot().
+
+    - A snapshot younger than `ttl` seconds is returned straight from memory.
+    - Only one refresh runs at a time. Callers arriving while it is in flight get
+      the last good snapshot, or wait for the refresh if there is nothing to serve yet.
+    - Upstream is never called more often than once every `min_interval` seconds,
+      even if the TTL is shorter or a caller forces a refresh.
+    - If a refresh fails, the last good snapshot keeps being served.
+
+    The returned DataFrame is shared between callers and must not be mutated.
+    """
+
+    def __init__(self, fetch_fn=fetch_opensky_snapshot, ttl=DEFAULT_TTL,
+                 min_interval=OPENSKY_MIN_INTERVAL, clock=time.monotonic):
+        self._fetch_fn = fetch_fn
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._refreshed = threading.Condition(self._lock)
+        self._snapshot = None
+        self._fetched_at = None
+        self._last_attempt = None
+        self._last_error = None
+        self._in_flight = False
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "coalesced": 0, "errors": 0}
+
+    def get(self, force=False):
+        """
+        Return the current snapshot, refreshing it from OpenSky when needed.
+
+        Parameters:
+        - force (bool, optional): Refresh even if the cached snapshot is within its TTL
+          (the upstream rate limit still applies). Defaults to False.
+
+        Returns:
+        - pd.DataFrame: The most recent snapshot of flight state vectors.
+        """
+        with self._lock:
+            now = self._clock()
+            if self._snapshot is not None and not force and now - self._fetched_at < self.ttl:
+                self._counters["hits"] += 1
+                return self._snapshot
+
+            if self._in_flight:
+                if self._snapshot is not None:
+                    self._counters["stale"] += 1
+                    return self._snapshot
+                # Nothing to serve yet, so wait for the request that is already running
+                self._counters["coalesced"] += 1
+                while self._in_flight:
+                    self._refreshed.wait()
+                if self._snapshot is None:
+                    raise RuntimeError(f"OpenSky refresh failed: {self._last_error}")
+                return self._snapshot
+
+            if self._last_attempt is not None and now - self._last_attempt < self.min_interval:
+                # Too soon to call OpenSky again
+                if self._snapshot is not None:
+                    self._counters["stale"] += 1
+                    return self._snapshot
+                wait = self.min_interval - (now - self._last_attempt)
+                raise RuntimeError(f"OpenSky rate limit: retry in {wait:.0f}s (last error: {self._last_error})")
+
+            self._in_flight = True
+            self._last_attempt = now
+            self._counters["misses"] += 1
+
+        try:
+            snapshot = self._fetch_fn()
+        except Exception as e:
+            with self._lock:
+                self._in_flight = False
+                self._last_error = e
+                self._counters["errors"] += 1
+                self._refreshed.notify_all()
+                if self._snapshot is not None:
+                    self._counters["stale"] += 1
+                    return self._snapshot
+            raise
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._fetched_at = self._clock()
+            self._last_error = None
+            self._in_flight = False
+            self._refreshed.notify_all()
+        return snapshot
+
+    def age(self):
+        """
+        Return the age of the cached snapshot in seconds, or None if nothing has been fetched yet.
+        """
+        with self._lock:
+            if self._fetched_at is None:
+                return None
+            return self._clock() - self._fetched_at
+
+    def stats(self):
+        """
+        Return the hit/miss/staleness counters together with the current snapshot age.
+
+        Returns:
+        - dict: Counter values plus "age_seconds", "in_flight" and "last_error".
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = self._in_flight
+            stats["last_error"] = None if self._last_error is None else str(self._last_error)
+        stats["age_seconds"] = self.age()
+        return stats
@@ -0,0 +1,319 @@
+
+import os
+import threading
+import zlib
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from state_vectors import STATE_DTYPES
+
+# Fixed-point scale of every quantized column: the stored integer is round(value * scale), so the largest
+# decoding error is 0.5 / scale (0.000005° ≈ 0.5 m for positions, 5 mm for altitudes) plus the rounding of the
+# float32 column the value is decoded into (half a float32 step, up to ~0.0000076° for longitudes beyond ±128°)
+QUANTIZED = {
+    "longitude": 100000,
+    "latitude": 100000,
+    "baro_altitude": 100,
+    "geo_altitude": 100,
+    "velocity": 100,
+    "true_track": 100,
+    "vertical_rate": 100,
+}
+# Integer columns (seconds), stored exactly
+INTEGERS = ("time_position", "last_contact")
+# Columns that rarely change for an aircraft: delta frames only store them for new aircraft and changed values
+SPARSE = ("icao24", "callsign", "origin_country", "squawk")
+# Small columns stored as they are
+PLAIN = ("on_ground", "spi", "position_source")
+
+# A keyframe is written every this many snapshots, and whenever most aircraft are new
+KEYFRAME_INTERVAL = 30
+KEYFRAME_NEW_SHARE = 0.5
+
+# Arrow IPC buffer compression; builds of pyarrow without zstd/lz4 fall back to zlib over the whole frame
+CODEC = next((codec for codec in ("zstd", "lz4") if pa.Codec.is_available(codec)), None)
+
+# Flags in the first byte of a frame
+FLAG_KEYFRAME = 1
+FLAG_ZLIB = 2
+
+# Snapshots kept by SnapshotHistory (hours)
+HISTORY_HOURS = float(os.environ.get("SKYLINE_HISTORY_HOURS", 1))
+
+
+def _integer_columns(df):
+    """
+    Return {column: (int64 values, missing mask)} of the QUANTIZED (as fixed-point) and INTEGERS columns.
+    Values are 0 where missing.
+    """
+    columns = {}
+    for column, scale in QUANTIZED.items():
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(values)
+        columns[column] = (np.where(missing, 0, np.round(values * scale)).astype(np.int64), missing)
+    for column in INTEGERS:
+        series = df[column]
+        missing = series.isna().to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            values = series.to_numpy().astype("datetime64[s]").astype(np.int64)
+        else:
+            values = series.to_numpy(dtype=np.int64, na_value=0)
+        columns[column] = (np.where(missing, 0, values), missing)
+    return columns
+
+
+def _int_array(values, missing=None):
+    """
+    Build the narrowest Arrow integer array that holds the values, with nulls where missing.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return pa.array(values.astype(dtype), mask=missing)
+    return pa.array(values, mask=missing)
+
+
+def is_keyframe(frame) -> bool:
+    """
+    Return whether an encoded frame is a keyframe (decoding can start there).
+    """
+    return bool(frame[0] & FLAG_KEYFRAME)
+
+
+def _write_frame(table, keyframe, codec):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=codec)) as writer:
+        writer.write_table(table)
+    body = sink.getvalue().to_pybytes()
+    flags = FLAG_KEYFRAME if keyframe else 0
+    if codec is None:
+        flags |= FLAG_ZLIB
+        body = zlib.compress(body, 6)
+    return bytes([flags]) + body
+
+
+def _read_frame(frame):
+    body = frame[1:]
+    if frame[0] & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    return pa.ipc.open_stream(body).read_all()
+
+
+class SnapshotEncoder:
+    """
+    Encodes consecutive snapshots from fetch_opensky_snapshot() into compact frames (bytes).
+
+    A keyframe stores a whole snapshot. The following delta frames store, per aircraft, its row in the
+    previous snapshot, the change of every fixed-point position/altitude/speed value and of the report times,
+    and callsign/squawk/country only when they changed; aircraft that disappeared are simply not referenced.
+    Frames are Arrow IPC streams with zstd (or lz4) buffer compression and the narrowest integer type per
+    column, so the mostly tiny deltas take a few bytes per aircraft.
+    Decoding is lossy only by the QUANTIZED scales; derived feature columns are not encoded.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, codec=CODEC):
+        self.keyframe_interval = keyframe_interval
+        self.codec = codec
+        self._previous = None  # (icao24 index, integer columns, sparse columns) of the previous snapshot
+        self._since_keyframe = 0
+
+    def encode(self, df) -> bytes:
+        """
+        Encode the next snapshot.
+
+        Parameters:
+        - df (pd.DataFrame): A snapshot with the state vector columns and its time in df.attrs["timestamp"].
+
+        Returns:
+        - bytes: The frame. A SnapshotDecoder decodes it after every earlier frame since the last keyframe.
+        """
+        df = df.drop_duplicates(subset="icao24", keep="last")
+        icao24 = pd.Index(df["icao24"].to_numpy(dtype=object, na_value=""))
+        integers = _integer_columns(df)
+        sparse = {column: df[column].to_numpy(dtype=object, na_value=None) for column in SPARSE}
+
+        previous_pos = None
+        if self._previous is not None and self._since_keyframe < self.keyframe_interval:
+            previous_pos = self._previous[0].get_indexer(icao24)
+            if (previous_pos < 0).mean() > KEYFRAME_NEW_SHARE:
+                previous_pos = None
+        keyframe = previous_pos is None
+
+        arrays = {}
+        if keyframe:
+            for column, (values, missing) in integers.items():
+                arrays[column] = _int_array(values, missing)
+            for column, values in sparse.items():
+                arrays[column] = pa.array(values, pa.string())
+            self._since_keyframe = 1
+        else:
+            _, previous_integers, previous_sparse = self._previous
+            matched = previous_pos >= 0
+            gather = np.where(matched, previous_pos, 0)
+            # Aircraft mostly keep their order, so the differences of their previous rows are mostly 1
+            arrays["previous_row"] = _int_array(np.diff(previous_pos, prepend=-1))
+            for column, (values, missing) in integers.items():
+                # New aircraft (and previously missing values) are stored against 0, i.e. as they are
+                base = np.where(matched, previous_integers[column][0][gather], 0)
+                arrays[column] = _int_array(values - base, missing)
+            for column, values in sparse.items():
+                unchanged = matched & (previous_sparse[column][gather] == values)
+                arrays[f"{column}_changed"] = pa.array(~unchanged)
+                arrays[column] = pa.array(np.where(unchanged, None, values), pa.string())
+            self._since_keyframe += 1
+        for column in PLAIN:
+            arrays[column] = pa.array(df[column].to_numpy())
+
+        table = pa.table(arrays)
+        timestamp = df.attrs.get("timestamp")
+        if timestamp is not None:
+            table = table.replace_schema_metadata({b"timestamp": pd.Timestamp(timestamp).isoformat().encode()})
+        self._previous = (icao24, integers, sparse)
+        return _write_frame(table, keyframe, self.codec)
+
+
+class SnapshotDecoder:
+    """
+    Decodes the frames of one SnapshotEncoder, in order, back into snapshot DataFrames.
+    Decoding can start at any keyframe.
+    """
+
+    def __init__(self):
+        self._previous = None  # (integer columns, sparse columns) of the previous snapshot
+
+    def skip(self, frame):
+        """
+        Apply the next frame without building its DataFrame (when seeking from a keyframe), returning its Arrow table.
+        """
+        keyframe = is_keyframe(frame)
+        if not keyframe and self._previous is None:
+            raise ValueError("Decoding has to start at a keyframe")
+        table = _read_frame(frame)
+
+        if keyframe:
+            matched = np.zeros(table.num_rows, dtype=bool)
+            gather = np.zeros(table.num_rows, dtype=np.int64)
+        else:
+            previous_integers, previous_sparse = self._previous
+            previous_pos = np.cumsum(table["previous_row"].to_numpy().astype(np.int64)) - 1
+            matched = previous_pos >= 0
+            gather = np.where(matched, previous_pos, 0)
+
+        integers = {}
+        for column in list(QUANTIZED) + list(INTEGERS):
+            array = table[column]
+            missing = np.asarray(array.is_null())
+            values = array.fill_null(0).to_numpy().astype(np.int64)
+            if not keyframe:
+                values += np.where(matched, previous_integers[column][0][gather], 0)
+            values[missing] = 0
+            integers[column] = (values, missing)
+        sparse = {}
+        for column in SPARSE:
+            values = table[column].to_numpy(zero_copy_only=False).astype(object)
+            if not keyframe:
+                changed = table[f"{column}_changed"].to_numpy(zero_copy_only=False)
+                values = np.where(changed, values, previous_sparse[column][gather])
+            sparse[column] = values
+        self._previous = (integers, sparse)
+        return table
+
+    def decode(self, frame) -> pd.DataFrame:
+        """
+        Decode the next frame.
+
+        Returns:
+        - pd.DataFrame: The snapshot with the dtypes of state_vectors.STATE_DTYPES and attrs["timestamp"].
+        """
+        table = self.skip(frame)
+        integers, sparse = self._previous
+        # Every column is built with its final dtype, so the DataFrame needs no conversion pass
+        data = {column: pd.array(sparse[column], dtype=STATE_DTYPES[column]) for column in ("icao24", "callsign", "squawk")}
+        data["origin_country"] = pd.Categorical(sparse["origin_country"])
+        for column, scale in QUANTIZED.items():
+            values, missing = integers[column]
+            # Divided in float64 (float32 cannot even hold every fixed-point longitude) and rounded once to float32
+            decoded = (values / scale).astype(np.float32)
+            decoded[missing] = np.nan
+            data[column] = decoded
+        values, missing = integers["time_position"]
+        data["time_position"] = pd.arrays.IntegerArray(values, missing)
+        values, missing = integers["last_contact"]
+        data["last_contact"] = np.where(missing, np.datetime64("NaT", "s"), values.astype("datetime64[s]"))
+        for column in PLAIN:
+            data[column] = table[column].to_numpy(zero_copy_only=False).astype(STATE_DTYPES[column], copy=False)
+
+        df = pd.DataFrame({column: data[column] for column in STATE_DTYPES})
+        timestamp = (table.schema.metadata or {}).get(b"timestamp")
+        if timestamp is not None:
+            df.attrs["timestamp"] = pd.Timestamp(timestamp.decode()).to_pydatetime()
+        return df
+
+
+class SnapshotHistory:
+    """
+    Compressed in-memory history of recent snapshots for replay, shared by every session.
+    Frames older than max_age seconds are dropped a keyframe group at a time, so the oldest kept frame is a keyframe.
+    """
+
+    def __init__(self, max_age=HISTORY_HOURS * 3600, keyframe_interval=KEYFRAME_INTERVAL):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._encoder = SnapshotEncoder(keyframe_interval)
+        self._frames = deque()  # (timestamp, frame, in-memory size of the snapshot DataFrame)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def append(self, df):
+        """
+        Add a snapshot (a no-op unless it is newer than the last one).
+        """
+        timestamp = df.attrs.get("timestamp")
+        with self._lock:
+            if timestamp is None or (self._frames and timestamp <= self._frames[-1][0]):
+                return
+            self._frames.append((timestamp, self._encoder.encode(df), int(df.memory_usage(deep=True).sum())))
+            while True:
+                # The second keyframe group starts where the first one can be dropped
+                next_keyframe = next((i for i in range(1, len(self._frames)) if is_keyframe(self._frames[i][1])), None)
+                if next_keyframe is None or (timestamp - self._frames[next_keyframe][0]).total_seconds() < self.max_age:
+                    break
+                for _ in range(next_keyframe):
+                    self._frames.popleft()
+
+    def timestamps(self):
+        """
+        Return the times of the kept snapshots, oldest first.
+        """
+        with self._lock:
+            return [timestamp for timestamp, _, _ in self._frames]
+
+    def snapshot(self, timestamp) -> pd.DataFrame:
+        """
+        Return the kept snapshot recorded at or just before timestamp, decoded from the keyframe before it.
+        """
+        with self._lock:
+            frames = [frame for recorded, frame, _ in self._frames if recorded <= timestamp]
+        if not frames:
+            raise KeyError(f"No snapshot at or before {timestamp}")
+        start = max(i for i, frame in enumerate(frames) if is_keyframe(frame))
+        decoder = SnapshotDecoder()
+        for frame in frames[start:-1]:
+            decoder.skip(frame)
+        return decoder.decode(frames[-1])
+
+    def stats(self):
+        """
+        Return the number of frames and keyframes, their total size and the compression ratio against the
+        in-memory size of the snapshot DataFrames.
+        """
+        with self._lock:
+            encoded = sum(len(frame) for _, frame, _ in self._frames)
+            raw = sum(size for _, _, size in self._frames)
+            keyframes = sum(1 for _, frame, _ in self._frames if is_keyframe(frame))
+        return {"frames": len(self._frames), "keyframes": keyframes, "bytes": encoded,
+                "ratio": raw / encoded if encoded else None}
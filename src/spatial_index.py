@@ -0,0 +1,199 @@
+
+import numpy as np
+import pandas as pd
+
+# Mean Earth radius in nautical miles
+EARTH_RADIUS_NM = 3440.065
+# Size of the grid cells aircraft are bucketed into (degrees)
+CELL_SIZE = 1.0
+# First search radius of nearest() before it is doubled (nautical miles)
+NEAREST_START_RADIUS_NM = 50.0
+
+# Airports used as reference points by the dashboard: ICAO code -> (latitude, longitude)
+AIRPORTS = {
+    "KRDU": (35.8776, -78.7875),
+    "KATL": (33.6367, -84.4281),
+    "KJFK": (40.6398, -73.7789),
+    "KLAX": (33.9425, -118.4081),
+    "EGLL": (51.4706, -0.4619),
+}
+
+# Named map viewports: name -> (min latitude, max latitude, min longitude, max longitude)
+VIEWPORTS = {
+    "World": (-90.0, 90.0, -180.0, 180.0),
+    "North America": (10.0, 75.0, -170.0, -50.0),
+    "Europe": (34.0, 72.0, -25.0, 45.0),
+    "East Asia": (0.0, 55.0, 90.0, 150.0),
+    "US East Coast": (24.0, 47.0, -90.0, -65.0),
+}
+
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in nautical miles (vectorized over NumPy arrays).
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class SpatialIndex:
+    """
+    Fixed lat/lon grid index over the aircraft positions of one snapshot.
+
+    Aircraft are sorted by grid cell once, and the start of every cell is kept in an offsets array.
+    Cells of one grid row are contiguous, so a bounding box reads one slice per latitude row and only the
+    aircraft in those cells are checked exactly. Radius and nearest-neighbour queries search the box
+    around the circle and then filter on great-circle distance.
+    Query results are positional indices into the rows of the snapshot that have a position.
+    """
+
+    def __init__(self, latitude, longitude, cell_size=CELL_SIZE):
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        self.cell_size = cell_size
+        self.n_rows = int(np.ceil(180 / cell_size))
+        self.n_cols = int(np.ceil(360 / cell_size))
+
+        rows, cols = self._cell(latitude, longitude)
+        cells = rows * self.n_cols + cols
+        self.order = np.argsort(cells, kind="stable")
+        self.latitude = latitude[self.order]
+        self.longitude = longitude[self.order]
+        # offsets[c] is the first sorted aircraft in cell c; offsets[c + 1] is one past its last
+        self.offsets = np.searchsorted(cells[self.order], np.arange(self.n_rows * self.n_cols + 1))
+        # Inverse of order: where each aircraft ended up after sorting
+        self._sorted_position = np.empty_like(self.order)
+        self._sorted_position[self.order] = np.arange(len(self.order))
+        self.frame = None
+
+    @classmethod
+    def from_snapshot(cls, df, cell_size=CELL_SIZE):
+        """
+        Build the index from a snapshot from fetch_opensky_snapshot().
+        Aircraft without a position are left out; `frame` holds the indexed rows, in the order query results refer to.
+        """
+        frame = df.dropna(subset=["latitude", "longitude"])
+        index = cls(frame["latitude"].to_numpy(dtype=np.float64), frame["longitude"].to_numpy(dtype=np.float64), cell_size)
+        index.frame = frame
+        return index
+
+    def __len__(self):
+        return len(self.order)
+
+    def _cell(self, latitude, longitude):
+        """
+        Return the grid row and column of positions (latitudes 90 and longitudes 180 fall into the last cell).
+        """
+        rows = np.clip(((latitude + 90) // self.cell_size).astype(np.int64), 0, self.n_rows - 1)
+        cols = np.clip(((longitude + 180) // self.cell_size).astype(np.int64), 0, self.n_cols - 1)
+        return rows, cols
+
+    def _candidates(self, lat_min, lat_max, lon_min, lon_max):
+        """
+        Return the sorted positions of every aircraft in the grid cells overlapping a box (lon_min <= lon_max).
+        """
+        (row_min, row_max), (col_min, col_max) = self._cell(np.array([lat_min, lat_max]), np.array([lon_min, lon_max]))
+        if col_min == 0 and col_max == self.n_cols - 1:
+            # Whole grid rows are contiguous, so the box is a single slice
+            return np.arange(self.offsets[row_min * self.n_cols], self.offsets[(row_max + 1) * self.n_cols])
+        starts = self.offsets[np.arange(row_min, row_max + 1) * self.n_cols + col_min]
+        ends = self.offsets[np.arange(row_min, row_max + 1) * self.n_cols + col_max + 1]
+        if len(starts) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+    def bbox(self, lat_min, lat_max, lon_min, lon_max) -> np.ndarray:
+        """
+        Return the aircraft inside a bounding box (edges included).
+        A box crossing the antimeridian is given with lon_min > lon_max, e.g. (170, -170).
+
+        Parameters:
+        - lat_min, lat_max (float): Latitude range.
+        - lon_min, lon_max (float): Longitude range.
+
+        Returns:
+        - np.ndarray: Positional indices of the aircraft.
+        """
+        if lon_min > lon_max:
+            return np.concatenate([self.bbox(lat_min, lat_max, lon_min, 180.0), self.bbox(lat_min, lat_max, -180.0, lon_max)])
+        candidates = self._candidates(lat_min, lat_max, lon_min, lon_max)
+        lat, lon = self.latitude[candidates], self.longitude[candidates]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return self.order[candidates[inside]]
+
+    def _circle_candidates(self, lat, lon, radius_nm):
+        """
+        Return the sorted positions of every aircraft in the cells overlapping the box around a circle.
+        """
+        radius_deg = np.degrees(radius_nm / EARTH_RADIUS_NM)
+        lat_min, lat_max = max(-90.0, lat - radius_deg), min(90.0, lat + radius_deg)
+        # Near a pole (or for huge circles) the box spans every longitude
+        cos_lat = np.cos(np.radians(max(abs(lat_min), abs(lat_max))))
+        if lat_min == -90.0 or lat_max == 90.0 or radius_deg >= 180 * cos_lat:
+            return self._candidates(lat_min, lat_max, -180.0, 180.0)
+        lon_radius = radius_deg / cos_lat
+        lon_min, lon_max = lon - lon_radius, lon + lon_radius
+        if lon_min < -180.0:
+            return np.concatenate([self._candidates(lat_min, lat_max, lon_min + 360, 180.0),
+                                   self._candidates(lat_min, lat_max, -180.0, lon_max)])
+        if lon_max > 180.0:
+            return np.concatenate([self._candidates(lat_min, lat_max, lon_min, 180.0),
+                                   self._candidates(lat_min, lat_max, -180.0, lon_max - 360)])
+        return self._candidates(lat_min, lat_max, lon_min, lon_max)
+
+    def radius(self, lat, lon, radius_nm):
+        """
+        Return the aircraft within a great-circle distance of a point, nearest first.
+
+        Parameters:
+        - lat, lon (float): The point.
+        - radius_nm (float): The distance in nautical miles.
+
+        Returns:
+        - tuple: (positional indices of the aircraft, their distances in nautical miles).
+        """
+        candidates = self._circle_candidates(lat, lon, radius_nm)
+        distances = haversine_nm(lat, lon, self.latitude[candidates], self.longitude[candidates])
+        inside = distances <= radius_nm
+        candidates, distances = candidates[inside], distances[inside]
+        nearest_first = np.argsort(distances, kind="stable")
+        return self.order[candidates[nearest_first]], distances[nearest_first]
+
+    def nearest(self, lat, lon, k=10):
+        """
+        Return the k aircraft nearest to a point.
+        The search radius starts at NEAREST_START_RADIUS_NM and doubles until it holds at least k aircraft.
+
+        Parameters:
+        - lat, lon (float): The point.
+        - k (int, optional): Number of aircraft. Defaults to 10.
+
+        Returns:
+        - tuple: (positional indices of the aircraft, their distances in nautical miles), nearest first.
+        """
+        radius_nm = NEAREST_START_RADIUS_NM
+        while True:
+            indices, distances = self.radius(lat, lon, radius_nm)
+            # Half the circumference covers the whole globe
+            if len(indices) >= k or radius_nm >= np.pi * EARTH_RADIUS_NM:
+                return indices[:k], distances[:k]
+            radius_nm *= 2
+
+    def latitude_of(self, indices) -> np.ndarray:
+        """
+        Return the latitudes of query results.
+        """
+        return self.latitude[self._sorted_position[indices]]
+
+    def longitude_of(self, indices) -> np.ndarray:
+        """
+        Return the longitudes of query results.
+        """
+        return self.longitude[self._sorted_position[indices]]
+
+    def rows(self, indices) -> pd.DataFrame:
+        """
+        Return the snapshot rows of query results (only for indexes built with from_snapshot()).
+        """
+        return self.frame.iloc[indices]
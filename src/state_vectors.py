@@ -0,0 +1,121 @@
+
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# orjson decodes the states/all payload several times faster than the standard library
+try:
+    import orjson
+
+    def _loads(raw):
+        return orjson.loads(raw)
+except ImportError:  # pragma: no cover - depends on the environment
+    import json
+
+    def _loads(raw):
+        return json.loads(raw)
+
+# Field order of a state vector in the OpenSky states/all response
+STATE_COLUMNS = [
+    "icao24", "callsign", "origin_country", "time_position", "last_contact",
+    "longitude", "latitude", "baro_altitude", "on_ground", "velocity",
+    "true_track", "vertical_rate", "sensors", "geo_altitude", "squawk",
+    "spi", "position_source"
+]
+
+# Fixed schema of the snapshot frame. "sensors" is only populated for a receiver's own
+# sensors and is a Python list per row, so it is dropped instead of being kept as objects.
+STATE_DTYPES = {
+    "icao24": "string[pyarrow]",
+    "callsign": "string[pyarrow]",
+    "origin_country": "category",
+    "time_position": "Int64",
+    "last_contact": "datetime64[s]",
+    "longitude": np.float32,
+    "latitude": np.float32,
+    "baro_altitude": np.float32,
+    "on_ground": bool,
+    "velocity": np.float32,
+    "true_track": np.float32,
+    "vertical_rate": np.float32,
+    "geo_altitude": np.float32,
+    "squawk": "string[pyarrow]",
+    "spi": bool,
+    "position_source": np.int8,
+}
+
+
+def _column(values, dtype):
+    """
+    Convert one decoded JSON column (a tuple of Python values) to an array of the given dtype.
+    The values are handed to Arrow in a single call, which is much faster than converting them one by one.
+    """
+    if dtype == "category":
+        return pa.array(values, pa.string()).dictionary_encode().to_pandas()
+    if dtype == "string[pyarrow]":
+        return pd.arrays.ArrowStringArray(pa.array(values, pa.string()))
+    if dtype == "Int64":
+        return pa.array(values, pa.int64()).to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get).array
+    if dtype == "datetime64[s]":
+        return pa.array(values, pa.int64()).to_numpy().astype("datetime64[s]")
+    if dtype is np.float32:
+        # None (no position/altitude yet) becomes NaN
+        return pa.array(values, pa.float32()).to_numpy(zero_copy_only=False)
+    if dtype is bool:
+        return pa.array(values, pa.bool_()).fill_null(False).to_numpy(zero_copy_only=False)
+    return pa.array(values, pa.int64()).fill_null(0).to_numpy().astype(dtype)
+
+
+def _strip_blank(values):
+    """
+    Strip the space padding of callsigns/squawks and turn blank values into missing values.
+    """
+    stripped = pc.utf8_trim_whitespace(pa.array(values, pa.string()))
+    return pc.if_else(pc.equal(stripped, ""), pa.scalar(None, pa.string()), stripped)
+
+
+def states_to_frame(states) -> pd.DataFrame:
+    """
+    Build the typed snapshot frame column by column from decoded state vectors.
+
+    Parameters:
+    - states (list): The "states" list of the states/all response (one list per aircraft), or None.
+
+    Returns:
+    - pd.DataFrame: One row per aircraft with the dtypes in STATE_DTYPES.
+    """
+    states = states or []
+    # Transpose the list of rows into one tuple per field
+    columns = list(zip(*states)) if states else [()] * len(STATE_COLUMNS)
+
+    data = {}
+    for name, values in zip(STATE_COLUMNS, columns):
+        if name not in STATE_DTYPES:
+            continue
+        if name in ("callsign", "squawk"):
+            # Callsigns are space padded to 8 characters; blank ones become missing
+            data[name] = pd.arrays.ArrowStringArray(_strip_blank(values))
+        else:
+            data[name] = _column(values, STATE_DTYPES[name])
+
+    return pd.DataFrame(data, columns=list(STATE_DTYPES))
+
+
+def parse_states_payload(raw) -> pd.DataFrame:
+    """
+    Decode a raw states/all response body and build the typed snapshot frame.
+
+    Parameters:
+    - raw (bytes | str): The response body.
+
+    Returns:
+    - pd.DataFrame: The typed snapshot frame (see states_to_frame), with the snapshot time in df.attrs["timestamp"].
+    """
+    data = _loads(raw)
+    df = states_to_frame(data.get("states"))
+    df.attrs["timestamp"] = datetime.utcfromtimestamp(data.get("time") or time.time())
+    return df
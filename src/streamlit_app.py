@@ -3,11 +3,22 @@ import os, sys; sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # streamlit_app.py
 
+import time
+
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-from cli_demo import fetch_opensky_snapshot, fetch_rdu_departures, fetch_aviation_API_airlines_endpoint
-import pandas as pd
+import metrics
+from cli_demo import aviationstack_quota, fetch_rdu_departures
+from snapshot_cache import SnapshotCache
+from poller import POLLER_ENABLED, PublishedSnapshot
+from aggregates import ALT_LABELS, DIMENSIONS, IncrementalAggregator
+from callsign_resolver import CallsignResolver
+from airline_store import load_airline_frame, normalize_airlines
+from spatial_index import AIRPORTS, VIEWPORTS, SpatialIndex
+from track_store import TrackStore
+from snapshot_codec import SnapshotHistory
+from charts import (FigureCache, draw_airline_bars, draw_altitude_bands, draw_country_bars, draw_feature_bars,
+                    draw_hourly_bars, draw_hourly_heatmap, draw_positions, draw_region_pie, draw_track, render_figure)
 
 st.set_page_config(page_title="Flight Volume by Country (OpenSky)", layout="wide")
 st.title("🌍 Global Flight Snapshot (via OpenSky Network)")
@@ -16,49 +27,198 @@ st.caption("Showing a snapshot of the most recent ~1,800 aircraft globally. Data
 
 run = st.button("Fetch Live Flights")
 
+@st.cache_resource(ttl=600, show_spinner="Loading airline data…")
+def load_airlines():
+    """
+    Return the typed airline frame from the local store (only fetched from aviationstack when the store is missing or stale,
+    and never from the page when a background poller keeps it fresh).
+    Re-read every 10 minutes so refreshes made by other processes are picked up.
+    """
+    # One row per airline name, keeping the last record like the original name-keyed lookup did
+    return load_airline_frame(refresh=not POLLER_ENABLED).drop_duplicates(subset="airline_name", keep="last")
+
+@st.cache_resource
+def get_snapshot_cache():
+    """
+    Return the OpenSky snapshot source shared by every session in this Streamlit process: the snapshots
+    published by the background poller when it runs (SKYLINE_POLLER=1), otherwise a TTL cache that fetches on demand.
+    """
+    return PublishedSnapshot() if POLLER_ENABLED else SnapshotCache()
+
+@st.cache_resource
+def get_callsign_resolver():
+    """
+    Return the callsign → airline resolver shared by every session, built from the full ICAO designator table
+    of the airline store (falling back to the built-in table if the store cannot be loaded).
+    """
+    try:
+        return CallsignResolver.from_airlines(load_airline_frame(refresh=not POLLER_ENABLED))
+    except Exception:
+        return CallsignResolver()
+
+@st.cache_resource
+def get_aggregator():
+    """
+    Return the running panel counts shared by every session; each new snapshot only applies its changes.
+    """
+    return IncrementalAggregator(resolver=get_callsign_resolver())
+
+@st.cache_resource
+def get_track_store():
+    """
+    Return the per-aircraft tracks shared by every session, extended with each new snapshot.
+    """
+    return TrackStore()
+
+@st.cache_resource
+def get_snapshot_history():
+    """
+    Return the compressed history of recent snapshots shared by every session (see SKYLINE_HISTORY_HOURS).
+    """
+    return SnapshotHistory()
+
+@st.cache_resource
+def get_figure_cache():
+    """
+    Return the LRU cache of rendered chart images shared by every session.
+    """
+    return FigureCache()
+
+@st.cache_resource(max_entries=2)
+def get_spatial_index(timestamp, _df):
+    """
+    Return the spatial index of a snapshot, built once per snapshot time and shared by every session.
+    """
+    with metrics.timed("spatial.build"):
+        return SpatialIndex.from_snapshot(_df)
+
+@st.cache_resource
+def start_metrics():
+    """
+    Export the hit/miss counters of the shared caches and start the Prometheus endpoint (if SKYLINE_METRICS_PORT is set), once per process.
+    """
+    metrics.register_collector(metrics.cache_collector("snapshot", get_snapshot_cache().stats))
+    metrics.register_collector(metrics.cache_collector("figure", get_figure_cache().stats))
+    return metrics.start_metrics_server() if metrics.ENABLED else None
+
+rerun_started = time.perf_counter()
+snapshot_cache = get_snapshot_cache()
+track_store = get_track_store()
+snapshot_history = get_snapshot_history()
+figure_cache = get_figure_cache()
+start_metrics()
+
 # ---------- Main ----------
+# Remember the click, so moving the map viewport below does not hide the snapshot again
 if run:
+    st.session_state["live_flights"] = True
+
+if st.session_state.get("live_flights"):
     st.info("Fetching live data from OpenSky…")
     try:
-        df = fetch_opensky_snapshot()
+        with metrics.timed("section.snapshot"):
+            df = snapshot_cache.get()  # Shared between sessions, so panels below must not modify df
     except Exception as e:
         st.error(f"Failed to fetch data: {type(e).__name__} -> {e}")
+        st.session_state["live_flights"] = False
         st.stop()
 
     st.metric("Flights in snapshot", len(df))
+    cache_stats = snapshot_cache.stats()
+    st.caption(
+        f"Snapshot age: {cache_stats['age_seconds']:.0f}s · cache hits: {cache_stats['hits']} · "
+        f"misses: {cache_stats['misses']} · stale serves: {cache_stats['stale']}"
+    )
 
     if df.empty:
         st.warning("No flights found in snapshot.")
+        st.session_state["live_flights"] = False
         st.stop()
 
+    # Apply the snapshot to the running counts, the tracks and the history (a no-op if another session already did).
+    # The aggregator is only created here, since its callsign resolver reads the airline store
+    aggregator = get_aggregator()
+    aggregator.update(df)
+    track_store.update(df)
+    with metrics.timed("history.append"):
+        snapshot_history.append(df)
+
     # Aggregate by country
-    summary = df.groupby("origin_country").size().reset_index(name="flights")
-    summary = summary.sort_values("flights", ascending=False).head(30)
+    summary = aggregator.top("origin_country", 30).rename_axis("origin_country").reset_index(name="flights")
 
     # ---------- Plot Top 30 Countries ----------
     st.subheader("✈️ Top 30 Countries by Active Flights")
 
-    fig, ax = plt.subplots(figsize=(10, 8))
-    ax.barh(summary["origin_country"], summary["flights"])
-    ax.set_xlabel("Flights (current snapshot)")
-    ax.set_ylabel("Country")
-    ax.set_title("Top 30 Countries by Active Flights")
-    ax.invert_yaxis()  # Largest at top
-    st.pyplot(fig)
+    st.image(figure_cache.render("countries", summary, draw_country_bars, figsize=(10, 8)))
 
     # ---------- Plot Flight Scatter Map ----------
     st.subheader("🌐 Flight Positions (Scatter Map)")
-    df_map = df.dropna(subset=["latitude", "longitude"])
+    spatial_index = get_spatial_index(df.attrs.get("timestamp"), df)
 
-    if df_map.empty:
+    if len(spatial_index) == 0:
         st.warning("No geolocation data available for mapping.")
     else:
-        fig2, ax2 = plt.subplots(figsize=(12, 6))
-        ax2.scatter(df_map["longitude"], df_map["latitude"], s=2, alpha=0.5)
-        ax2.set_title("Global Flight Positions")
-        ax2.set_xlabel("Longitude")
-        ax2.set_ylabel("Latitude")
-        st.pyplot(fig2)
+        # Only the aircraft inside the viewport are passed to the renderer
+        viewport_name = st.selectbox("Map viewport", list(VIEWPORTS) + ["Custom"])
+        if viewport_name == "Custom":
+            col_lat, col_lon = st.columns(2)
+            lat_min, lat_max = col_lat.slider("Latitude", -90.0, 90.0, (-90.0, 90.0))
+            lon_min, lon_max = col_lon.slider("Longitude", -180.0, 180.0, (-180.0, 180.0))
+            viewport = (lat_min, lat_max, lon_min, lon_max)
+        else:
+            viewport = VIEWPORTS[viewport_name]
+
+        visible = spatial_index.bbox(*viewport)
+        st.caption(f"{len(visible):,} of {len(spatial_index):,} positioned aircraft in view")
+        if st.checkbox("Estimate current positions (dead reckoning from each aircraft's last report)"):
+            # Moves with the clock, so this map is redrawn on every rerun instead of coming from the cache
+            estimated = track_store.positions_at(pd.Timestamp.now("UTC"))
+            lat_min, lat_max, lon_min, lon_max = viewport
+            estimated = estimated[estimated["latitude"].between(lat_min, lat_max) &
+                                  estimated["longitude"].between(lon_min, lon_max)]
+            positions = (estimated["longitude"].to_numpy(), estimated["latitude"].to_numpy(), viewport)
+            st.image(render_figure("positions", positions, draw_positions, figsize=(12, 6), dpi=figure_cache.dpi))
+        else:
+            positions = (spatial_index.longitude_of(visible), spatial_index.latitude_of(visible), viewport)
+            st.image(figure_cache.render("positions", positions, draw_positions, figsize=(12, 6)))
+
+        with st.expander("Replay recent snapshots"):
+            recorded = snapshot_history.timestamps()
+            if len(recorded) < 2:
+                st.caption("Snapshots are recorded as they are fetched; come back after a few refreshes.")
+            else:
+                replay_time = st.select_slider("Snapshot time (UTC)", options=recorded, value=recorded[-1],
+                                               format_func=lambda t: t.strftime("%H:%M:%S"))
+                with metrics.timed("history.decode"):
+                    replayed = snapshot_history.snapshot(replay_time)
+                lat_min, lat_max, lon_min, lon_max = viewport
+                replayed = replayed[replayed["latitude"].between(lat_min, lat_max) &
+                                    replayed["longitude"].between(lon_min, lon_max)]
+                st.image(figure_cache.render("positions", (replayed["longitude"].to_numpy(), replayed["latitude"].to_numpy(),
+                                                           viewport), draw_positions, figsize=(12, 6)))
+                history_stats = snapshot_history.stats()
+                st.caption(f"{history_stats['frames']} snapshots kept in {history_stats['bytes'] / 1e6:.1f} MB "
+                           f"({history_stats['ratio']:.1f}× smaller than the DataFrames)")
+
+        with st.expander("Aircraft near an airport"):
+            col_airport, col_radius = st.columns(2)
+            airport = col_airport.selectbox("Airport", list(AIRPORTS))
+            radius_nm = col_radius.slider("Radius (nm)", 10, 500, 50, step=10)
+            nearby, distances = spatial_index.radius(*AIRPORTS[airport], radius_nm)
+            st.metric(f"Aircraft within {radius_nm} nm of {airport}", len(nearby))
+            nearest, nearest_distances = spatial_index.nearest(*AIRPORTS[airport], k=10)
+            nearest_rows = spatial_index.rows(nearest)[["icao24", "callsign", "origin_country", "alt_ft", "speed_kt", "phase"]]
+            nearest_rows = nearest_rows.assign(distance_nm=nearest_distances.round(1))
+            nearest_rows.attrs = {}  # The snapshot timestamp is not JSON serializable
+            st.dataframe(nearest_rows, use_container_width=True)
+
+            # Flight history from the snapshots seen so far (no extra OpenSky requests)
+            if len(nearest_rows):
+                history_icao24 = st.selectbox("Flight history", nearest_rows["icao24"].astype(str).tolist())
+                track = track_store.track(history_icao24)
+                st.caption(f"{len(track)} positions recorded for {history_icao24}")
+                if len(track) > 0:
+                    st.image(figure_cache.render("track", (track, f"Track of {history_icao24}"), draw_track, figsize=(6, 4)))
 
     # with st.expander("Raw Country Data"):
     #     st.dataframe(summary)
@@ -72,87 +232,49 @@ if run:
     # 1. Flights by Altitude Band
     with col1:
         if "baro_altitude" in df.columns:
-            # Convert meters to feet
-            df["alt_ft"] = df["baro_altitude"] * 3.28084  
+            alt_counts = aggregator.top("alt_band").reindex(ALT_LABELS, fill_value=0)
 
-            bins = [-1000, 10000, 20000, 30000, 60000]   # feet
-            labels = ["<10k", "10–20k", "20–30k", "30k+"]
-            df["alt_band"] = pd.cut(df["alt_ft"], bins=bins, labels=labels)
-
-            alt_counts = df["alt_band"].value_counts().reindex(labels, fill_value=0)
-
-            fig_alt, ax_alt = plt.subplots(figsize=(4,3))
-            ax_alt.bar(alt_counts.index, alt_counts.values, color="mediumseagreen", alpha=0.8)
-            ax_alt.set_title("Flights by Altitude Band (feet)")
-            ax_alt.set_xlabel("Altitude band")
-            ax_alt.set_ylabel("Aircraft")
-            st.pyplot(fig_alt, use_container_width=False)
+            st.image(figure_cache.render("altitude_bands", alt_counts, draw_altitude_bands, figsize=(4, 3)))
 
 
     # 2. Top Airlines by Callsign Prefix
     with col2:
         if "callsign" in df.columns:
-            # Clean callsigns
-            cs = df["callsign"].astype(str).str.upper().str.strip()
-
-            # Extract exactly 3 leading letters (ICAO airline code)
-            prefix = cs.str.extract(r'^([A-Z]{3})', expand=False)
-
-            # Tag N-registered private aircraft
-            n_reg_mask = prefix.isna() & cs.str.match(r'^N[0-9A-Z]+', na=False)
-            prefix = prefix.where(~n_reg_mask, "Private/GA")
-
-            # Fill remaining blanks
-            prefix = prefix.fillna("No Name")
-
-            # Map common airline codes → names
-            airline_map = {
-                "AAL": "American Airlines",
-                "DAL": "Delta Air Lines",
-                "UAL": "United Airlines",
-                "SWA": "Southwest Airlines",
-                "JBU": "Jet Blue Airways",
-                "FFT": "Frontier Airlines",
-                "NKS": "Spirit Airlines",
-                "ASA": "Alaska Airlines",
-                "UPS": "UPS Airlines",
-                "FDX": "Fed Ex Express",
-                "BAW": "British Airways",
-                "DLH": "Lufthansa",
-                "AFR": "Air France",
-                "KLM": "KLM Royal Dutch Airlines",
-                "UAE": "Emirates",
-                "Private/GA": "Private/GA",
-                "No Name": "No Name",
-            }
-
-            # Replace codes with names where possible
-            airline_name = prefix.map(airline_map).fillna(prefix)
-
-            airline_counts = airline_name.value_counts().head(15)
-
-            fig_airline, ax_airline = plt.subplots(figsize=(8, 6))
-            ax_airline.barh(airline_counts.index, airline_counts.values, color="slateblue", alpha=0.85)
-            ax_airline.set_title("Top 15 Airlines by Callsign")
-            ax_airline.set_xlabel("Aircraft")
-            ax_airline.invert_yaxis()
-            st.pyplot(fig_airline, use_container_width=False)
+            airline_counts = aggregator.top("airline", 15)
+
+            st.image(figure_cache.render("airlines", airline_counts, draw_airline_bars, figsize=(8, 6)))
 
 
     # 3. Flights by Broad Region (Pie)
     with col3:
         if {"latitude","longitude"}.issubset(df.columns):
-            df["region"] = pd.cut(
-                df["longitude"],
-                bins=[-180, -30, 60, 180],
-                labels=["Americas", "Europe/Africa", "Asia-Pacific"]
-            )
-            region_counts = df["region"].value_counts()
-
-            fig_region, ax_region = plt.subplots(figsize=(3.5,3.5))
-            ax_region.pie(region_counts.values, labels=region_counts.index, autopct="%1.0f%%")
-            ax_region.set_title("Regions")
-            st.pyplot(fig_region, use_container_width=False)
+            region_counts = aggregator.top("region")
+
+            st.image(figure_cache.render("regions", region_counts, draw_region_pie, figsize=(3.5, 3.5)))
+
+    # 4. Any combination of the panels above, answered from the snapshot's flight cube instead of the raw rows
+    with st.expander("Slice by country, airline, altitude, region and ground state"):
+        cube = aggregator.cube()
+        group_by = st.multiselect("Group by", DIMENSIONS, default=["airline"], max_selections=2,
+                                  format_func=lambda dim: dim.replace("_", " "))
+        filter_columns = st.columns(len(DIMENSIONS))
+        where = {}
+        for column, dim in zip(filter_columns, DIMENSIONS):
+            # Options ordered by how many aircraft they have
+            options = cube.counts_by(dim).index.tolist()
+            selected = column.multiselect(dim.replace("_", " "), options, key=f"cube_{dim}")
+            if selected:
+                where[dim] = selected
+
+        st.metric("Matching aircraft", cube.total(where))
+        if group_by:
+            sliced = cube.counts_by(group_by, where)
+            if len(group_by) == 1:
+                st.bar_chart(sliced.head(20))
+            else:
+                table = sliced.unstack(fill_value=0)
+                table = table[[label for label in cube.labels(group_by[1]) if label in table.columns]]  # Axis order, e.g. altitude bands
+                st.dataframe(table, use_container_width=True)
 else:
     st.info("Click 'Fetch Live Flights' to view global snapshot.")
 
@@ -163,32 +285,14 @@ st.header("🛫 Raleigh-Durham (RDU) Airport Stats")
 run_rdu = st.button("Fetch RDU Stats")
 
 if run_rdu:
-    with st.spinner("Fetching RDU-specific flight data..."):
+    with st.spinner("Fetching RDU-specific flight data..."), metrics.timed("section.rdu"):
         df_departures = fetch_rdu_departures(hours=3)
     
     st.metric("Departures (last 3h)", len(df_departures))
 
     if not df_departures.empty:
         # ---- Top Airlines ----
-        def airline_from_callsign(callsign):
-            if not callsign or len(callsign) < 3:
-                return "Unknown"
-            prefix = callsign[:3].upper()
-            mapping = {
-                "AAL": "American Airlines",
-                "DAL": "Delta",
-                "UAL": "United",
-                "SWA": "Southwest",
-                "JBU": "JetBlue",
-                "FDX": "FedEx",
-                "UPS": "UPS",
-                "NKS": "Spirit",
-                "ASA": "Alaska",
-                "FFT": "Frontier"
-            }
-            return mapping.get(prefix, prefix)
-        
-        df_departures["Airline"] = df_departures["callsign"].apply(airline_from_callsign)
+        df_departures["Airline"] = get_callsign_resolver().resolve(df_departures["callsign"])
         top_airlines = df_departures["Airline"].value_counts().head(10).reset_index()
         top_airlines.columns = ["Airline", "Flights"]
         st.subheader("🏢 Top 10 Airlines from RDU (last 3h)")
@@ -196,31 +300,9 @@ if run_rdu:
 
 
 #### ----------- Airline Profile Comparison (aviationstack API - Ethan Dominic's Code) ----------- ####
-airline_data = fetch_aviation_API_airlines_endpoint()
-
-def get_airline_feature_dict(feature_type, cast_type):
-    """
-    Return a dictionary of airline names along with their values for the specified feature type.
-    
-    Parameters:
-    - feature_type (str): The specified feature type to extract (e.g., "fleet_size", "fleet_average_age", "date_founded").
-    - cast_type (str): The type to cast the feature value to ("int", "float", or "str")
-    
-    Returns:
-    - dict: A dictionary whose keys are airline names and values are the corresponding feature values.
-    """
-    airline_feature_dict = {}
-    for i in range(len(airline_data["data"])):
-        airline_name = airline_data["data"][i]["airline_name"]
-        if airline_data["data"][i][feature_type] is not None and airline_data["data"][i][feature_type] != "":
-            if cast_type == "int":
-                airline_feature_value = int(airline_data["data"][i][feature_type])
-            elif cast_type == "str":
-                airline_feature_value = str(airline_data["data"][i][feature_type])
-            else:
-                airline_feature_value = float(airline_data["data"][i][feature_type])
-        airline_feature_dict[airline_name] = airline_feature_value
-    return airline_feature_dict
+# The section is drawn into this placeholder at the end of the script, so the sections below render
+# without waiting for the airline data; as a fragment, its radios only rerun this section
+airline_section = st.container()
 
 def plot_bar_graph(feature_series, title, ylabel, bottom_ylim=0):
     """
@@ -235,188 +317,189 @@ def plot_bar_graph(feature_series, title, ylabel, bottom_ylim=0):
     Returns:
     - None: Displays the bar graph using Streamlit.
     """
-    fig, ax = plt.subplots()
-    bars = ax.bar(feature_series.index.astype(str), feature_series.values)
-    ax.set_title(title)
-    ax.set_xlabel("Airline")
-    ax.set_ylabel(ylabel)
-    ax.bar(feature_series.index, feature_series.values)
-    ax.bar_label(bars, padding=3)
-    plt.xticks(rotation=90)
-    plt.ylim(bottom=bottom_ylim)
-    st.pyplot(fig)
-
-# Main Program Execution
-st.title("Airline Profile Comparison")
-
-comparison_option = st.radio(
-    "Pick the type of comparison you would like to see: ",
-    ("Fleet Size", "Fleet Average Age", "Founding Year")
-)
-
-countries_of_origin = pd.Series(get_airline_feature_dict("country_name", "str"))
-country_filters = countries_of_origin.unique().tolist()
-country_filters.append("All Countries") # Add option for user to see all countries
-country_filter_option = st.radio(
-    "Pick a country of origin to filter by: ",
-    (country_filters)
-)
-
-if country_filter_option == "All Countries":
-    if comparison_option == "Fleet Size":
-        fleet_sizes = (pd.Series(get_airline_feature_dict("fleet_size", "int"))).dropna() # Remove airlines with no fleet size data
-        sorted_fleet_sizes = fleet_sizes.sort_values(ascending=True)
-        top10_sorted_fleet_sizes = sorted_fleet_sizes.tail(10) # Get the top 10 largest airlines by fleet size
-        plot_bar_graph(top10_sorted_fleet_sizes, "Airline Fleet Sizes", "Fleet Size")
-    elif comparison_option == "Fleet Average Age":
-        fleet_avg_ages = (pd.Series(get_airline_feature_dict("fleet_average_age", "float"))).dropna() # Remove airlines with no fleet average age data
-        sorted_fleet_avg_ages = fleet_avg_ages.sort_values(ascending=True)
-        top10_sorted_fleet_avg_ages = sorted_fleet_avg_ages.head(10) # Get the top 10 youngest airlines by fleet average age
-        plot_bar_graph(top10_sorted_fleet_avg_ages, "Airline Fleet Average Ages", "Fleet Average Age")
-    elif comparison_option == "Founding Year":
-        founding_years = (pd.Series(get_airline_feature_dict("date_founded", "int"))).dropna() # Remove airlines with no founding year data
-        sorted_founding_years = founding_years.sort_values(ascending=True)
-        top10_sorted_founding_years = sorted_founding_years.head(10) # Get the top 10 oldest airlines by founding year
-        plot_bar_graph(top10_sorted_founding_years, "Airline Founding Years", "Founding Year", bottom_ylim=1900) # Set y-axis minimum so years before 1900 since no airlines were founded before then
+    st.image(figure_cache.render("feature_bars", (feature_series, title, ylabel, bottom_ylim), draw_feature_bars))
+
+@st.fragment
+def airline_profile_comparison():
+    """
+    Draw the airline comparison from the local airline store.
+    """
+    try:
+        with metrics.timed("section.airlines"):
+            airlines = load_airlines()
+    except FileNotFoundError:
+        # Only happens with the background poller, before its first airline refresh has finished
+        st.info("Airline data is still being fetched in the background. Please check back in a minute.")
+        airlines = normalize_airlines(pd.DataFrame(columns=["airline_name", "country_name", "fleet_size",
+                                                            "fleet_average_age", "date_founded"]))
+
+    # Main Program Execution
+    st.title("Airline Profile Comparison")
+
+    comparison_option = st.radio(
+        "Pick the type of comparison you would like to see: ",
+        ("Fleet Size", "Fleet Average Age", "Founding Year")
+    )
+
+    country_filters = airlines["country_name"].dropna().unique().tolist()
+    country_filters.append("All Countries") # Add option for user to see all countries
+    country_filter_option = st.radio(
+        "Pick a country of origin to filter by: ",
+        (country_filters)
+    )
+
+    # Comparison option -> (feature column, graph title, y-axis label, y-axis minimum)
+    comparison_features = {
+        "Fleet Size": ("fleet_size", "Airline Fleet Sizes", "Fleet Size", 0),
+        "Fleet Average Age": ("fleet_average_age", "Airline Fleet Average Ages", "Fleet Average Age", 0),
+        # Set y-axis minimum so years before 1900 since no airlines were founded before then
+        "Founding Year": ("date_founded", "Airline Founding Years", "Founding Year", 1900),
+    }
+    feature_type, graph_title, graph_ylabel, graph_bottom_ylim = comparison_features[comparison_option]
+    feature_airlines = airlines.dropna(subset=[feature_type]) # Remove airlines with no data for the feature
+
+    if country_filter_option == "All Countries":
+        if comparison_option == "Fleet Size":
+            selected_airlines = feature_airlines.nlargest(10, feature_type) # Get the top 10 largest airlines by fleet size
+        else:
+            # Get the top 10 youngest airlines by fleet average age / top 10 oldest airlines by founding year
+            selected_airlines = feature_airlines.nsmallest(10, feature_type)
+    else:
+        # Ensure only airlines from the selected country are included
+        selected_airlines = feature_airlines[feature_airlines["country_name"] == country_filter_option]
+
+    feature_series = selected_airlines.set_index("airline_name")[feature_type].sort_values(ascending=True)
+    plot_bar_graph(feature_series, graph_title, graph_ylabel, bottom_ylim=graph_bottom_ylim)
+
+# ===================== Hanfu's Hourly Heatmap (same page, matching style) =====================
+# This block lives at the very bottom so it doesn't touch teammates' code above.
+
+from rdu_hourly import hourly_counts_for_day  # local import only for this section
+
+st.header("🗺️ Airport Hourly Heatmap")
+
+# Controls grouped to match page style
+col1, col2, col3 = st.columns([1, 1, 1.2])
+with col1:
+    # ICAO code input (e.g., KRDU / KJFK / KLAX)
+    icao_input = st.text_input("Airport ICAO", value="KRDU")
+with col2:
+    # IANA timezone used to define the local 'day' for hourly aggregation
+    tz_input = st.text_input("Time zone (IANA)", value="America/New_York")
+with col3:
+    # Default to 'yesterday' because OpenSky arrivals/departures are updated nightly
+    _yesterday = (pd.Timestamp.now("America/New_York") - pd.Timedelta(days=1)).date()
+    date_input = st.date_input("Local date", value=_yesterday)
+
+# Keep button wording consistent with the page style ("Fetch …")
+go_heatmap = st.button("Fetch Heatmap")
+
+# When not triggered, show an info line just like other sections
+if not go_heatmap:
+    st.info("Click 'Fetch Heatmap' to compute hourly arrivals/departures.")
 else:
-    if comparison_option == "Fleet Size":
-        fleet_sizes = (pd.Series(get_airline_feature_dict("fleet_size", "int"))).dropna() # Remove airlines with no fleet size data
-        filtered_fleet_sizes = fleet_sizes[countries_of_origin == country_filter_option] # Ensure only airlines from the selected country are included
-        sorted_fleet_sizes = filtered_fleet_sizes.sort_values(ascending=True)
-        plot_bar_graph(sorted_fleet_sizes, "Airline Fleet Sizes", "Fleet Size")
-    elif comparison_option == "Fleet Average Age":
-        fleet_avg_ages = (pd.Series(get_airline_feature_dict("fleet_average_age", "float"))).dropna() # Remove airlines with no fleet average age data
-        filtered_fleet_avg_ages = fleet_avg_ages[countries_of_origin == country_filter_option] # Ensure only airlines from the selected country are included
-        sorted_fleet_avg_ages = filtered_fleet_avg_ages.sort_values(ascending=True)
-        plot_bar_graph(sorted_fleet_avg_ages, "Airline Fleet Average Ages", "Fleet Average Age")
-    elif comparison_option == "Founding Year":
-        founding_years = (pd.Series(get_airline_feature_dict("date_founded", "int"))).dropna() # Remove airlines with no founding year data
-        filtered_founding_years = founding_years[countries_of_origin == country_filter_option] # Ensure only airlines from the selected country are included
-        sorted_founding_years = filtered_founding_years.sort_values(ascending=True)
-        plot_bar_graph(sorted_founding_years, "Airline Founding Years", "Founding Year", bottom_ylim=1900) # Set y-axis minimum so years before 1900 since no airlines were founded before then
-# # ===================== Hanfu's Hourly Heatmap (same page, matching style) =====================
-# # This block lives at the very bottom so it doesn't touch teammates' code above.
-
-# import pandas as pd
-# import matplotlib.pyplot as plt
-# from rdu_hourly import hourly_counts_for_day  # local import only for this section
-
-# # st.header("🗺️ Airport Hourly Heatmap")
-
-# # Controls grouped to match page style
-# col1, col2, col3 = st.columns([1, 1, 1.2])
-# with col1:
-#     # ICAO code input (e.g., KRDU / KJFK / KLAX)
-#     icao_input = st.text_input("Airport ICAO", value="KRDU")
-# with col2:
-#     # IANA timezone used to define the local 'day' for hourly aggregation
-#     tz_input = st.text_input("Time zone (IANA)", value="America/New_York")
-# with col3:
-#     # Default to 'yesterday' because OpenSky arrivals/departures are updated nightly
-#     _yesterday = (pd.Timestamp.now("America/New_York") - pd.Timedelta(days=1)).date()
-#     date_input = st.date_input("Local date", value=_yesterday)
-
-# # Keep button wording consistent with the page style ("Fetch …")
-# go_heatmap = st.button("Fetch Heatmap")
-
-# # When not triggered, show an info line just like other sections
-# if not go_heatmap:
-#     st.info("Click 'Fetch Heatmap' to compute hourly arrivals/departures.")
-# else:
-#     # If user selected 'today', auto-switch to 'yesterday' (OpenSky batches previous day)
-#     _today_local = pd.Timestamp.now(tz_input).date()
-#     _use_date = date_input
-#     if date_input == _today_local:
-#         st.info("OpenSky arrivals/departures are updated nightly. Using yesterday instead of today.")
-#         _use_date = (_today_local - pd.Timedelta(days=1))
-
-#     try:
-#         # Fetch hourly arrivals/departures for the airport on the local date we determined
-#         df_hourly = hourly_counts_for_day(icao_input, tz_input, pd.Timestamp(_use_date))
-#     except Exception as e:
-#         # Surface any API/auth/timezone errors
-#         st.error(f"Failed to fetch: {type(e).__name__}: {e}")
-#         st.stop()
-
-#     # If still all zeros, give a helpful hint (small airports / rate limits / batch delay)
-#     if int(df_hourly["arrivals"].sum()) == 0 and int(df_hourly["departures"].sum()) == 0:
-#         st.warning("OpenSky returned no flights for that airport/date. Try a larger airport (e.g., KJFK, KLAX) "
-#                    "or an earlier date (previous days).")
-
-#     # Summary metrics
-#     total_arrivals = int(df_hourly["arrivals"].sum())
-#     total_departures = int(df_hourly["departures"].sum())
-#     c1, c2 = st.columns(2)
-#     c1.metric("Arrivals (day total)", total_arrivals)
-#     c2.metric("Departures (day total)", total_departures)
-
-#     # Show raw hourly table
-#     st.dataframe(df_hourly, use_container_width=True)
-
-#     # Heatmap (2 rows: departures & arrivals; columns: 0..23 local hours)
-#     matrix = [df_hourly["departures"].tolist(), df_hourly["arrivals"].tolist()]
-#     fig, ax = plt.subplots(figsize=(10, 2.6))
-#     im = ax.imshow(matrix, aspect="auto")
-#     ax.set_yticks([0, 1], labels=["Departures", "Arrivals"])
-#     ax.set_xticks(range(24))
-#     ax.set_xlabel("Hour (local)")
-# # ax.set_title(f"{icao_input.upper()} Hourly Heatmap — {_use_date} ({tz_input})")
-#     plt.colorbar(im, ax=ax, shrink=0.8)
-#     st.pyplot(fig)
-
-#     # Departures bar chart
-#     fig2, ax2 = plt.subplots(figsize=(10, 3))
-#     ax2.bar(df_hourly["hour"], df_hourly["departures"])
-#     ax2.set_title("Departures by Hour")
-#     ax2.set_xlabel("Hour (local)")
-#     ax2.set_ylabel("Flights")
-#     st.pyplot(fig2)
-
-#     # Arrivals bar chart
-#     fig3, ax3 = plt.subplots(figsize=(10, 3))
-#     ax3.bar(df_hourly["hour"], df_hourly["arrivals"])
-#     ax3.set_title("Arrivals by Hour")
-#     ax3.set_xlabel("Hour (local)")
-#     ax3.set_ylabel("Flights")
-#     st.pyplot(fig3)
-
-#     # Small note about OpenSky batch behavior (kept low-key to match page tone)
-#     st.caption("Note: OpenSky arrivals/departures are updated nightly. Yesterday or earlier dates work best.")
-# # ===================== End Hanfu's Hourly Heatmap =====================
+    # If user selected 'today', auto-switch to 'yesterday' (OpenSky batches previous day)
+    _today_local = pd.Timestamp.now(tz_input).date()
+    _use_date = date_input
+    if date_input == _today_local:
+        st.info("OpenSky arrivals/departures are updated nightly. Using yesterday instead of today.")
+        _use_date = (_today_local - pd.Timedelta(days=1))
+
+    df_hourly = None
+    try:
+        # Fetch hourly arrivals/departures for the airport on the local date we determined
+        # (arrivals and departures are fetched in parallel; finished days come from the on-disk cache)
+        with st.spinner("Fetching arrivals and departures..."), metrics.timed("section.heatmap"):
+            df_hourly = hourly_counts_for_day(icao_input.strip().upper(), tz_input, pd.Timestamp(_use_date))
+    except Exception as e:
+        # Surface any API/auth/timezone errors
+        st.error(f"Failed to fetch: {type(e).__name__}: {e}")
+
+    if df_hourly is not None:
+        # If still all zeros, give a helpful hint (small airports / rate limits / batch delay)
+        if int(df_hourly["arrivals"].sum()) == 0 and int(df_hourly["departures"].sum()) == 0:
+            st.warning("OpenSky returned no flights for that airport/date. Try a larger airport (e.g., KJFK, KLAX) "
+                       "or an earlier date (previous days).")
+
+        # Summary metrics
+        total_arrivals = int(df_hourly["arrivals"].sum())
+        total_departures = int(df_hourly["departures"].sum())
+        c1, c2 = st.columns(2)
+        c1.metric("Arrivals (day total)", total_arrivals)
+        c2.metric("Departures (day total)", total_departures)
+
+        # Show raw hourly table
+        st.dataframe(df_hourly, use_container_width=True)
+
+        # Heatmap (2 rows: departures & arrivals; columns: 0..23 local hours)
+        st.image(figure_cache.render("hourly_heatmap", df_hourly, draw_hourly_heatmap, figsize=(10, 2.6)))
+
+        # Departures and arrivals bar charts
+        st.image(figure_cache.render("hourly_bars", (df_hourly, "departures", "Departures by Hour"),
+                                     draw_hourly_bars, figsize=(10, 3)))
+        st.image(figure_cache.render("hourly_bars", (df_hourly, "arrivals", "Arrivals by Hour"),
+                                     draw_hourly_bars, figsize=(10, 3)))
+
+    # Small note about OpenSky batch behavior (kept low-key to match page tone)
+    st.caption("Note: OpenSky arrivals/departures are updated nightly. Yesterday or earlier dates work best.")
+# ===================== End Hanfu's Hourly Heatmap =====================
 # # =====================
 
 
-# # ===================== Demo: Synthetic Multi-Day Table (no API) =====================
-# # This section generates realistic-looking hourly arrivals/departures for multiple dates
-# # and shows them in a table on the SAME page. It does NOT call any external API.
-
-# import pandas as pd
-# from demo_mock import gen_demo_hourly_multi_days
-
-# st.header("📅 Demo: Multi-Day Hourly Table (Synthetic)")
-
-# # Inputs
-# colA, colB, colC, colD = st.columns([1.1, 1.2, 1, 1])
-# with colA:
-#     demo_icao = st.text_input("Airport ICAO (demo)", value="KRDU")
-# with colB:
-#     demo_tz = st.text_input("Time zone (IANA, demo)", value="America/New_York")
-# with colC:
-#     demo_start = st.date_input("Start date (demo)", value=(pd.Timestamp.now("America/New_York") - pd.Timedelta(days=3)).date())
-# with colD:
-#     demo_days = st.slider("Days", min_value=2, max_value=7, value=3, step=1)
-
-# if st.button("Generate Demo Data"):
-#     # Build multi-day synthetic table
-#     df_demo = gen_demo_hourly_multi_days(demo_icao, demo_tz, pd.Timestamp(demo_start), demo_days)
-#     st.subheader("Demo Hourly Table")
-#     st.dataframe(df_demo, use_container_width=True)
-
-#     # Per-day totals
-#     totals = df_demo.groupby("date")[["arrivals","departures"]].sum().reset_index()
-#     st.subheader("Per-day Totals (Demo)")
-#     st.dataframe(totals, use_container_width=True)
-
-#     # Small note
-#     st.caption("This is synthetic data for demo only. It does not use any API and is designed for reasonable realism.")
-# # ===================== End Demo: Synthetic Multi-Day Table =====================
+# ===================== Demo: Synthetic Multi-Day Table (no API) =====================
+# This section generates realistic-looking hourly arrivals/departures for multiple dates
+# and shows them in a table on the SAME page. It does NOT call any external API.
+
+from demo_mock import gen_demo_hourly_multi_days
+
+st.header("📅 Demo: Multi-Day Hourly Table (Synthetic)")
+
+# Inputs
+colA, colB, colC, colD = st.columns([1.1, 1.2, 1, 1])
+with colA:
+    demo_icao = st.text_input("Airport ICAO (demo)", value="KRDU")
+with colB:
+    demo_tz = st.text_input("Time zone (IANA, demo)", value="America/New_York")
+with colC:
+    demo_start = st.date_input("Start date (demo)", value=(pd.Timestamp.now("America/New_York") - pd.Timedelta(days=3)).date())
+with colD:
+    demo_days = st.slider("Days", min_value=2, max_value=7, value=3, step=1)
+
+if st.button("Generate Demo Data"):
+    # Build multi-day synthetic table
+    df_demo = gen_demo_hourly_multi_days(demo_icao, demo_tz, pd.Timestamp(demo_start), demo_days)
+    st.subheader("Demo Hourly Table")
+    st.dataframe(df_demo, use_container_width=True)
+
+    # Per-day totals
+    totals = df_demo.groupby("date")[["arrivals","departures"]].sum().reset_index()
+    st.subheader("Per-day Totals (Demo)")
+    st.dataframe(totals, use_container_width=True)
+
+    # Small note
+    st.caption("This is synthetic data for demo only. It does not use any API and is designed for reasonable realism.")
+# ===================== End Demo: Synthetic Multi-Day Table =====================
+
+
+# ---------- Deferred airline section (see airline_section above) ----------
+with airline_section:
+    airline_profile_comparison()
+
+
+# ---------- Diagnostics (hidden; open the app with ?diagnostics=1) ----------
+# Reruns that end in st.stop() above are not counted
+metrics.observe("skyline_stage_seconds", time.perf_counter() - rerun_started, stage="rerun")
+
+if st.query_params.get("diagnostics") == "1":
+    st.header("🩺 Diagnostics")
+    if not metrics.ENABLED:
+        st.info("Stage timings are off. Start the app with SKYLINE_METRICS=1 to record them.")
+    st.dataframe(pd.DataFrame(metrics.stage_summary(), columns=["stage", "count", "mean_ms", "p95_ms_le"]),
+                 use_container_width=True)
+    snapshot_stats, figure_stats = snapshot_cache.stats(), figure_cache.stats()
+    d1, d2, d3 = st.columns(3)
+    d1.metric("Snapshot cache hit rate", f"{snapshot_stats['hits'] / max(1, snapshot_stats['hits'] + snapshot_stats['misses']):.0%}")
+    d2.metric("Figure cache hit rate", f"{figure_stats['hits'] / max(1, figure_stats['hits'] + figure_stats['misses']):.0%}")
+    d3.metric("aviationstack requests this month", f"{aviationstack_quota.used()} / {aviationstack_quota.limit}")
+    with st.expander("Prometheus metrics"):
+        st.code(metrics.render_prometheus(), language="text")
@@ -0,0 +1,229 @@
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# Position fixes kept per aircraft (the oldest fix is overwritten once the buffer is full)
+TRACK_LENGTH = 64
+# Aircraft not seen for this many seconds are evicted
+TRACK_TIMEOUT = 900
+# Dead reckoning never extrapolates further than this many seconds past the last fix
+MAX_EXTRAPOLATION = 120
+# Aircraft slots allocated up front; the buffers double when they run out
+INITIAL_SLOTS = 4096
+
+EARTH_RADIUS_M = 6_371_000.0
+
+# Fields stored per fix, next to its time (seconds since the epoch)
+TRACK_FIELDS = ("latitude", "longitude", "baro_altitude", "velocity", "true_track", "vertical_rate")
+
+
+class TrackStore:
+    """
+    Per-aircraft trajectories built from successive snapshots, keyed by icao24.
+
+    Every aircraft owns one slot: a row of fixed-size ring buffers (one 2-D array per field, shape
+    slots × TRACK_LENGTH), so memory per aircraft is fixed and a whole snapshot is written with a few
+    fancy-indexed assignments. A fix is only added when the aircraft reports a new time_position, and
+    slots of aircraft that have not been seen for `timeout` seconds are freed for reuse.
+    """
+
+    def __init__(self, length=TRACK_LENGTH, timeout=TRACK_TIMEOUT, slots=INITIAL_SLOTS):
+        self._lock = threading.Lock()
+        self.length = length
+        self.timeout = timeout
+        self._slots = {}  # icao24 -> slot
+        self._free = list(range(slots - 1, -1, -1))
+        self._time = np.full((slots, length), np.nan)
+        self._fields = {field: np.full((slots, length), np.nan, dtype=np.float32) for field in TRACK_FIELDS}
+        self._head = np.zeros(slots, dtype=np.int64)  # Where the next fix of a slot is written
+        self._count = np.zeros(slots, dtype=np.int64)  # Fixes held by a slot
+        self._last_time = np.full(slots, np.nan)  # Time of the newest fix of a slot
+        self._last_seen = np.full(slots, np.nan)  # Time of the newest snapshot a slot's aircraft was in
+        self._timestamp = None
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _grow(self):
+        """
+        Double the number of slots.
+        """
+        old = len(self._head)
+        self._free = list(range(2 * old - 1, old - 1, -1)) + self._free
+
+        def grow(array, fill):
+            grown = np.full((2 * old,) + array.shape[1:], fill, dtype=array.dtype)
+            grown[:old] = array
+            return grown
+
+        self._time = grow(self._time, np.nan)
+        self._fields = {field: grow(array, np.nan) for field, array in self._fields.items()}
+        self._head = grow(self._head, 0)
+        self._count = grow(self._count, 0)
+        self._last_time = grow(self._last_time, np.nan)
+        self._last_seen = grow(self._last_seen, np.nan)
+
+    def _slot_of(self, icao24):
+        """
+        Return the slot of an aircraft, assigning a free one on first sight.
+        """
+        slot = self._slots.get(icao24)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[icao24] = slot
+        return slot
+
+    def _evict(self, now):
+        """
+        Free the slots of aircraft last seen more than `timeout` seconds before `now`.
+        """
+        expired = [icao24 for icao24, slot in self._slots.items() if self._last_seen[slot] < now - self.timeout]
+        for icao24 in expired:
+            slot = self._slots.pop(icao24)
+            # Clear the fixes too, so the next aircraft in the slot never picks up this one's positions
+            self._time[slot] = np.nan
+            for array in self._fields.values():
+                array[slot] = np.nan
+            self._count[slot] = 0
+            self._head[slot] = 0
+            self._last_time[slot] = np.nan
+            self._last_seen[slot] = np.nan
+            self._free.append(slot)
+        return len(expired)
+
+    @metrics.timed_function("tracks.update")
+    def update(self, df):
+        """
+        Add the positions of a snapshot to the tracks. Applying the same snapshot twice is a no-op.
+
+        Parameters:
+        - df (pd.DataFrame): A snapshot from fetch_opensky_snapshot().
+
+        Returns:
+        - int: Number of fixes added.
+        """
+        with self._lock:
+            timestamp = df.attrs.get("timestamp")
+            if timestamp is not None and timestamp == self._timestamp:
+                return 0
+            self._timestamp = timestamp
+
+            df = df.drop_duplicates(subset="icao24", keep="last")
+            # The time of the position report, or of the last message when there is none
+            last_contact = df["last_contact"].astype("int64").to_numpy(dtype=np.float64)
+            fix_time = df["time_position"].astype("Float64").to_numpy(dtype=np.float64, na_value=np.nan)
+            fix_time = np.where(np.isnan(fix_time), last_contact, fix_time)
+            now = float(np.nanmax(last_contact)) if len(df) else (pd.Timestamp(timestamp).timestamp() if timestamp else 0.0)
+
+            slots = np.fromiter((self._slot_of(icao24) for icao24 in df["icao24"].astype(str)), dtype=np.int64, count=len(df))
+            self._last_seen[slots] = last_contact
+
+            # Only aircraft with a position that is newer than their last fix get a new fix
+            has_position = df["latitude"].notna().to_numpy() & df["longitude"].notna().to_numpy()
+            newer = np.isnan(self._last_time[slots]) | (fix_time > self._last_time[slots])
+            add = has_position & newer
+            slots, rows = slots[add], np.flatnonzero(add)
+
+            heads = self._head[slots]
+            self._time[slots, heads] = fix_time[rows]
+            for field, array in self._fields.items():
+                array[slots, heads] = df[field].to_numpy(dtype=np.float32, na_value=np.nan)[rows]
+            self._head[slots] = (heads + 1) % self.length
+            self._count[slots] = np.minimum(self._count[slots] + 1, self.length)
+            self._last_time[slots] = fix_time[rows]
+
+            self._evict(now)
+            return len(slots)
+
+    def track(self, icao24) -> pd.DataFrame:
+        """
+        Return the stored fixes of one aircraft, oldest first.
+
+        Parameters:
+        - icao24 (str): The aircraft's ICAO 24-bit address.
+
+        Returns:
+        - pd.DataFrame: "time" (UTC) plus the TRACK_FIELDS columns; empty if the aircraft is unknown.
+        """
+        with self._lock:
+            slot = self._slots.get(icao24)
+            if slot is None:
+                return pd.DataFrame(columns=["time", *TRACK_FIELDS])
+            count, head = self._count[slot], self._head[slot]
+            order = (head - count + np.arange(count)) % self.length
+            track = pd.DataFrame({field: array[slot, order] for field, array in self._fields.items()})
+            track.insert(0, "time", pd.to_datetime(self._time[slot, order], unit="s"))
+        return track
+
+    def positions_at(self, when) -> pd.DataFrame:
+        """
+        Estimate where every tracked aircraft is at a given time.
+        Between two fixes the position is interpolated linearly; after the newest fix it is dead-reckoned
+        from that fix's velocity, true track and vertical rate (for at most MAX_EXTRAPOLATION seconds).
+        Aircraft whose first fix is later than `when` are left out.
+
+        Parameters:
+        - when (datetime | pd.Timestamp | float): UTC time, or seconds since the epoch.
+
+        Returns:
+        - pd.DataFrame: "icao24", "latitude", "longitude", "baro_altitude", "true_track" and "extrapolated".
+        """
+        if isinstance(when, (int, float)):
+            t = float(when)
+        else:
+            when = pd.Timestamp(when)
+            t = (when if when.tzinfo else when.tz_localize("UTC")).timestamp()
+        with self._lock:
+            icao24 = np.array(list(self._slots), dtype=object)
+            slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+            # Aircraft seen without a position report yet have no fix to start from
+            has_fix = self._count[slots] > 0
+            icao24, slots = icao24[has_fix], slots[has_fix]
+            if np.all(self._last_time[slots] <= t):
+                # Usual case (animating past the latest snapshot): every aircraft starts from its newest fix
+                before = after = (self._head[slots] - 1) % self.length
+            else:
+                # Newest fix at or before t, and oldest fix after t, among the fixes a slot holds
+                # (NaN times never compare true)
+                held = (self._head[slots, None] - 1 - np.arange(self.length)) % self.length < self._count[slots, None]
+                times = np.where(held, self._time[slots], np.nan)
+                before = np.where(times <= t, times, -np.inf).argmax(axis=1)
+                after = np.where(times > t, times, np.inf).argmin(axis=1)
+            t0, t1 = self._time[slots, before], self._time[slots, after]
+            fix0 = {field: array[slots, before].astype(np.float64) for field, array in self._fields.items()}
+            fix1 = {field: self._fields[field][slots, after].astype(np.float64)
+                    for field in ("latitude", "longitude", "baro_altitude")}
+        known = t0 <= t
+        interpolate = known & (t1 > t)
+        lat0, lon0, alt0, track0 = fix0["latitude"], fix0["longitude"], fix0["baro_altitude"], fix0["true_track"]
+
+        # Dead reckoning from the last fix at or before t
+        dt = np.clip(t - t0, 0, MAX_EXTRAPOLATION)
+        distance = np.nan_to_num(fix0["velocity"]) * dt
+        heading = np.radians(np.nan_to_num(track0))
+        latitude = lat0 + np.degrees(distance * np.cos(heading) / EARTH_RADIUS_M)
+        longitude = lon0 + np.degrees(distance * np.sin(heading) / (EARTH_RADIUS_M * np.cos(np.radians(lat0))))
+        altitude = alt0 + np.nan_to_num(fix0["vertical_rate"]) * dt
+
+        # Linear interpolation towards the next fix where there is one
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(interpolate, (t - t0) / (t1 - t0), 0.0)
+        dlon = (fix1["longitude"] - lon0 + 180) % 360 - 180  # Shortest way across the antimeridian
+        latitude = np.where(interpolate, lat0 + share * (fix1["latitude"] - lat0), latitude)
+        longitude = np.where(interpolate, lon0 + share * dlon, longitude)
+        altitude = np.where(interpolate, alt0 + share * (fix1["baro_altitude"] - alt0), altitude)
+
+        return pd.DataFrame({
+            "icao24": icao24,
+            "latitude": np.clip(latitude, -90, 90),
+            "longitude": (longitude + 180) % 360 - 180,
+            "baro_altitude": altitude,
+            "true_track": track0,
+            "extrapolated": ~interpolate,
+        })[known].reset_index(drop=True)